@@ -0,0 +1,172 @@
+import cv2
+import numpy as np
+from detections import box_iou
+
+class OpticalFlowBoxTracker:
+    """
+    Propagates a bounding box between frames with sparse Lucas-Kanade optical flow.
+
+    Corner features inside the box are tracked forward and then backward; points whose
+    round trip does not land back where they started are discarded. The box moves by
+    the median point displacement and scales by the median change in point spread.
+    Confidence is the fraction of points that survived.
+    """
+    def __init__(self, max_points=50, fb_threshold=1.0):
+        """
+        Initialize the tracker.
+
+        Args:
+            max_points (int): Maximum number of features tracked inside the box. Defaults to 50.
+            fb_threshold (float): Maximum forward-backward error in pixels for a point to be kept. Defaults to 1.0.
+        """
+        self.max_points = max_points
+        self.fb_threshold = fb_threshold
+        self.lk_params = dict(winSize=(15, 15), maxLevel=2,
+                              criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+        self.reset()
+
+    def reset(self):
+        """Forget the current box."""
+        self.bbox = None
+        self._gray = None
+        self._points = None
+
+    @property
+    def active(self):
+        """True if the tracker has a box to propagate."""
+        return self.bbox is not None
+
+    def init(self, gray, bbox):
+        """
+        Start tracking a box.
+
+        Args:
+            gray (numpy.ndarray): Grayscale frame the box was detected in.
+            bbox (tuple): Box (xmin, ymin, xmax, ymax) in pixels.
+        """
+        height, width = gray.shape[:2]
+        xmin, ymin = max(0, int(bbox[0])), max(0, int(bbox[1]))
+        xmax, ymax = min(width, int(bbox[2])), min(height, int(bbox[3]))
+        if xmax - xmin < 4 or ymax - ymin < 4:
+            self.reset()
+            return
+        mask = np.zeros(gray.shape[:2], dtype=np.uint8)
+        mask[ymin:ymax, xmin:xmax] = 255
+        points = cv2.goodFeaturesToTrack(gray, self.max_points, 0.01, 5, mask=mask)
+        if points is None or len(points) < 4:
+            self.reset()
+            return
+        self.bbox = tuple(float(v) for v in bbox)
+        self._gray = gray
+        self._points = points
+
+    def update(self, gray):
+        """
+        Propagate the box to a new frame.
+
+        Args:
+            gray (numpy.ndarray): Next grayscale frame.
+
+        Returns:
+            tuple: (bbox, confidence) with bbox as (xmin, ymin, xmax, ymax), or (None, 0.0) if tracking failed.
+        """
+        if not self.active:
+            return None, 0.0
+        new_points, status, _ = cv2.calcOpticalFlowPyrLK(self._gray, gray, self._points, None, **self.lk_params)
+        back_points, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self._gray, new_points, None, **self.lk_params)
+        fb_error = np.linalg.norm((self._points - back_points).reshape(-1, 2), axis=1)
+        good = (status.ravel() == 1) & (back_status.ravel() == 1) & (fb_error < self.fb_threshold)
+        confidence = float(np.count_nonzero(good)) / len(self._points)
+        if np.count_nonzero(good) < 4:
+            self.reset()
+            return None, 0.0
+
+        old = self._points.reshape(-1, 2)[good]
+        new = new_points.reshape(-1, 2)[good]
+        dx, dy = (float(v) for v in np.median(new - old, axis=0))
+
+        # Scale from the median ratio of each point's distance to the centroid
+        old_spread = np.linalg.norm(old - old.mean(axis=0), axis=1)
+        new_spread = np.linalg.norm(new - new.mean(axis=0), axis=1)
+        valid = old_spread > 1e-3
+        scale = float(np.median(new_spread[valid] / old_spread[valid])) if np.any(valid) else 1.0
+
+        xmin, ymin, xmax, ymax = self.bbox
+        cx, cy = (xmin + xmax) / 2 + dx, (ymin + ymax) / 2 + dy
+        half_w, half_h = (xmax - xmin) / 2 * scale, (ymax - ymin) / 2 * scale
+        self.bbox = (cx - half_w, cy - half_h, cx + half_w, cy + half_h)
+        self._gray = gray
+        self._points = new.reshape(-1, 1, 2)
+        return self.bbox, confidence
+
+class HybridBoxTracker:
+    """
+    Runs the (expensive) detector every N frames and the optical-flow tracker in between.
+
+    Detection is forced early when the tracker loses confidence. With `adaptive` set,
+    N grows while tracked boxes keep agreeing with fresh detections and shrinks when
+    they drift apart.
+    """
+    def __init__(self, detect, detect_interval=5, adaptive=True, max_detect_interval=15,
+                 min_confidence=0.5, tracker=None, min_detect_interval=1):
+        """
+        Initialize the hybrid tracker.
+
+        Args:
+            detect (callable): detect(frame) -> bbox (xmin, ymin, xmax, ymax) or None.
+            detect_interval (int): Run the detector every this many frames. 1 detects every frame. Defaults to 5.
+            adaptive (bool): Adjust detect_interval from tracker/detector agreement. Defaults to True.
+            max_detect_interval (int): Upper bound for the adaptive interval. Defaults to 15.
+            min_confidence (float): Force a detection when tracker confidence drops below this. Defaults to 0.5.
+            tracker (OpticalFlowBoxTracker, optional): Box tracker to use. Defaults to a new one.
+            min_detect_interval (int): Lower bound for the adaptive interval. Defaults to 1.
+        """
+        self.detect = detect
+        self.detect_interval = detect_interval
+        self.adaptive = adaptive
+        self.max_detect_interval = max_detect_interval
+        self.min_detect_interval = min_detect_interval
+        self.min_confidence = min_confidence
+        self.tracker = tracker if tracker is not None else OpticalFlowBoxTracker()
+        self.frames_since_detection = 0
+        self.detections_run = 0
+        self.frames_tracked = 0
+
+    def update(self, frame):
+        """
+        Locate the target in the next frame.
+
+        Args:
+            frame (numpy.ndarray): BGR frame.
+
+        Returns:
+            tuple: (bbox, detected) where bbox is (xmin, ymin, xmax, ymax) or None, and detected
+                is True if the box came from the detector rather than the tracker.
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        self.frames_since_detection += 1
+
+        tracked = None
+        if self.tracker.active and (self.detect_interval > 1 or self.adaptive):
+            tracked, confidence = self.tracker.update(gray)
+            if tracked is not None and confidence < self.min_confidence:
+                tracked = None
+            if tracked is not None and self.frames_since_detection < self.detect_interval:
+                self.frames_tracked += 1
+                return tracked, False
+
+        bbox = self.detect(frame)
+        self.detections_run += 1
+        self.frames_since_detection = 0
+        if bbox is None:
+            self.tracker.reset()
+            return None, True
+
+        if self.adaptive and tracked is not None:
+            agreement = box_iou(tracked, bbox)
+            if agreement > 0.7:
+                self.detect_interval = min(self.max_detect_interval, self.detect_interval + 1)
+            elif agreement < 0.5:
+                self.detect_interval = max(self.min_detect_interval, self.detect_interval // 2)
+        self.tracker.init(gray, bbox)
+        return bbox, True
@@ -0,0 +1,209 @@
+import logging
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+
+ROOT_LOGGER = "smartcar"
+
+def get_logger(name):
+    """Return the logger for a module, e.g. get_logger("main") -> "smartcar.main"."""
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+class RateLimiter:
+    """
+    Collapses repeats of the same message within a time window.
+
+    Messages are keyed by logger, level and format string (not the arguments), so
+    "Distance: %s cm" with changing values counts as one message. The first occurrence
+    in a window is emitted; later ones are counted, and when the window closes the last
+    of them is emitted with a "(×N in last 5 s)" suffix.
+    """
+    def __init__(self, window=5.0):
+        self.window = window
+        self._entries = {}  # key -> [window start, suppressed count, last suppressed record]
+
+    def admit(self, record, now):
+        """
+        Decide what to emit for an incoming record.
+
+        Returns:
+            list: Records to emit now (a pending summary and/or the record itself).
+        """
+        key = (record.name, record.levelno, getattr(record, "template", record.msg))
+        entry = self._entries.get(key)
+        if entry is not None and now - entry[0] < self.window:
+            entry[1] += 1
+            entry[2] = record
+            return []
+        out = []
+        if entry is not None and entry[1]:
+            out.append(self._summary(entry, now))
+        self._entries[key] = [now, 0, None]
+        out.append(record)
+        return out
+
+    def flush(self, now, force=False):
+        """Emit summaries for windows that have closed (all pending ones if force)."""
+        out = []
+        for key, entry in list(self._entries.items()):
+            if force or now - entry[0] >= self.window:
+                if entry[1]:
+                    out.append(self._summary(entry, now))
+                del self._entries[key]
+        return out
+
+    def _summary(self, entry, now):
+        start, count, record = entry
+        if count == 1:
+            return record
+        elapsed = min(self.window, now - start)
+        summary = logging.makeLogRecord(record.__dict__)
+        summary.msg = f"{record.getMessage()} (×{count} in last {elapsed:.0f} s)"
+        summary.args = None
+        return summary
+
+IMMUTABLE_ARG_TYPES = (str, bytes, int, float, complex, bool, type(None))
+
+def _is_immutable(value):
+    if isinstance(value, tuple):
+        return all(_is_immutable(item) for item in value)
+    return isinstance(value, IMMUTABLE_ARG_TYPES)
+
+class QueueLogHandler(logging.Handler):
+    """
+    Handler that only enqueues records; a full queue drops the record instead of blocking.
+
+    Formatting is left to the writer thread, except that a message whose arguments could
+    change before then (lists, arrays, objects) is merged with them here, as
+    logging.handlers.QueueHandler.prepare does. The format string is kept in
+    record.template so the rate limiter still groups the message with its repeats.
+    """
+    def __init__(self, records):
+        super().__init__()
+        self.records = records
+        self.dropped = 0
+
+    def emit(self, record):
+        args = record.args.values() if isinstance(record.args, dict) else record.args
+        if args and not all(_is_immutable(arg) for arg in args):
+            try:
+                message = record.getMessage()
+            except Exception:
+                self.handleError(record)
+                return
+            record.template = record.msg
+            record.msg = message
+            record.args = None
+        try:
+            self.records.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class LogWorker:
+    """Background thread that rate-limits queued records and writes them to the real handlers."""
+    def __init__(self, records, handlers, limiter, flush_interval=0.5):
+        self.records = records
+        self.handlers = handlers
+        self.limiter = limiter
+        self.flush_interval = flush_interval
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def _write(self, records):
+        for record in records:
+            for handler in self.handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+
+    def _run(self):
+        while self._running or not self.records.empty():
+            try:
+                record = self.records.get(timeout=self.flush_interval)
+            except queue.Empty:
+                record = None
+            now = time.monotonic()
+            if record is not None:
+                self._write(self.limiter.admit(record, now))
+            self._write(self.limiter.flush(now))
+
+    def stop(self):
+        """Write everything still queued, including pending repeat counts, and stop."""
+        self._running = False
+        self._thread.join(timeout=2)
+        self._write(self.limiter.flush(time.monotonic(), force=True))
+        for handler in self.handlers:
+            handler.flush()
+
+_worker = None
+_handler = None
+
+def setup_logging(level=None, stream=None, filename=None, window=5.0, queue_size=10000):
+    """
+    Route all "smartcar.*" loggers through a queue to a background writer thread.
+
+    Logging calls on the control threads only enqueue the record (formatting happens on
+    the writer thread), so slow terminals, SSH sessions or SD cards never stall them.
+
+    Args:
+        level (str or int, optional): Initial level. Defaults to the SMARTCAR_LOG_LEVEL
+            environment variable, or INFO.
+        stream (optional): Stream to write to. Defaults to stderr.
+        filename (str, optional): Also append to this file. Defaults to None.
+        window (float): Rate-limiting window in seconds for repeated messages. Defaults to 5.
+        queue_size (int): Records buffered before new ones are dropped. Defaults to 10000.
+
+    Returns:
+        logging.Logger: The "smartcar" root logger.
+    """
+    global _worker, _handler
+    if _worker is not None:
+        shutdown_logging()
+    formatter = logging.Formatter("%(asctime)s %(levelname)-7s %(name)s: %(message)s", "%H:%M:%S")
+    handlers = [logging.StreamHandler(stream or sys.stderr)]
+    if filename:
+        handlers.append(logging.FileHandler(filename))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    records = queue.Queue(maxsize=queue_size)
+    _worker = LogWorker(records, handlers, RateLimiter(window))
+    _handler = QueueLogHandler(records)
+    root = logging.getLogger(ROOT_LOGGER)
+    root.handlers = [_handler]
+    root.propagate = False
+    set_level(level or os.environ.get("SMARTCAR_LOG_LEVEL", "INFO"))
+    return root
+
+def set_level(level):
+    """Change the verbosity of every "smartcar.*" logger at runtime, e.g. set_level("DEBUG")."""
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+    logging.getLogger(ROOT_LOGGER).setLevel(level)
+
+def install_level_signal(signum=signal.SIGUSR2):
+    """
+    Toggle between INFO and DEBUG whenever the process receives a signal, e.g.
+    `kill -USR2 <pid>`. Must be called from the main thread.
+    """
+    def toggle(received, frame):
+        root = logging.getLogger(ROOT_LOGGER)
+        set_level(logging.INFO if root.level == logging.DEBUG else logging.DEBUG)
+        root.warning("Log level set to %s", logging.getLevelName(root.level))
+    signal.signal(signum, toggle)
+
+def dropped_records():
+    """Number of records dropped because the queue was full."""
+    return _handler.dropped if _handler is not None else 0
+
+def shutdown_logging():
+    """Flush and stop the background writer."""
+    global _worker, _handler
+    if _worker is not None:
+        _worker.stop()
+        logging.getLogger(ROOT_LOGGER).handlers = []
+        _worker = None
+        _handler = None
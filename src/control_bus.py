@@ -0,0 +1,156 @@
+import threading
+import time
+from collections import deque, namedtuple
+
+# Messages exchanged between the car's threads. `origin` is the time.monotonic() timestamp
+# of the sensor data the message derives from, so end-to-end latency is now - origin.
+DistanceReading = namedtuple("DistanceReading", ["distance", "origin"])
+# DetectionResult also carries the servo angles at capture and, on frames where YOLO ran, its
+# detections (DETECTION_DTYPE array) so that a flight recording can be replayed closed-loop.
+DetectionResult = namedtuple("DetectionResult", ["bbox", "frame_seq", "origin", "pan_angle", "tilt_angle", "detections"],
+                             defaults=[None, None, None])
+ServoState = namedtuple("ServoState", ["pan_angle", "tilt_angle", "origin"])
+# MotorCommand.action is "stop" or "drive"; a drive command's forward speed is `speed` and its
+# turn rate `angular` (see MovementController.drive).
+MotorCommand = namedtuple("MotorCommand", ["action", "speed", "origin", "angular"], defaults=[0.0])
+
+class Subscription:
+    """
+    Receives messages of selected types from a ControlBus.
+
+    By default only the latest message of each type is kept (readers always see fresh
+    state and never a backlog). With `maxlen` set, every message is queued in order,
+    dropping the oldest once the queue is full.
+    """
+    def __init__(self, bus, types, maxlen=None):
+        self.bus = bus
+        self.types = types
+        self.maxlen = maxlen
+        self.dropped = 0  # Messages lost to a full queue
+        self._cond = threading.Condition()
+        self._pending = deque(maxlen=maxlen) if maxlen else {}
+        self._closed = False
+
+    def _deliver(self, message):
+        with self._cond:
+            if self.maxlen:
+                if len(self._pending) == self.maxlen:
+                    self.dropped += 1
+                self._pending.append(message)
+            else:
+                self._pending[type(message)] = message
+            self._cond.notify_all()
+
+    def get(self, timeout=None):
+        """
+        Wait for new messages.
+
+        Args:
+            timeout (float, optional): Maximum time to wait in seconds. Defaults to None (wait forever).
+
+        Returns:
+            list: New messages (empty if the timeout expired or the subscription was closed).
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending or self._closed, timeout)
+            if self.maxlen:
+                messages = list(self._pending)
+            else:
+                messages = list(self._pending.values())
+            self._pending.clear()
+            return messages
+
+    def close(self):
+        """Unsubscribe and wake up any waiting reader."""
+        self.bus.unsubscribe(self)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+class ControlBus:
+    """
+    Small in-process publish/subscribe bus. Publishing hands the message to every
+    subscriber of its type and wakes them immediately; there is no polling.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}  # {message type: [Subscription]}
+        self._latest = {}  # {message type: latest message}
+
+    def subscribe(self, *types, maxlen=None):
+        """
+        Subscribe to one or more message types.
+
+        Args:
+            *types: Message classes to receive (e.g., DistanceReading, ServoState).
+            maxlen (int, optional): Queue every message up to this many instead of keeping only the latest.
+
+        Returns:
+            Subscription: The new subscription.
+        """
+        subscription = Subscription(self, types, maxlen)
+        with self._lock:
+            for message_type in types:
+                self._subscribers.setdefault(message_type, []).append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Remove a subscription from the bus."""
+        with self._lock:
+            for message_type in subscription.types:
+                subscribers = self._subscribers.get(message_type, [])
+                if subscription in subscribers:
+                    subscribers.remove(subscription)
+
+    def publish(self, message):
+        """Deliver a message to every subscriber of its type."""
+        message_type = type(message)
+        with self._lock:
+            self._latest[message_type] = message
+            subscribers = list(self._subscribers.get(message_type, ()))
+        for subscription in subscribers:
+            subscription._deliver(message)
+
+    def latest(self, message_type):
+        """Return the most recent message of a type, or None if none was published."""
+        with self._lock:
+            return self._latest.get(message_type)
+
+class LatencyTracker:
+    """Keeps a sliding window of latency samples per path and summarizes them."""
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._samples = {}
+        self.window = window
+
+    def record(self, name, origin):
+        """
+        Record the latency from `origin` (time.monotonic()) to now.
+
+        Returns:
+            float: The latency in seconds.
+        """
+        latency = time.monotonic() - origin
+        with self._lock:
+            self._samples.setdefault(name, deque(maxlen=self.window)).append(latency)
+        return latency
+
+    def summary(self):
+        """
+        Summarize the recorded latencies.
+
+        Returns:
+            dict: {name: (count, p50, p95, max)} with latencies in milliseconds.
+        """
+        result = {}
+        with self._lock:
+            for name, samples in self._samples.items():
+                ordered = sorted(samples)
+                count = len(ordered)
+                result[name] = (
+                    count,
+                    ordered[count // 2] * 1000,
+                    ordered[min(count - 1, int(count * 0.95))] * 1000,
+                    ordered[-1] * 1000,
+                )
+        return result
@@ -0,0 +1,125 @@
+import numpy as np
+
+# Compact record for one detection: bounding box corners in pixels, confidence and class index.
+DETECTION_DTYPE = np.dtype([
+    ("xmin", np.int32),
+    ("ymin", np.int32),
+    ("xmax", np.int32),
+    ("ymax", np.int32),
+    ("conf", np.float32),
+    ("cls", np.int32),
+])
+
+def empty_detections():
+    """Return an empty detection array."""
+    return np.empty(0, dtype=DETECTION_DTYPE)
+
+def _to_numpy(values):
+    """Convert a tensor (torch or NumPy-like) to a NumPy array with a single device sync."""
+    if hasattr(values, "cpu"):
+        values = values.cpu()
+    if hasattr(values, "numpy"):
+        values = values.numpy()
+    return np.asarray(values)
+
+def class_ids_for(labels, names):
+    """
+    Look up the class indices for one or more class names.
+
+    Args:
+        labels (dict): Mapping of class index to class name (e.g., `model.names`).
+        names (str or list): Class name or list of class names.
+
+    Returns:
+        list: Class indices matching the given names.
+    """
+    if isinstance(names, str):
+        names = [names]
+    return [idx for idx, name in labels.items() if name in names]
+
+def extract_detections(boxes, confidence_threshold, class_ids=None, scale=None):
+    """
+    Convert ultralytics boxes into a compact detection array in one vectorized pass.
+
+    Args:
+        boxes: Ultralytics `Boxes` object (anything with `xyxy`, `conf` and `cls` tensors).
+        confidence_threshold (float): Keep only detections with confidence above this value.
+        class_ids (list, optional): Keep only these class indices. Defaults to None (all classes).
+        scale (tuple, optional): (x, y) factors applied to the box coordinates, e.g. to map boxes
+            from a low-resolution inference stream to the main stream. Defaults to None.
+
+    Returns:
+        numpy.ndarray: Structured array with dtype DETECTION_DTYPE, in the order the model returned them.
+    """
+    if boxes is None or len(boxes) == 0:
+        return empty_detections()
+
+    xyxy = _to_numpy(boxes.xyxy).reshape(-1, 4)
+    conf = _to_numpy(boxes.conf).reshape(-1)
+    cls = _to_numpy(boxes.cls).reshape(-1)
+
+    mask = conf > confidence_threshold
+    if class_ids is not None:
+        mask &= np.isin(cls, class_ids)
+
+    count = int(np.count_nonzero(mask))
+    detections = np.empty(count, dtype=DETECTION_DTYPE)
+    if count:
+        kept = xyxy[mask]
+        if scale is not None:
+            kept = kept * np.array([scale[0], scale[1], scale[0], scale[1]], dtype=kept.dtype)
+        detections["xmin"] = kept[:, 0]
+        detections["ymin"] = kept[:, 1]
+        detections["xmax"] = kept[:, 2]
+        detections["ymax"] = kept[:, 3]
+        detections["conf"] = conf[mask]
+        detections["cls"] = cls[mask]
+    return detections
+
+def scale_detections(detections, scale):
+    """
+    Return a copy of a detection array with the box coordinates scaled.
+
+    Args:
+        detections (numpy.ndarray): Detection array with dtype DETECTION_DTYPE.
+        scale (tuple): (x, y) factors, or None for an unscaled copy.
+
+    Returns:
+        numpy.ndarray: The scaled detection array.
+    """
+    scaled = detections.copy()
+    if scale is not None:
+        for name, factor in (("xmin", scale[0]), ("ymin", scale[1]), ("xmax", scale[0]), ("ymax", scale[1])):
+            scaled[name] = detections[name] * factor
+    return scaled
+
+def best_detection(detections):
+    """
+    Return the most confident detection.
+
+    Args:
+        detections (numpy.ndarray): Detection array with dtype DETECTION_DTYPE.
+
+    Returns:
+        numpy.void: The detection record with the highest confidence, or None if the array is empty.
+    """
+    if len(detections) == 0:
+        return None
+    return detections[int(np.argmax(detections["conf"]))]
+
+def box_iou(a, b):
+    """
+    Compute the intersection over union of two boxes.
+
+    Args:
+        a (tuple): Box (xmin, ymin, xmax, ymax).
+        b (tuple): Box (xmin, ymin, xmax, ymax).
+
+    Returns:
+        float: IoU in [0, 1].
+    """
+    ix = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    intersection = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - intersection
+    return intersection / union if union > 0 else 0.0
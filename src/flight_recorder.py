@@ -0,0 +1,331 @@
+import glob
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from car_logging import get_logger
+from control_bus import DetectionResult, DistanceReading, MotorCommand, ServoState
+from detections import DETECTION_DTYPE
+
+logger = get_logger("flight_recorder")
+
+FORMAT_VERSION = 2
+
+# Event kinds. Unwritten records in a preallocated chunk are zero, i.e. EMPTY.
+EMPTY, DISTANCE, FRAME, SERVO, MOTOR, KEYFRAME = range(6)
+KIND_NAMES = ("empty", "distance", "frame", "servo", "motor", "keyframe")
+
+# Motor actions by code, as issued by SmartCarSystem.command_motors()
+MOTOR_ACTIONS = ("stop", "move_forward", "move_backward", "turn_left", "turn_right", "drive")
+
+# One fixed-size record per event. `t` is when the recorder received it and `origin` the
+# time.monotonic() of the sensor data behind it. Which fields are used depends on `kind`:
+#   DISTANCE  distance
+#   FRAME     seq (frame), bbox (NaN if no target), pan/tilt at capture, detections
+#             (YOLO boxes stored for this frame; 0 on optical-flow frames)
+#   SERVO     pan, tilt (commanded angles)
+#   MOTOR     action (index into MOTOR_ACTIONS), speed, angular
+#   KEYFRAME  seq (frame); the image is keyframes/<seq>.jpg
+EVENT_DTYPE = np.dtype([
+    ("t", np.float64),
+    ("origin", np.float64),
+    ("kind", np.uint8),
+    ("action", np.uint8),
+    ("seq", np.uint32),
+    ("distance", np.float32),
+    ("speed", np.float32),
+    ("angular", np.float32),
+    ("pan", np.float32),
+    ("tilt", np.float32),
+    ("bbox", np.float32, (4,)),
+    ("detections", np.uint16),
+])
+
+# YOLO detections, each tagged with the frame they were found in
+FRAME_DETECTION_DTYPE = np.dtype([("seq", np.uint32)] + [(name, DETECTION_DTYPE[name]) for name in DETECTION_DTYPE.names])
+
+def write_meta(directory, resolution):
+    """Write the meta.json describing a recording."""
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump({
+            "version": FORMAT_VERSION,
+            "resolution": list(resolution),
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "motor_actions": MOTOR_ACTIONS,
+        }, f, indent=2)
+
+class ChunkedLog:
+    """
+    Append-only log of NumPy structured records in fixed-size, memory-mapped chunk files.
+
+    Each chunk is preallocated and zero-filled, so appending is a slice assignment into
+    the page cache and a crash loses at most the records since the last flush. Closing
+    truncates the last chunk to the records actually written.
+    """
+    def __init__(self, directory, prefix, dtype, chunk_records=65536):
+        """
+        Initialize the log.
+
+        Args:
+            directory (str): Directory the chunk files are written to.
+            prefix (str): Chunk file name prefix, e.g. "events" for events-0000.bin.
+            dtype (numpy.dtype): Record type.
+            chunk_records (int): Records per chunk file. Defaults to 65536.
+        """
+        self.directory = directory
+        self.prefix = prefix
+        self.dtype = np.dtype(dtype)
+        self.chunk_records = chunk_records
+        self.records = 0  # Total records appended
+        self._chunk = None
+        self._chunk_index = -1
+        self._used = 0
+
+    def _path(self, index):
+        return os.path.join(self.directory, f"{self.prefix}-{index:04d}.bin")
+
+    def _next_chunk(self):
+        self._close_chunk()
+        self._chunk_index += 1
+        self._chunk = np.memmap(self._path(self._chunk_index), dtype=self.dtype, mode="w+",
+                                shape=(self.chunk_records,))
+        self._used = 0
+
+    def _close_chunk(self):
+        if self._chunk is None:
+            return
+        self._chunk.flush()
+        del self._chunk
+        self._chunk = None
+        os.truncate(self._path(self._chunk_index), self._used * self.dtype.itemsize)
+
+    def append(self, records):
+        """Append a record array, spilling into new chunks as they fill."""
+        offset = 0
+        while offset < len(records):
+            if self._chunk is None or self._used == self.chunk_records:
+                self._next_chunk()
+            count = min(len(records) - offset, self.chunk_records - self._used)
+            self._chunk[self._used:self._used + count] = records[offset:offset + count]
+            self._used += count
+            offset += count
+        self.records += len(records)
+
+    def flush(self):
+        """Write dirty pages of the current chunk to disk."""
+        if self._chunk is not None:
+            self._chunk.flush()
+
+    def close(self):
+        """Flush and trim the last chunk."""
+        self._close_chunk()
+
+    @staticmethod
+    def load(directory, prefix, dtype):
+        """
+        Read every chunk of a log.
+
+        Args:
+            directory (str): Directory holding the chunk files.
+            prefix (str): Chunk file name prefix.
+            dtype (numpy.dtype): Record type.
+
+        Returns:
+            numpy.ndarray: All records in append order (memory-mapped when there is a single chunk).
+        """
+        dtype = np.dtype(dtype)
+        chunks = []
+        for path in sorted(glob.glob(os.path.join(directory, f"{prefix}-*.bin"))):
+            count = os.path.getsize(path) // dtype.itemsize
+            if count:
+                chunks.append(np.memmap(path, dtype=dtype, mode="r", shape=(count,)))
+        if not chunks:
+            return np.empty(0, dtype=dtype)
+        return chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
+
+class FlightRecorder:
+    """
+    Records what the car sensed and did, for offline replay.
+
+    Distance readings, tracked boxes (with the servo angles at capture and the raw YOLO
+    detections), servo angles and motor commands are taken from the ControlBus on the
+    recorder's own thread, so recording adds no work to the control loops beyond the
+    bus delivery. Every `keyframe_interval` seconds the tracker also hands over a copy
+    of the camera frame, which is JPEG-encoded on the recorder thread.
+    """
+    def __init__(self, bus, directory=None, resolution=(640, 360), keyframe_interval=1.0, jpeg_quality=80,
+                 chunk_records=65536, flush_interval=1.0):
+        """
+        Initialize and start the recorder.
+
+        Args:
+            bus (ControlBus): Bus to record from.
+            directory (str, optional): Output directory. Defaults to recordings/flight-<date>-<time>.
+            resolution (tuple): Main-stream frame size the boxes are in. Defaults to (640, 360).
+            keyframe_interval (float): Seconds between JPEG keyframes; None to record none. Defaults to 1.
+            jpeg_quality (int): JPEG quality of the keyframes. Defaults to 80.
+            chunk_records (int): Records per chunk file. Defaults to 65536.
+            flush_interval (float): Seconds between flushes to disk. Defaults to 1.
+        """
+        self.directory = directory or os.path.join("recordings", time.strftime("flight-%Y%m%d-%H%M%S"))
+        os.makedirs(os.path.join(self.directory, "keyframes"), exist_ok=True)
+        self.keyframe_interval = keyframe_interval
+        self.jpeg_quality = jpeg_quality
+        self.flush_interval = flush_interval
+        self.events = ChunkedLog(self.directory, "events", EVENT_DTYPE, chunk_records)
+        self.detections = ChunkedLog(self.directory, "detections", FRAME_DETECTION_DTYPE, chunk_records)
+        self.dropped = 0  # Keyframes skipped because the recorder fell behind
+        self._keyframes = deque(maxlen=2)
+        self._last_keyframe = None
+        write_meta(self.directory, resolution)
+
+        self.subscription = bus.subscribe(DistanceReading, DetectionResult, ServoState, MotorCommand, maxlen=4096)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="flight-recorder", daemon=True)
+        self._thread.start()
+
+    def keyframe(self, frame):
+        """
+        Offer a captured frame; a copy is kept if a keyframe is due. Called from the tracking loop.
+
+        Args:
+            frame (Frame): Frame from YOLODetector.wait_for_frame().
+        """
+        if self.keyframe_interval is None:
+            return
+        if self._last_keyframe is not None and frame.timestamp - self._last_keyframe < self.keyframe_interval:
+            return
+        self._last_keyframe = frame.timestamp
+        if len(self._keyframes) == self._keyframes.maxlen:
+            self.dropped += 1
+        self._keyframes.append((frame.seq, frame.timestamp, frame.image.copy()))
+
+    def _encode(self, message, now):
+        """Convert a bus message into an event record and its detections."""
+        event = np.zeros(1, dtype=EVENT_DTYPE)
+        event["t"] = now
+        event["origin"] = message.origin
+        detections = None
+        if isinstance(message, DistanceReading):
+            event["kind"] = DISTANCE
+            event["distance"] = message.distance
+        elif isinstance(message, DetectionResult):
+            event["kind"] = FRAME
+            event["seq"] = message.frame_seq
+            event["bbox"] = message.bbox if message.bbox is not None else np.nan
+            event["pan"] = np.nan if message.pan_angle is None else message.pan_angle
+            event["tilt"] = np.nan if message.tilt_angle is None else message.tilt_angle
+            if message.detections is not None and len(message.detections):
+                detections = np.empty(len(message.detections), dtype=FRAME_DETECTION_DTYPE)
+                detections["seq"] = message.frame_seq
+                for name in DETECTION_DTYPE.names:
+                    detections[name] = message.detections[name]
+                event["detections"] = len(detections)
+        elif isinstance(message, ServoState):
+            event["kind"] = SERVO
+            event["pan"] = message.pan_angle
+            event["tilt"] = message.tilt_angle
+        elif isinstance(message, MotorCommand):
+            event["kind"] = MOTOR
+            event["action"] = MOTOR_ACTIONS.index(message.action)
+            event["speed"] = message.speed
+            event["angular"] = message.angular
+        return event, detections
+
+    def _write_keyframes(self):
+        while self._keyframes:
+            seq, timestamp, image = self._keyframes.popleft()
+            path = os.path.join(self.directory, "keyframes", f"{seq}.jpg")
+            cv2.imwrite(path, image, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            event = np.zeros(1, dtype=EVENT_DTYPE)
+            event["t"] = time.monotonic()
+            event["origin"] = timestamp
+            event["kind"] = KEYFRAME
+            event["seq"] = seq
+            self.events.append(event)
+
+    def _run(self):
+        last_flush = time.monotonic()
+        try:
+            while self._running:
+                messages = self.subscription.get(timeout=0.2)
+                now = time.monotonic()
+                for message in messages:
+                    event, detections = self._encode(message, now)
+                    self.events.append(event)
+                    if detections is not None:
+                        self.detections.append(detections)
+                self._write_keyframes()
+                if now - last_flush >= self.flush_interval:
+                    self.events.flush()
+                    self.detections.flush()
+                    last_flush = now
+        finally:
+            # The log files are closed by the thread that writes them, after its last write
+            self.events.close()
+            self.detections.close()
+
+    def close(self):
+        """Stop recording; the log files are closed once the recorder thread has exited."""
+        self._running = False
+        self.subscription.close()
+        self._thread.join(timeout=2)
+        if self._thread.is_alive():
+            logger.warning("Flight recorder still writing after 2 s; its log files will close when it finishes")
+            return
+        logger.info("Flight recorder: %d events, %d detections, %d keyframes dropped in %s",
+                    self.events.records, self.detections.records, self.dropped, self.directory)
+
+class FlightLog:
+    """A recording made by FlightRecorder, loaded for analysis or replay."""
+    def __init__(self, directory):
+        """
+        Load a recording.
+
+        Args:
+            directory (str): Directory written by FlightRecorder.
+        """
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported flight log version {self.meta['version']}")
+        self.resolution = tuple(self.meta["resolution"])
+        events = ChunkedLog.load(directory, "events", EVENT_DTYPE)
+        events = events[events["kind"] != EMPTY]  # Records preallocated but not written before a crash
+        self.events = events[np.argsort(events["t"], kind="stable")]
+        self.detections = ChunkedLog.load(directory, "detections", FRAME_DETECTION_DTYPE)
+        # Detections are appended in frame order, so a frame's boxes start at the running total
+        frames = self.events[self.events["kind"] == FRAME]
+        self._detection_start = dict(zip(frames["seq"].tolist(),
+                                         (np.cumsum(frames["detections"]) - frames["detections"]).tolist()))
+
+    def of_kind(self, kind):
+        """Return the events of one kind, in time order."""
+        return self.events[self.events["kind"] == kind]
+
+    def frame_detections(self, event):
+        """
+        Return the YOLO detections stored with a FRAME event.
+
+        Returns:
+            numpy.ndarray: Records with dtype FRAME_DETECTION_DTYPE (empty on optical-flow frames).
+        """
+        start = self._detection_start.get(int(event["seq"]), 0)
+        return self.detections[start:start + int(event["detections"])]
+
+    def keyframe(self, seq):
+        """Load the JPEG keyframe of a frame, or None if there is none."""
+        return cv2.imread(os.path.join(self.directory, "keyframes", f"{seq}.jpg"))
+
+    @property
+    def duration(self):
+        """Seconds between the first and last event."""
+        if not len(self.events):
+            return 0.0
+        return float(self.events["t"][-1] - self.events["t"][0])
@@ -0,0 +1,76 @@
+import threading
+import numpy as np
+
+class FrameRing:
+    """
+    Fixed pool of preallocated frame buffers passed from one writer (the capture thread)
+    to one reader (the inference loop) without allocating or copying per frame.
+
+    Each slot is free, being written, the latest published frame, or held by the reader.
+    The writer only ever writes into a free slot, so the frame the reader holds stays
+    intact until the reader takes the next one.
+    """
+    def __init__(self, shape, slots=4, dtype=np.uint8, buffer=None):
+        """
+        Initialize the ring.
+
+        Args:
+            shape (tuple): Shape of one frame, e.g. (height, width, 3).
+            slots (int): Number of buffers; at least 3 (writing, latest, held). Defaults to 4.
+            dtype: Pixel data type. Defaults to numpy.uint8.
+            buffer (optional): Existing memory (e.g. SharedMemory.buf) to place the frames in.
+                Defaults to None (allocate privately).
+        """
+        if slots < 3:
+            raise ValueError("FrameRing needs at least 3 slots")
+        self.shape = tuple(shape)
+        self.slots = slots
+        if buffer is None:
+            self.frames = np.empty((slots,) + self.shape, dtype=dtype)
+        else:
+            self.frames = np.ndarray((slots,) + self.shape, dtype=dtype, buffer=buffer)
+        self._lock = threading.Lock()
+        self._writing = None
+        self._latest = None
+        self._held = None
+        self._addresses = [self.frames[i].__array_interface__["data"][0] for i in range(slots)]
+
+    def acquire_write(self):
+        """
+        Reserve a free slot for the writer.
+
+        Returns:
+            int: Slot index, or None if every slot is busy.
+        """
+        with self._lock:
+            for index in range(self.slots):
+                if index not in (self._writing, self._latest, self._held):
+                    self._writing = index
+                    return index
+            return None
+
+    def publish(self, index):
+        """Mark a written slot as the latest frame; the previous latest slot becomes free."""
+        with self._lock:
+            self._latest = index
+            if self._writing == index:
+                self._writing = None
+
+    def hold(self, index):
+        """Hand a slot to the reader, releasing the slot it held before."""
+        with self._lock:
+            self._held = index
+
+    def slot_of(self, image):
+        """
+        Find the slot an image array lives in.
+
+        Returns:
+            int: Slot index, or None if the image is not a whole slot of this ring.
+        """
+        if image.shape != self.shape:
+            return None
+        try:
+            return self._addresses.index(image.__array_interface__["data"][0])
+        except ValueError:
+            return None
@@ -0,0 +1,193 @@
+import contextlib
+import heapq
+import itertools
+import smbus
+import threading
+import time
+
+# Priority classes, most urgent first. A waiting transaction of a more urgent class is
+# granted the bus before any less urgent one, whatever the order they arrived in.
+PRIORITY_SAFETY = 0  # Emergency stops and motor releases
+PRIORITY_MOTOR = 1  # Motor duty changes
+PRIORITY_SERVO = 2  # Pan-tilt trims
+PRIORITY_BACKGROUND = 3  # Configuration, diagnostics
+PRIORITY_NAMES = {PRIORITY_SAFETY: "safety", PRIORITY_MOTOR: "motor", PRIORITY_SERVO: "servo",
+                  PRIORITY_BACKGROUND: "background"}
+
+_buses = {}
+_buses_lock = threading.Lock()
+
+def get_bus(bus_number=1):
+    """
+    Return the process-wide manager for an I2C bus, opening it on first use.
+
+    Args:
+        bus_number (int): I2C bus number. Defaults to 1.
+
+    Returns:
+        I2CBus: The shared bus manager.
+    """
+    with _buses_lock:
+        if bus_number not in _buses:
+            _buses[bus_number] = I2CBus(smbus.SMBus(bus_number))
+        return _buses[bus_number]
+
+class I2CBus:
+    """
+    Owns an SMBus handle and serializes every transaction on it.
+
+    Threads queue for the bus by priority class, then arrival order; a thread holding the
+    bus for a multi-register sequence (session()) keeps it until the sequence ends. Written
+    and read register values are shadowed per device, so writes that would not change a
+    register are skipped and reads of known registers never reach the bus. Registers the
+    device changes on its own must be marked with mark_volatile().
+    """
+    def __init__(self, bus, prioritize=True):
+        """
+        Initialize the manager on an open bus.
+
+        Args:
+            bus (smbus.SMBus): Open I2C bus.
+            prioritize (bool): Grant the bus by priority class; False for plain arrival order. Defaults to True.
+        """
+        self.smbus = bus
+        self.prioritize = prioritize
+        self.transactions = 0  # Transactions issued on the bus
+        self.writes_skipped = 0  # Writes that matched the shadow register
+        self.reads_shadowed = 0  # Reads answered from the shadow register
+        self._shadow = {}  # {address: {register: value}}
+        self._volatile = {}  # {address: set of registers}
+        self._cond = threading.Condition()
+        self._waiting = []  # Heap of (priority, ticket)
+        self._tickets = itertools.count()
+        self._owner = None
+        self._depth = 0
+        self._waits = {}  # {priority: [grants, total wait, max wait]}
+
+    def _acquire(self, priority):
+        me = threading.get_ident()
+        with self._cond:
+            if self._owner == me:
+                self._depth += 1
+                return
+            start = time.perf_counter()
+            entry = (priority if self.prioritize else 0, next(self._tickets))
+            heapq.heappush(self._waiting, entry)
+            while self._owner is not None or self._waiting[0] != entry:
+                self._cond.wait()
+            heapq.heappop(self._waiting)
+            self._owner = me
+            self._depth = 1
+            wait = time.perf_counter() - start
+            stats = self._waits.setdefault(priority, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += wait
+            stats[2] = max(stats[2], wait)
+
+    def _release(self):
+        with self._cond:
+            self._depth -= 1
+            if self._depth == 0:
+                self._owner = None
+                self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def session(self, priority=PRIORITY_BACKGROUND):
+        """
+        Hold the bus for a sequence of transactions that must not interleave with other threads.
+        Sessions nest; the bus is released when the outermost one ends.
+
+        Args:
+            priority (int): Priority class to queue with. Defaults to PRIORITY_BACKGROUND.
+        """
+        self._acquire(priority)
+        try:
+            yield self
+        finally:
+            self._release()
+
+    def mark_volatile(self, addr, registers):
+        """Never shadow these registers of a device: they change without being written."""
+        self._volatile.setdefault(addr, set()).update(registers)
+
+    def set_shadow(self, addr, reg, value):
+        """Record a register value the device changed on its own (e.g. a self-clearing bit)."""
+        with self.session(PRIORITY_SAFETY):
+            self._shadow.setdefault(addr, {})[reg] = value & 0xFF
+
+    def _shadowed(self, addr, reg):
+        if reg in self._volatile.get(addr, ()):
+            return None
+        return self._shadow.get(addr, {}).get(reg)
+
+    def write_byte(self, addr, reg, value, priority=PRIORITY_SERVO):
+        """
+        Write a byte to a register, unless the register already holds it.
+
+        Returns:
+            bool: True if a transaction was issued.
+        """
+        value &= 0xFF
+        with self.session(priority):
+            if self._shadowed(addr, reg) == value:
+                self.writes_skipped += 1
+                return False
+            self.transactions += 1
+            self.smbus.write_byte_data(addr, reg, value)
+            self._shadow.setdefault(addr, {})[reg] = value
+            return True
+
+    def write_block(self, addr, reg, data, priority=PRIORITY_SERVO):
+        """
+        Write consecutive registers starting at `reg` in a single transaction, unless they
+        already hold `data`.
+
+        Returns:
+            bool: True if a transaction was issued.
+        """
+        data = [value & 0xFF for value in data]
+        with self.session(priority):
+            if all(self._shadowed(addr, reg + i) == value for i, value in enumerate(data)):
+                self.writes_skipped += 1
+                return False
+            self.transactions += 1
+            self.smbus.write_i2c_block_data(addr, reg, data)
+            shadow = self._shadow.setdefault(addr, {})
+            for i, value in enumerate(data):
+                shadow[reg + i] = value
+            return True
+
+    def read_byte(self, addr, reg, priority=PRIORITY_SERVO):
+        """Read a register, from the shadow copy when its value is known."""
+        with self.session(priority):
+            value = self._shadowed(addr, reg)
+            if value is not None:
+                self.reads_shadowed += 1
+                return value
+            self.transactions += 1
+            value = self.smbus.read_byte_data(addr, reg)
+            self._shadow.setdefault(addr, {})[reg] = value
+            return value
+
+    def stats(self):
+        """
+        Return bus usage counters.
+
+        Returns:
+            dict: transactions, writes_skipped, reads_shadowed and, per priority class name,
+                (grants, mean wait in seconds, max wait in seconds).
+        """
+        with self._cond:
+            waits = {PRIORITY_NAMES.get(p, str(p)): (n, total / n, worst)
+                     for p, (n, total, worst) in sorted(self._waits.items())}
+        return {"transactions": self.transactions, "writes_skipped": self.writes_skipped,
+                "reads_shadowed": self.reads_shadowed, "waits": waits}
+
+    def format_stats(self):
+        """Format stats() as a short multi-line summary."""
+        stats = self.stats()
+        lines = [f"I2C: {stats['transactions']} transactions, {stats['writes_skipped']} writes skipped, "
+                 f"{stats['reads_shadowed']} reads from shadow"]
+        for name, (grants, mean, worst) in stats["waits"].items():
+            lines.append(f"  {name:>10}: {grants} grants, queue wait mean {mean * 1e3:.3f} ms, max {worst * 1e3:.3f} ms")
+        return "\n".join(lines)
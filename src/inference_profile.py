@@ -0,0 +1,96 @@
+import json
+import os
+import re
+
+# Written by testing/tune_backend.py and picked up by YOLODetector
+PROFILE_FILE = "inference_profile.json"
+
+def model_family(path):
+    """
+    Name shared by a model and all its exports, e.g. "yolov5nu" for yolov5nu.pt,
+    yolov5nu_ncnn_model and yolov5nu_320.onnx.
+    """
+    name = os.path.basename(os.path.normpath(path))
+    name = re.sub(r"(_ncnn_model|\.onnx|\.torchscript|\.pt)$", "", name)
+    return re.sub(r"_\d+$", "", name)
+
+def load_profile(path=None):
+    """
+    Load an inference profile.
+
+    Args:
+        path (str, optional): Profile file. Defaults to PROFILE_FILE in the working directory,
+            or the SMARTCAR_INFERENCE_PROFILE environment variable if set.
+
+    Returns:
+        dict: The profile, or None if the file does not exist. Model paths, stored relative to
+            the profile file, are resolved to absolute paths.
+    """
+    path = path or os.environ.get("SMARTCAR_INFERENCE_PROFILE", PROFILE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        profile = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    for entry in list(profile["best"].values()) + profile.get("results", []):
+        entry["model"] = os.path.normpath(os.path.join(base, entry["model"]))
+    profile["path"] = path
+    return profile
+
+def save_profile(profile, path=PROFILE_FILE):
+    """
+    Write an inference profile as JSON. Model paths are stored relative to the profile file,
+    so the profile works from any working directory and survives moving the directory.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    profile = dict(profile)
+    profile["best"] = {size: dict(entry, model=os.path.relpath(os.path.abspath(entry["model"]), base))
+                       for size, entry in profile["best"].items()}
+    profile["results"] = [dict(entry, model=os.path.relpath(os.path.abspath(entry["model"]), base))
+                          for entry in profile.get("results", [])]
+    with open(path, "w") as f:
+        json.dump(profile, f, indent=2)
+
+def select_config(profile, model_path, imgsz=None):
+    """
+    Pick the fastest measured configuration for a model.
+
+    Args:
+        profile (dict): Profile from load_profile().
+        model_path (str): The source model or any export of it, e.g. yolov5nu_ncnn_model for a
+            profile made from yolov5nu.pt.
+        imgsz (int, optional): Required input size. Defaults to the profile's default size.
+
+    Returns:
+        dict: Result entry with backend, model, imgsz, threads, p50_ms, p95_ms and fps, or None
+            if the profile does not cover the model or size.
+    """
+    if profile is None:
+        return None
+    if model_family(model_path) != model_family(profile["source"]):
+        return None
+    size = str(imgsz if imgsz is not None else profile["default_imgsz"])
+    return profile["best"].get(size)
+
+def config_for_model(profile, model_path):
+    """
+    Find the fastest measured configuration that uses a given model file.
+
+    Args:
+        profile (dict): Profile from load_profile().
+        model_path (str): Model file, e.g. one of the per-size exports from models_by_size().
+
+    Returns:
+        dict: Result entry, or None if the profile has no configuration for this file.
+    """
+    if profile is None:
+        return None
+    model_path = os.path.normpath(os.path.abspath(model_path))
+    for entry in profile["best"].values():
+        if entry["model"] == model_path:
+            return entry
+    return None
+
+def models_by_size(profile):
+    """Map each measured input size to the fastest model file for it."""
+    return {int(size): entry["model"] for size, entry in profile["best"].items()}
@@ -0,0 +1,132 @@
+import multiprocessing
+import os
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from detections import extract_detections
+from frame_ring import FrameRing
+
+def _worker_main(conn, shm_name, shape, slots, model_path, confidence_threshold, cpus):
+    """Entry point of the inference process: load the model and serve requests from the pipe."""
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    frames = np.ndarray((slots + 1,) + tuple(shape), dtype=np.uint8, buffer=shm.buf)  # Ring slots, then scratch
+    try:
+        from ultralytics import YOLO
+        model = YOLO(model_path, task='detect')
+        conn.send(("ready", model.names))
+        while True:
+            request = conn.recv()
+            if request is None:
+                break
+            slot, class_ids, imgsz, scale = request
+            try:
+                kwargs = {} if imgsz is None else {"imgsz": imgsz}
+                results = model(frames[slot], verbose=False, **kwargs)
+                conn.send(("ok", extract_detections(results[0].boxes, confidence_threshold, class_ids, scale)))
+            except Exception as e:
+                conn.send(("error", repr(e)))
+    except Exception as e:
+        conn.send(("error", repr(e)))
+    finally:
+        del frames
+        shm.close()
+
+class InferenceWorker:
+    """
+    Runs YOLO inference in a separate process so that ultralytics' Python-side work
+    does not hold the control threads' GIL.
+
+    Frames live in a FrameRing placed in shared memory: the capture thread writes into a
+    ring slot and only the slot index crosses the process boundary. Images from outside the
+    ring (e.g. a warm-up frame) are copied into a separate scratch slot after the ring, so
+    they never disturb the capture thread's or the reader's slots. Detection arrays
+    (dtype DETECTION_DTYPE) come back over a pipe.
+    """
+    def __init__(self, model_path, frame_shape, confidence_threshold=0.6, slots=4, cpus=None, start_timeout=120):
+        """
+        Start the worker process and wait for the model to load.
+
+        Args:
+            model_path (str): Path to the YOLO model.
+            frame_shape (tuple): Shape of the BGR frames, (height, width, 3).
+            confidence_threshold (float): Minimum confidence for detections.
+            slots (int): Number of shared-memory frame slots. Defaults to 4.
+            cpus (set, optional): CPU cores to pin the worker to, e.g. {2, 3}. Defaults to None.
+            start_timeout (float): Seconds to wait for the model to load. Defaults to 120.
+        """
+        frame_shape = tuple(frame_shape)
+        size = (slots + 1) * int(np.prod(frame_shape))
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        self.ring = FrameRing(frame_shape, slots, buffer=self._shm.buf)
+        self._scratch_slot = slots
+        self._scratch = np.ndarray(frame_shape, dtype=np.uint8, buffer=self._shm.buf,
+                                   offset=slots * int(np.prod(frame_shape)))
+        self._lock = threading.Lock()  # One request in flight on the pipe, and on the scratch slot
+
+        # Spawn rather than fork so the child does not inherit camera and GPIO threads
+        context = multiprocessing.get_context("spawn")
+        self._conn, child_conn = context.Pipe()
+        self._process = context.Process(
+            target=_worker_main,
+            args=(child_conn, self._shm.name, frame_shape, slots, model_path, confidence_threshold, cpus),
+            name="yolo-inference", daemon=True)
+        self._process.start()
+        child_conn.close()
+
+        if not self._conn.poll(start_timeout):
+            self.close()
+            raise RuntimeError("Inference worker did not start in time")
+        status, payload = self._conn.recv()
+        if status != "ready":
+            self.close()
+            raise RuntimeError(f"Inference worker failed to start: {payload}")
+        self.labels = payload
+
+    def infer(self, image, class_ids=None, imgsz=None, scale=None):
+        """
+        Run inference in the worker process.
+
+        Args:
+            image (numpy.ndarray): BGR frame. Frames that already live in a ring slot are
+                passed by index; anything else is copied into the scratch slot first.
+            class_ids (list, optional): Keep only these class indices. Defaults to None (all classes).
+            imgsz (int or tuple, optional): Model input size. Defaults to None (the model's own).
+            scale (tuple, optional): (x, y) factors applied to the returned boxes. Defaults to None.
+
+        Returns:
+            numpy.ndarray: Detections (dtype DETECTION_DTYPE).
+        """
+        with self._lock:
+            slot = self.ring.slot_of(image)
+            if slot is None:
+                # Not a ring frame: leave the ring's writer/reader bookkeeping alone
+                np.copyto(self._scratch, image)
+                slot = self._scratch_slot
+            self._conn.send((slot, class_ids, imgsz, scale))
+            status, payload = self._conn.recv()  # Blocks without holding the GIL
+        if status != "ok":
+            raise RuntimeError(f"Inference worker error: {payload}")
+        return payload
+
+    def close(self):
+        """Stop the worker process and free the shared memory."""
+        try:
+            if self._process.is_alive():
+                self._conn.send(None)
+                self._process.join(timeout=5)
+            if self._process.is_alive():
+                self._process.terminate()
+        except (BrokenPipeError, OSError):
+            pass
+        self._conn.close()
+        self.ring = None
+        self._scratch = None
+        try:
+            self._shm.close()
+        except BufferError:
+            pass  # Frames still referenced elsewhere; the mapping goes away with them
+        self._shm.unlink()
@@ -1,32 +1,122 @@
 import RPi.GPIO as io
+import pca9685
+from i2c_bus import PRIORITY_MOTOR, PRIORITY_SAFETY
+
+class GPIOPWM:
+    """
+    Software PWM on RPi.GPIO pins. Every input runs its own PWM thread, which costs CPU
+    and jitters when other threads saturate the cores.
+    """
+    def __init__(self, frequency=500):
+        """
+        Args:
+            frequency (int): PWM frequency in Hz. Defaults to 500.
+        """
+        self.frequency = frequency
+
+    def channel(self, pin):
+        """
+        Set up a pin and start its PWM at 0% duty.
+
+        Args:
+            pin (int): BCM GPIO pin.
+
+        Returns:
+            RPi.GPIO.PWM: The running PWM.
+        """
+        io.setup(pin, io.OUT)
+        pwm = io.PWM(pin, self.frequency)
+        pwm.start(0)
+        return pwm
+
+class PCA9685PWM:
+    """
+    Hardware PWM on PCA9685 channels, through the driver shared with the pan-tilt servos.
+    The chip generates the waveform, so a running motor costs no CPU and no jitter; only
+    duty changes reach the bus. All channels share the servos' 60 Hz frequency.
+    """
+    def __init__(self, driver=None, frequency=60):
+        """
+        Args:
+            driver (pca9685.PCA9685, optional): Chip driver. Defaults to the shared one on bus 1.
+            frequency (int): PWM frequency in Hz, configured unless the chip already runs. Defaults to 60.
+        """
+        self.driver = driver if driver is not None else pca9685.get_pca9685()
+        self.driver.configure(frequency)
+
+    def channel(self, number):
+        """
+        Claim a PCA9685 output and drive it fully off.
+
+        Args:
+            number (int): PCA9685 channel (0-15).
+
+        Returns:
+            PCA9685Channel: Object with the RPi.GPIO.PWM duty cycle interface.
+        """
+        channel = PCA9685Channel(self.driver, number)
+        channel.start(0)
+        return channel
+
+class PCA9685Channel:
+    """
+    One PCA9685 output with the ChangeDutyCycle interface of RPi.GPIO.PWM. Writes queue for
+    the bus ahead of servo trims; releasing the input (0%) queues as a safety write, so a
+    stop overtakes pending speed changes.
+    """
+    def __init__(self, driver, number):
+        self.driver = driver
+        self.number = number
+
+    def start(self, duty):
+        self.ChangeDutyCycle(duty)
+
+    def ChangeDutyCycle(self, duty):
+        self.driver.set_duty(self.number, duty, PRIORITY_SAFETY if duty <= 0 else PRIORITY_MOTOR)
+
+    def stop(self):
+        self.ChangeDutyCycle(0)
 
 class MotorController:
-    def __init__(self, in1_pin, in2_pin, en_pin=None, frequency=500):
+    def __init__(self, in1_pin, in2_pin, en_pin=None, frequency=500, pwm=None):
         """
         Initialize the motor controller.
         
         Args:
-            in1_pin (int): GPIO pin for motor input 1.
-            in2_pin (int): GPIO pin for motor input 2.
+            in1_pin (int): GPIO pin for motor input 1, or a PCA9685 channel with the PCA9685PWM backend.
+            in2_pin (int): GPIO pin for motor input 2, or a PCA9685 channel.
             en_pin (int, optional): GPIO pin for motor enable. Defaults to None.
-            frequency (int): PWM frequency in Hz. Defaults to 500.
+            frequency (int): PWM frequency in Hz for the default GPIO backend. Defaults to 500.
+            pwm (GPIOPWM or PCA9685PWM, optional): PWM backend for the inputs. Defaults to GPIOPWM(frequency).
         """
         self.in1_pin = in1_pin
         self.in2_pin = in2_pin
         self.en_pin = en_pin
         self.frequency = frequency
+        self.pwm = pwm if pwm is not None else GPIOPWM(frequency)
 
         io.setmode(io.BCM)
-        io.setup(self.in1_pin, io.OUT)
-        io.setup(self.in2_pin, io.OUT)
         if self.en_pin is not None:
             io.setup(self.en_pin, io.OUT)
             io.output(self.en_pin, io.HIGH)
 
-        self.pwm_in1 = io.PWM(self.in1_pin, self.frequency)
-        self.pwm_in2 = io.PWM(self.in2_pin, self.frequency)
-        self.pwm_in1.start(0)
-        self.pwm_in2.start(0)
+        self.pwm_in1 = self.pwm.channel(self.in1_pin)
+        self.pwm_in2 = self.pwm.channel(self.in2_pin)
+        # Last duty written to each input. RPi.GPIO takes its PWM thread lock and may restart
+        # the PWM period on every ChangeDutyCycle (the PCA9685 costs a bus transaction), so
+        # unchanged duties are not rewritten.
+        self._duty = {self.pwm_in1: 0, self.pwm_in2: 0}
+        self.writes_issued = 0
+        self.writes_suppressed = 0
+
+    def _write(self, pwm, duty):
+        """Change one input's duty cycle if it differs from the last one written."""
+        if self._duty[pwm] == duty:
+            self.writes_suppressed += 1
+            return
+        pwm.ChangeDutyCycle(duty)
+        self._duty[pwm] = duty
+        self.writes_issued += 1
 
     def set_motor_speed(self, direction, duty):
         """
@@ -38,16 +128,30 @@ class MotorController:
         """
         #print(f"Setting motor to {'forward' if direction == 'f' else 'reverse'} at {duty}% duty cycle")
         if direction == "f":
-            self.pwm_in1.ChangeDutyCycle(duty)
-            self.pwm_in2.ChangeDutyCycle(0)
+            # Release the other input first so the bridge never sees both driven
+            self._write(self.pwm_in2, 0)
+            self._write(self.pwm_in1, duty)
         elif direction == "r":
-            self.pwm_in1.ChangeDutyCycle(0)
-            self.pwm_in2.ChangeDutyCycle(duty)
+            self._write(self.pwm_in1, 0)
+            self._write(self.pwm_in2, duty)
 
     def stop_motor(self):
         """Stop the motor by setting both PWM duty cycles to 0."""
-        self.pwm_in1.ChangeDutyCycle(0)
-        self.pwm_in2.ChangeDutyCycle(0)
+        self._write(self.pwm_in1, 0)
+        self._write(self.pwm_in2, 0)
+
+    def get_state(self):
+        """
+        Return the last applied command.
+
+        Returns:
+            tuple: (direction, duty) with direction "f", "r" or None when stopped.
+        """
+        if self._duty[self.pwm_in1]:
+            return "f", self._duty[self.pwm_in1]
+        if self._duty[self.pwm_in2]:
+            return "r", self._duty[self.pwm_in2]
+        return None, 0
         
 if __name__ == "__main__":
     """
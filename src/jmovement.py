@@ -1,17 +1,122 @@
-from jmotor import MotorController
+from jmotor import GPIOPWM, MotorController, PCA9685PWM
 import RPi.GPIO as io
+import threading
 import time
+from metrics import stage_metrics
 
 io.setwarnings(False)
 
 class MovementController:
-    def __init__(self):
+    # Motor driver inputs (in1, in2) per backend; the enable pins stay on GPIO
+    GPIO_PINS = ((24, 23), (27, 22))
+    PCA9685_CHANNELS = ((8, 9), (10, 11))  # Channels 0 and 1 drive the pan-tilt servos
+    ENABLE_PINS = (25, 26)
+
+    def __init__(self, pwm_backend="gpio"):
         """
         Initialize the movement controller with two motors.
-        Motor 1 (left motor) and Motor 2 (right motor) are controlled independently.
+        Motor 1 (right wheel) and Motor 2 (left wheel) are controlled independently;
+        turn_left() runs motor 1 forward and motor 2 in reverse.
+
+        Args:
+            pwm_backend (str): "gpio" for RPi.GPIO software PWM on GPIO_PINS, or "pca9685" for
+                hardware PWM on PCA9685_CHANNELS of the pan-tilt board. Defaults to "gpio".
+        """
+        if pwm_backend == "gpio":
+            pwm, inputs = GPIOPWM(frequency=500), self.GPIO_PINS
+        elif pwm_backend == "pca9685":
+            pwm, inputs = PCA9685PWM(), self.PCA9685_CHANNELS
+        else:
+            raise ValueError(f"Unknown PWM backend: {pwm_backend}")
+        self.pwm_backend = pwm_backend
+        self.motor1 = MotorController(*inputs[0], en_pin=self.ENABLE_PINS[0], pwm=pwm)
+        self.motor2 = MotorController(*inputs[1], en_pin=self.ENABLE_PINS[1], pwm=pwm)
+        # Serializes motor writes so an emergency stop cannot interleave with a command
+        self._motor_lock = threading.Lock()
+        self._emergency_stop = threading.Event()
+        # Acceleration-limited wheel speeds for drive(); started by start_ramp()
+        self.ramp = DriveRamp(self)
+
+    def _drive(self, direction1, direction2, speed):
+        """
+        Apply a drive command unless an emergency stop is latched.
+
+        Returns:
+            bool: True if the command was applied.
+        """
+        sign = {"f": 1, "r": -1}
+        return self.apply(sign[direction2] * speed, sign[direction1] * speed)
+
+    def apply(self, left, right):
+        """
+        Apply signed wheel speeds to all four PWM inputs in one locked pass, unless an
+        emergency stop is latched. Inputs whose duty does not change are not written.
+
+        Args:
+            left (float): Left wheel speed in percent, -100 (full reverse) to 100 (full forward).
+            right (float): Right wheel speed in percent.
+
+        Returns:
+            bool: True if the speeds were applied.
+        """
+        start = time.perf_counter()
+        with self._motor_lock:
+            if self._emergency_stop.is_set():
+                return False
+            self._write_wheels(left, right)
+            # Direct commands bypass the ramp; continue any later ramp from the speeds just applied
+            self.ramp.sync(left, right)
+        stage_metrics.record("motor_command", time.perf_counter() - start)
+        return True
+
+    def _write_wheels(self, left, right):
+        """Write signed wheel speeds; called with _motor_lock held."""
+        self.motor1.set_motor_speed(direction="f" if right >= 0 else "r", duty=abs(right))
+        self.motor2.set_motor_speed(direction="f" if left >= 0 else "r", duty=abs(left))
+
+    def pwm_write_counts(self):
+        """
+        Count duty cycle writes across both motors.
+
+        Returns:
+            tuple: (issued, suppressed) where suppressed writes matched the last duty and were skipped.
+        """
+        motors = (self.motor1, self.motor2)
+        return (sum(motor.writes_issued for motor in motors), sum(motor.writes_suppressed for motor in motors))
+
+    def drive(self, linear, angular):
+        """
+        Set a continuous drive command; the ramp moves the wheels to it within the
+        acceleration limit. Returns immediately.
+
+        Args:
+            linear (float): Forward speed in percent (-100 to 100).
+            angular (float): Turn rate as a wheel speed difference in percent; positive turns left.
         """
-        self.motor1 = MotorController(in1_pin=24, in2_pin=23, en_pin=25)
-        self.motor2 = MotorController(in1_pin=27, in2_pin=22, en_pin=26)
+        left, right = linear - angular, linear + angular
+        # Keep the turn ratio when a wheel would exceed full speed
+        scale = max(1.0, abs(left) / 100, abs(right) / 100)
+        self.ramp.set_targets(left / scale, right / scale)
+
+    def start_ramp(self, max_acceleration=300.0, tick_rate=50):
+        """
+        Start the background ramp that applies drive() commands.
+
+        Args:
+            max_acceleration (float): Wheel speed change limit in percent per second. Defaults to 300.
+            tick_rate (float): Update rate in Hz. Defaults to 50.
+
+        Returns:
+            DriveRamp: The running ramp.
+        """
+        self.ramp.max_acceleration = max_acceleration
+        self.ramp.tick_rate = tick_rate
+        self.ramp.start()
+        return self.ramp
+
+    def stop_ramp(self):
+        """Stop the background ramp, leaving the motors at their current speeds."""
+        self.ramp.stop()
 
     def move_forward(self, speed):
         """
@@ -19,10 +124,12 @@ class MovementController:
         
         Args:
             speed (int): Speed as a percentage (0-100).
+
+        Returns:
+            bool: False if the command was refused because an emergency stop is latched.
         """
         #print(f"Moving forward at {speed}% speed.")
-        self.motor1.set_motor_speed(direction="f", duty=speed)
-        self.motor2.set_motor_speed(direction="f", duty=speed)
+        return self._drive("f", "f", speed)
 
     def move_backward(self, speed):
         """
@@ -30,10 +137,12 @@ class MovementController:
         
         Args:
             speed (int): Speed as a percentage (0-100).
+
+        Returns:
+            bool: False if the command was refused because an emergency stop is latched.
         """
         #print(f"Moving backward at {speed}% speed.")
-        self.motor1.set_motor_speed(direction="r", duty=speed)
-        self.motor2.set_motor_speed(direction="r", duty=speed)
+        return self._drive("r", "r", speed)
 
     def turn_left(self, speed):
         """
@@ -41,10 +150,12 @@ class MovementController:
         
         Args:
             speed (int): Speed as a percentage (0-100).
+
+        Returns:
+            bool: False if the command was refused because an emergency stop is latched.
         """
         #print(f"Turning left at {speed}% speed.")
-        self.motor1.set_motor_speed(direction="f", duty=speed)
-        self.motor2.set_motor_speed(direction="r", duty=speed)
+        return self._drive("f", "r", speed)
 
     def turn_right(self, speed):
         """
@@ -52,26 +163,149 @@ class MovementController:
         
         Args:
             speed (int): Speed as a percentage (0-100).
+
+        Returns:
+            bool: False if the command was refused because an emergency stop is latched.
         """
         #print(f"Turning right at {speed}% speed.")
-        self.motor1.set_motor_speed(direction="r", duty=speed)
-        self.motor2.set_motor_speed(direction="f", duty=speed)
+        return self._drive("r", "f", speed)
 
     def stop(self):
         """
         Stop both motors by setting their speed to 0.
         """
         #print("Stopping all motors.")
-        self.motor1.stop_motor()
-        self.motor2.stop_motor()
+        with self._motor_lock:
+            self.motor1.stop_motor()
+            self.motor2.stop_motor()
+            self.ramp.sync(0, 0)
+
+    def emergency_stop(self):
+        """
+        Cut both motors and latch: drive commands are refused until release_emergency_stop().
+        Safe to call from any thread.
+        """
+        self._emergency_stop.set()
+        with self._motor_lock:
+            self.motor1.stop_motor()
+            self.motor2.stop_motor()
+            self.ramp.sync(0, 0)  # Ramp up from standstill once released
+
+    def release_emergency_stop(self):
+        """Allow drive commands again after an emergency stop."""
+        self._emergency_stop.clear()
+
+    def is_emergency_stopped(self):
+        """Return True while an emergency stop is latched."""
+        return self._emergency_stop.is_set()
 
     def cleanup(self):
         """
         Clean up both motors.
         """
         #print("Cleaning up all motors.")
-        self.motor1.stop_motor()
-        self.motor2.stop_motor()
+        self.ramp.stop()
+        with self._motor_lock:
+            self.motor1.stop_motor()
+            self.motor2.stop_motor()
+            self.ramp.sync(0, 0)
+
+class DriveRamp:
+    """
+    Moves the wheel speeds toward drive() targets on its own thread.
+
+    Each wheel's speed changes by at most max_acceleration percent per second, so a new
+    command blends into the current motion instead of stopping and restarting the motors.
+    The motors are only written while a wheel is still ramping. The ramp shares the
+    controller's motor lock, so a stop or emergency stop can never be overwritten by a
+    ramp step computed before it.
+    """
+    def __init__(self, movement, max_acceleration=300.0, tick_rate=50):
+        """
+        Initialize the ramp at standstill.
+
+        Args:
+            movement (MovementController): Controller whose wheels are driven.
+            max_acceleration (float): Wheel speed change limit in percent per second. Defaults to 300.
+            tick_rate (float): Update rate in Hz. Defaults to 50.
+        """
+        self.movement = movement
+        self.max_acceleration = max_acceleration
+        self.tick_rate = tick_rate
+        self._lock = movement._motor_lock
+        self._speed = [0.0, 0.0]  # (left, right) currently applied
+        self._target = [0.0, 0.0]
+        self._running = False
+        self._thread = None
+
+    def set_targets(self, left, right):
+        """Set the wheel speeds to ramp to. Returns immediately."""
+        with self._lock:
+            self._target = [float(left), float(right)]
+
+    def sync(self, left, right):
+        """Record speeds applied outside the ramp and hold them as the target; called with the motor lock held."""
+        self._speed = [float(left), float(right)]
+        self._target = [float(left), float(right)]
+
+    def speeds(self):
+        """Return the (left, right) wheel speeds currently applied."""
+        with self._lock:
+            return tuple(self._speed)
+
+    def targets(self):
+        """Return the (left, right) wheel speeds being ramped to."""
+        with self._lock:
+            return tuple(self._target)
+
+    def step(self, dt):
+        """
+        Advance both wheels toward their targets by `dt` seconds and write the new speeds.
+
+        Returns:
+            bool: True if the speeds changed.
+        """
+        max_change = self.max_acceleration * dt
+        start = time.perf_counter()
+        with self._lock:
+            if self._speed == self._target:
+                return False
+            if self.movement.is_emergency_stopped():
+                self.sync(0, 0)  # The motors are cut; start from standstill once released
+                return False
+            for wheel in range(2):
+                error = self._target[wheel] - self._speed[wheel]
+                self._speed[wheel] += max(-max_change, min(max_change, error))
+            self.movement._write_wheels(*self._speed)
+        stage_metrics.record("motor_command", time.perf_counter() - start)
+        return True
+
+    def start(self):
+        """Start the ramp thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="drive-ramp", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the ramp thread."""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def _run(self):
+        period = 1.0 / self.tick_rate
+        next_tick = time.monotonic()
+        while self._running:
+            self.step(period)
+            next_tick += period
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.monotonic()  # Fell behind; don't try to catch up
 
 if __name__ == "__main__":
     """
@@ -0,0 +1,158 @@
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+
+from car_logging import get_logger
+
+logger = get_logger("latency_governor")
+
+# One setting of the knobs the governor turns. Cheaper points come later in a ladder.
+OperatingPoint = namedtuple("OperatingPoint", ["imgsz", "detect_interval", "model_path"])
+
+def default_ladder(model_path, lite_model_path=None, sizes=(640, 480, 416, 320, 256), model_for_size=None):
+    """
+    Build a ladder of operating points from the most accurate to the cheapest.
+
+    Each step reduces the cost of the average frame: first the input size shrinks, then
+    detection runs less often, and finally the lighter model variant takes over.
+
+    Args:
+        model_path (str): Path to the main YOLO model. It must accept every size in `sizes`.
+        lite_model_path (str, optional): Path to a lower-cost model variant. Defaults to None.
+        sizes (tuple): Model input sizes to step through, largest first.
+        model_for_size (dict, optional): Model file to use per input size, e.g. the fastest
+            export of each size from an inference profile. Defaults to None (model_path throughout).
+
+    Returns:
+        list: OperatingPoint entries.
+    """
+    model_for_size = model_for_size or {}
+    ladder = [OperatingPoint(size, 1, model_for_size.get(size, model_path)) for size in sizes[:-1]]
+    smallest = sizes[-1]
+    smallest_model = model_for_size.get(smallest, model_path)
+    ladder += [OperatingPoint(smallest, interval, smallest_model) for interval in (1, 2, 3, 5)]
+    if lite_model_path is not None:
+        ladder += [OperatingPoint(smallest, interval, lite_model_path) for interval in (3, 5)]
+    return ladder
+
+class LatencyGovernor:
+    """
+    Keeps the object tracking pipeline within a latency budget.
+
+    Per-frame latency (capture to servo command) is collected in windows. When the 90th
+    percentile of a window exceeds the budget for `patience` windows in a row, the governor
+    moves one step down the ladder; when it stays below `lower` times the budget for
+    `hold_time` seconds, it moves one step back up. The window after every change is
+    discarded, as it still contains frames processed at the old setting.
+    """
+    def __init__(self, tracker, budget=0.15, ladder=None, window=30, lower=0.6, patience=2, hold_time=5.0,
+                 log=None):
+        """
+        Initialize the governor, load every model in the ladder and apply the first operating point.
+
+        Args:
+            tracker (ObjectTracker): Tracker whose detector and box tracker are adjusted.
+            budget (float): Target 90th-percentile frame latency in seconds. Defaults to 0.15.
+            ladder (list, optional): OperatingPoint entries, most accurate first. Defaults to
+                default_ladder() for the tracker's model.
+            window (int): Frames per evaluation window. Defaults to 30.
+            lower (float): Step back up when latency stays below this fraction of the budget. Defaults to 0.6.
+            patience (int): Consecutive windows over budget before stepping down. Defaults to 2.
+            hold_time (float): Seconds below `lower` required before stepping up. Defaults to 5.
+            log (callable, optional): Receives a message for every change. Defaults to logging at INFO.
+        """
+        self.tracker = tracker
+        self.budget = budget
+        self.ladder = ladder or default_ladder(tracker.detector.model_path)
+        self.window = window
+        self.lower = lower
+        self.patience = patience
+        self.hold_time = hold_time
+        self.log = log or logger.info
+        self.level = 0
+        self.changes = []  # (time, old level, new level, p50, p90)
+        self._samples = deque(maxlen=window)
+        self._over = 0
+        self._under_since = None
+        self._discard = False
+        self._window_start = None
+        # Load the variants now: loading one on the tracking thread would stall it just
+        # when it is already over budget
+        for model_path in dict.fromkeys(point.model_path for point in self.ladder):
+            tracker.detector.preload_model(model_path)
+        self._apply(self.ladder[0])
+
+    @property
+    def point(self):
+        """The operating point in use."""
+        return self.ladder[self.level]
+
+    def _apply(self, point):
+        detector = self.tracker.detector
+        detector.set_model(point.model_path)
+        detector.imgsz = point.imgsz
+        box_tracker = self.tracker.box_tracker
+        box_tracker.min_detect_interval = point.detect_interval
+        box_tracker.detect_interval = max(box_tracker.detect_interval, point.detect_interval)
+        if not box_tracker.adaptive:
+            box_tracker.detect_interval = point.detect_interval
+
+    def record(self, latency, now=None):
+        """
+        Record the latency of one frame and adjust the operating point if needed.
+
+        Args:
+            latency (float): Time from frame capture to the servo command, in seconds.
+            now (float, optional): Current time. Defaults to time.monotonic().
+
+        Returns:
+            bool: True if the operating point changed.
+        """
+        now = time.monotonic() if now is None else now
+        if self._window_start is None:
+            self._window_start = now
+        self._samples.append(latency)
+        if len(self._samples) < self.window:
+            return False
+
+        samples = np.array(self._samples)
+        self._samples.clear()
+        elapsed, self._window_start = now - self._window_start, now
+        if self._discard:
+            self._discard = False  # Frames from before the last change
+            return False
+        p50, p90 = np.percentile(samples, [50, 90])
+
+        if p90 > self.budget:
+            self._under_since = None
+            self._over += 1
+            if self._over >= self.patience and self.level < len(self.ladder) - 1:
+                return self._change(self.level + 1, now, p50, p90, elapsed)
+            return False
+        self._over = 0
+        if p90 < self.lower * self.budget:
+            if self._under_since is None:
+                self._under_since = now
+            elif now - self._under_since >= self.hold_time and self.level > 0:
+                return self._change(self.level - 1, now, p50, p90, elapsed)
+        else:
+            self._under_since = None
+        return False
+
+    def _change(self, level, now, p50, p90, elapsed):
+        old_level, old = self.level, self.point
+        new = self.ladder[level]
+        self._apply(new)  # If this raises, the governor stays at the level actually in use
+        self.level = level
+        self._over = 0
+        self._under_since = None
+        self._discard = True
+        self.changes.append((now, old_level, level, p50, p90))
+        fps = self.window / elapsed if elapsed > 0 else float("inf")
+        direction = "down" if level > old_level else "up"
+        self.log(f"Latency governor: stepping {direction} to imgsz={new.imgsz} detect_interval={new.detect_interval} "
+                 f"model={new.model_path} (was imgsz={old.imgsz} detect_interval={old.detect_interval} "
+                 f"model={old.model_path}); frame latency p50={p50 * 1000:.0f} ms p90={p90 * 1000:.0f} ms, "
+                 f"budget {self.budget * 1000:.0f} ms, {fps:.1f} fps")
+        return True
@@ -1,83 +1,227 @@
+from startup import startup_timeline
 from ultrasonic_sensor import HCSR04
-from object_tracker import ObjectTracker
 from jmovement import MovementController
+from control_bus import ControlBus, DistanceReading, LatencyTracker, MotorCommand, ServoState
+from safety import EmergencyStop
+from metrics import stage_metrics
+from car_logging import get_logger, install_level_signal, setup_logging, shutdown_logging
+import math
+import os
 import time
 import threading
 
+logger = get_logger("main")
+
+def steering_command(distance, pan_angle, emergency_stopped, cruise_speed=60, turn_gain=1.5, deadband=3,
+                     turn_in_place=45, stop_distance=10, slow_distance=40):
+    """
+    Map the heading to the tracked object and the obstacle distance to a drive command.
+
+    The camera pans to keep the object centered, so the pan angle is the heading error.
+    The turn rate is proportional to it; forward speed falls off as the error grows (the car
+    turns in place beyond `turn_in_place`) and as an obstacle gets closer.
+
+    Args:
+        distance (float): Latest filtered obstacle distance in cm, or None (or NaN) while the
+            sensor is not answering, which stops the car.
+        pan_angle (float): Pan offset from straight ahead in degrees (PanTiltController.get_pan_angle());
+            positive when the camera looks left, since the aimer lowers pan for targets right of center.
+        emergency_stopped (bool): Whether the emergency stop is latched.
+        cruise_speed (float): Forward speed in percent with the object dead ahead. Defaults to 60.
+        turn_gain (float): Wheel speed difference in percent per degree of heading error. Defaults to 1.5.
+        deadband (float): Heading errors below this many degrees drive straight. Defaults to 3.
+        turn_in_place (float): Heading error in degrees at which forward speed reaches zero. Defaults to 45.
+        stop_distance (float): Stop below this distance in cm. Defaults to 10.
+        slow_distance (float): Start slowing down below this distance in cm. Defaults to 40.
+
+    Returns:
+        tuple: (linear, angular) for MovementController.drive(); (0, 0) to stop.
+    """
+    if emergency_stopped or distance is None or math.isnan(distance) or distance < stop_distance:
+        return 0.0, 0.0
+    error = pan_angle if abs(pan_angle) >= deadband else 0.0
+    angular = max(-100.0, min(100.0, turn_gain * error))
+    linear = cruise_speed * max(0.0, 1 - abs(error) / turn_in_place)
+    linear *= min(1.0, (distance - stop_distance) / (slow_distance - stop_distance))
+    return linear, angular
+
 class SmartCarSystem:
-    def __init__(self):
-        self.ultrasonic_sensor = HCSR04(trigger_pin=17, echo_pin=18)
-        self.movement_controller = MovementController()
-        self.object_tracker = ObjectTracker(model_path="yolov5nu_ncnn_model", object="person")
+    def __init__(self, record_dir=None, model_path="yolov5nu_ncnn_model", parallel_startup=True):
+        """
+        Initialize the sensors, actuators and the bus connecting the control threads.
+
+        Independent subsystems are brought up concurrently, so the ultrasonic sensor's settle
+        time, the camera start, the model load and the PCA9685 reset overlap instead of adding
+        up. The detector runs one warm-up inference before the control loops go live.
+
+        Args:
+            record_dir (str, optional): Record a flight log (see flight_recorder) to this directory;
+                "" for a timestamped directory under recordings/. Defaults to None (no recording).
+            model_path (str): YOLO model for the object tracker. Defaults to "yolov5nu_ncnn_model".
+            parallel_startup (bool): Bring the subsystems up concurrently. Defaults to True.
+        """
+        self.bus = ControlBus()
+        self.latency = LatencyTracker()
         self.distance = None
         self.running = True
+        started = startup_timeline.run({
+            "ultrasonic": lambda: HCSR04(trigger_pin=17, echo_pin=18),
+            "motors": self._start_motors,
+            "object tracker": lambda: self._start_tracker(record_dir, model_path, parallel_startup),
+        }, parallel=parallel_startup)
+        self.ultrasonic_sensor = started["ultrasonic"]
+        self.movement_controller, self.emergency_stop = started["motors"]
+        self.recorder, self.object_tracker = started["object tracker"]
+        logger.info("Startup phases:\n%s", startup_timeline.format_summary())
+
+    def _start_motors(self):
+        """Create the movement controller and the emergency stop that guards it."""
+        # SMARTCAR_MOTOR_PWM=pca9685 drives the motor inputs from PCA9685 channels 8-11 instead of GPIO soft PWM
+        movement_controller = MovementController(pwm_backend=os.environ.get("SMARTCAR_MOTOR_PWM", "gpio"))
+        emergency_stop = EmergencyStop(movement_controller, trip_distance=10, release_distance=15)
+        return movement_controller, emergency_stop
+
+    def _start_tracker(self, record_dir, model_path, parallel_init):
+        """Create the flight recorder and the object tracker, and warm the detector up."""
+        # Imported here so cv2, ultralytics and torch load while the other subsystems start
+        from flight_recorder import FlightRecorder
+        from object_tracker import ObjectTracker
+        recorder = None
+        if record_dir is not None:
+            recorder = FlightRecorder(self.bus, record_dir or None)
+        object_tracker = ObjectTracker(model_path=model_path, object="person", bus=self.bus,
+                                       detect_interval=3, adaptive_interval=True, recorder=recorder,
+                                       parallel_init=parallel_init)
+        object_tracker.warm_up()
+        return recorder, object_tracker
+
+    def on_distance(self, distance, timestamp):
+        """Sampler callback: publish the latest filtered distance, or None while the sensor is not answering."""
+        self.distance = distance
+        self.bus.publish(DistanceReading(distance, timestamp))
 
     def ultrasonic_thread(self):
+        subscription = self.bus.subscribe(DistanceReading)
         try:
+            # The sensor samples on its own thread and publishes through on_distance.
+            # Raw readings go straight to the emergency stop, bypassing the filter and the bus.
+            self.ultrasonic_sensor.start_sampler(rate_hz=10, callback=self.on_distance,
+                                                 raw_callback=self.emergency_stop.update)
             while self.running:
-                self.distance = self.ultrasonic_sensor.get_distance()
-                if self.distance > 10:
-                    print(f"Distance: {self.distance} cm")
-                time.sleep(0.1)
+                for reading in subscription.get(timeout=0.5):
+                    if reading.distance is None:
+                        logger.warning("Ultrasonic sensor is not answering.")
+                    elif reading.distance > 10:
+                        logger.info("Distance: %s cm", reading.distance)
         finally:
-            print("Ultrasonic thread exiting...")
+            subscription.close()
+            self.ultrasonic_sensor.stop_sampler()
+            logger.info("Ultrasonic thread exiting...")
 
     def object_tracking_thread(self):
         try:
             while self.running:
+                # Paced by the camera: track_object waits for the next captured frame
                 self.object_tracker.track_object()
-                time.sleep(0.1)
         finally:
-            print("Object tracking thread exiting...")
+            logger.info("Object tracking thread exiting...")
+
+    def command_motors(self, linear, angular, origin):
+        """Issue a drive command and record the latency from the sensor data that caused it."""
+        if linear == 0 and angular == 0:
+            self.movement_controller.stop()  # Immediately, not ramped
+            action = "stop"
+        else:
+            self.movement_controller.drive(linear, angular)
+            action = "drive"
+        self.bus.publish(MotorCommand(action, linear, origin, angular))
+        self.latency.record(f"sensor->motor ({action})", origin)
+        startup_timeline.milestone("first motor command")
 
     def movement_thread(self):
-        was_stopped = False
+        # Wake on every new distance reading or servo update instead of polling
+        subscription = self.bus.subscribe(DistanceReading, ServoState)
+        distance = None  # None until the first reading, and while the sensor is not answering
+        have_distance = False
+        pan_angle = self.object_tracker.pan_tilt.get_pan_angle()
+        current = None  # (linear, angular) last commanded
+        trips = self.emergency_stop.trips
+        self.movement_controller.start_ramp()
         try:
             while self.running:
-                if self.distance is not None:
-                    if self.distance < 10:
-                        if not was_stopped:
-                            print("Obstacle detected! Stopping motors.")
-                            was_stopped = True
-                            self.movement_controller.stop()
-                    else:
-                            if was_stopped:
-                                print("Obstacle cleared. Resuming movement.")
-                                was_stopped = False
-                            print("Object not centered. Adjusting position.")
-                            pan_angle = self.object_tracker.pan_tilt.get_pan_angle()
-                            print(f"Pan angle: {pan_angle} degrees")
-                            if pan_angle > 25:  # Object is to the right
-                                print("Object is to the right. Turning right.")
-                                self.movement_controller.stop()
-                                self.movement_controller.turn_right(100)  # Turn right at 100% speed  
-                                time.sleep(0.1)  # Pause briefly to reset
-                            elif pan_angle < 0:  # Object is to the left
-                                print("Object is to the left. Turning left.")
-                                self.movement_controller.stop()
-                                self.movement_controller.turn_left(100)  # Turn left at 100% speed
-                                time.sleep(0.1)  # Pause briefly to reset
-                            else:
-                                print("Object centered. Moving forward.")
-                                self.movement_controller.stop()
-                                self.movement_controller.move_forward(100)  # Move forward at 60% speed
-                                time.sleep(0.1)  # Pause briefly to reset
-                                
-                time.sleep(0.1)
+                messages = subscription.get(timeout=0.5)
+                if not messages:
+                    continue
+                origin = max(message.origin for message in messages)
+                for message in messages:
+                    if isinstance(message, DistanceReading):
+                        distance = message.distance
+                        have_distance = True
+                    elif isinstance(message, ServoState):
+                        pan_angle = message.pan_angle
+                if not have_distance:
+                    continue
+                if self.emergency_stop.trips != trips:
+                    # The emergency stop cut the motors behind our back; re-issue the next command
+                    trips = self.emergency_stop.trips
+                    current = None
+
+                linear, angular = steering_command(distance, pan_angle, self.emergency_stop.latched)
+                command = (round(linear), round(angular))  # Ignore sub-percent changes
+                if command == current:
+                    continue  # Motors already heading there
+                if command == (0, 0) and distance is None:
+                    logger.warning("No distance reading! Stopping motors.")
+                elif command == (0, 0):
+                    logger.warning("Obstacle detected! Stopping motors.")
+                elif current == (0, 0):
+                    logger.info("Obstacle cleared. Resuming movement.")
+                else:
+                    logger.debug("Steering: pan angle %.1f degrees -> linear %d%%, angular %d%%", pan_angle, *command)
+                self.command_motors(*command, origin)
+                current = command
         finally:
-            print("Movement thread exiting...")
+            subscription.close()
+            logger.info("Movement thread exiting...")
+
+    def print_latency_summary(self):
+        """Log sensor-to-actuator latency percentiles."""
+        for name, (count, p50, p95, worst) in sorted(self.latency.summary().items()):
+            logger.info("%s: n=%d p50=%.1f ms p95=%.1f ms max=%.1f ms", name, count, p50, p95, worst)
 
     def cleanup(self):
-        print("Cleaning up resources...")
+        logger.info("Cleaning up resources...")
         try:
             self.ultrasonic_sensor.cleanup()
             self.movement_controller.cleanup()
+            self.object_tracker.cleanup()
+            if self.recorder is not None:
+                self.recorder.close()
         except Exception as e:
-            print(f"Error during cleanup: {e}")
-        print("System cleanup complete.")
+            logger.exception("Error during cleanup: %s", e)
+        self.print_latency_summary()
+        issued, suppressed = self.movement_controller.pwm_write_counts()
+        logger.info("Motor PWM writes: %d issued, %d suppressed as unchanged", issued, suppressed)
+        logger.info("%s", self.object_tracker.pan_tilt.bus.format_stats())
+        logger.info("Stage timings:\n%s", stage_metrics.format_summary())
+        logger.info("System cleanup complete.")
 
 def main():
-    smart_car = SmartCarSystem()
+    # Console output goes through a queue and a writer thread so the control loops never block on it.
+    # SMARTCAR_LOG_LEVEL=WARNING for a quieter console, or kill -USR2 <pid> to toggle DEBUG at runtime.
+    setup_logging()
+    install_level_signal()
+    # SMARTCAR_RECORD=<dir> (or empty for recordings/flight-<time>) records a flight log for testing/replay_flight.py
+    # SMARTCAR_SERIAL_STARTUP=1 brings the subsystems up one after another, for comparison
+    smart_car = SmartCarSystem(record_dir=os.environ.get("SMARTCAR_RECORD"),
+                               parallel_startup=not os.environ.get("SMARTCAR_SERIAL_STARTUP"))
+
+    # Per-stage timings: curl http://localhost:9108/metrics, or kill -USR1 <pid> for a dump to stderr
+    stage_metrics.install_signal_handler()
+    try:
+        stage_metrics.start_http_server()
+    except OSError as e:
+        logger.warning("Metrics endpoint not started: %s", e)
 
     # Create threads for each system
     ultrasonic_thread = threading.Thread(target=smart_car.ultrasonic_thread, daemon=True)
@@ -85,24 +229,30 @@ def main():
     movement_thread = threading.Thread(target=smart_car.movement_thread, daemon=True)
 
     try:
-        print("Smart car system initialized. Starting threads...")
+        logger.info("Smart car system initialized. Starting threads...")
         # Start threads
         ultrasonic_thread.start()
         tracking_thread.start()
         movement_thread.start()
+        startup_timeline.milestone("control loops live")
 
         # Keep the main thread alive
+        reported = False
         while True:
             time.sleep(1)
+            if not reported and "first detection" in startup_timeline.milestones:
+                logger.info("Startup timeline:\n%s", startup_timeline.format_summary())
+                reported = True
 
     except KeyboardInterrupt:
-        print("\nExiting program.")
+        logger.info("Exiting program.")
         smart_car.running = False
         ultrasonic_thread.join(timeout=1)
         tracking_thread.join(timeout=1)
         movement_thread.join(timeout=1)
     finally:
         smart_car.cleanup()
+        shutdown_logging()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,188 @@
+import math
+import signal
+import sys
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Bucket upper bounds in seconds: 8 per decade from 1 us to 10 s
+BUCKET_BOUNDS = [10 ** (exponent / 8) * 1e-6 for exponent in range(0, 57)]
+
+class StageHistogram:
+    """
+    Fixed-size latency histogram for one pipeline stage.
+
+    Recording is a bisect and two additions with no lock. Each stage is normally recorded
+    from a single thread; if two threads record the same stage at the same moment, an
+    increment can be lost, which is acceptable for monitoring.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)  # Last bucket holds everything above 10 s
+        self.total = 0.0
+
+    def record(self, seconds):
+        """Add one duration in seconds."""
+        self.counts[bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.total += seconds
+
+    def snapshot(self):
+        """Return (bucket counts, count, sum) copied at one point in time."""
+        counts = list(self.counts)
+        return counts, sum(counts), self.total
+
+    @staticmethod
+    def quantile(counts, q):
+        """
+        Estimate a quantile from bucket counts, interpolating within the bucket.
+
+        Args:
+            counts (list): Bucket counts from snapshot().
+            q (float): Quantile in [0, 1].
+
+        Returns:
+            float: Duration in seconds, or NaN if there are no samples.
+        """
+        count = sum(counts)
+        if not count:
+            return math.nan
+        rank = q * count
+        cumulative = 0
+        for index, bucket_count in enumerate(counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                lower = BUCKET_BOUNDS[index - 1] if index > 0 else 0.0
+                upper = BUCKET_BOUNDS[index] if index < len(BUCKET_BOUNDS) else BUCKET_BOUNDS[-1]
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return BUCKET_BOUNDS[-1]
+
+class StageMetrics:
+    """
+    Per-stage duration histograms for the capture, inference and control paths.
+
+    Usage:
+        start = time.perf_counter()
+        ...
+        stage_metrics.record("inference", time.perf_counter() - start)
+
+    The histograms can be served in Prometheus text format over HTTP (start_http_server)
+    and dumped to stderr on a signal (install_signal_handler).
+    """
+    def __init__(self):
+        self._lock = threading.Lock()  # Taken to add a stage and to copy the stage list, never per record
+        self.stages = {}
+        self._server = None
+
+    def histogram(self, stage):
+        """Return the histogram of a stage, creating it on first use."""
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.stages.setdefault(stage, StageHistogram(stage))
+        return histogram
+
+    def record(self, stage, seconds):
+        """Record one duration of a stage in seconds."""
+        histogram = self.stages.get(stage) or self.histogram(stage)
+        histogram.record(seconds)
+
+    def _sorted_stages(self):
+        """Copy the (stage, histogram) pairs under the lock, so a stage added meanwhile cannot break iteration."""
+        with self._lock:
+            return sorted(self.stages.items())
+
+    def summary(self):
+        """
+        Summarize every stage.
+
+        Returns:
+            dict: {stage: (count, p50, p95, p99)} with durations in milliseconds.
+        """
+        result = {}
+        for stage, histogram in self._sorted_stages():
+            counts, count, _ = histogram.snapshot()
+            result[stage] = (count,) + tuple(StageHistogram.quantile(counts, q) * 1000 for q in (0.5, 0.95, 0.99))
+        return result
+
+    def prometheus_text(self):
+        """Render all histograms in the Prometheus text exposition format."""
+        lines = ["# HELP smartcar_stage_seconds Duration of pipeline stages.",
+                 "# TYPE smartcar_stage_seconds histogram"]
+        quantiles = ["# HELP smartcar_stage_quantile_seconds Estimated duration quantiles of pipeline stages.",
+                     "# TYPE smartcar_stage_quantile_seconds gauge"]
+        for stage, histogram in self._sorted_stages():
+            counts, count, total = histogram.snapshot()
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKET_BOUNDS, counts):
+                cumulative += bucket_count
+                lines.append(f'smartcar_stage_seconds_bucket{{stage="{stage}",le="{bound:.6g}"}} {cumulative}')
+            lines.append(f'smartcar_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {count}')
+            lines.append(f'smartcar_stage_seconds_sum{{stage="{stage}"}} {total:.9g}')
+            lines.append(f'smartcar_stage_seconds_count{{stage="{stage}"}} {count}')
+            for q in (0.5, 0.95, 0.99):
+                quantiles.append(f'smartcar_stage_quantile_seconds{{stage="{stage}",quantile="{q}"}} '
+                                 f'{StageHistogram.quantile(counts, q):.9g}')
+        return "\n".join(lines + quantiles) + "\n"
+
+    def format_summary(self):
+        """Render the per-stage summary as a table."""
+        lines = [f"{'stage':<20} {'count':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"]
+        for stage, (count, p50, p95, p99) in self.summary().items():
+            lines.append(f"{stage:<20} {count:>8} {p50:>9.2f} {p95:>9.2f} {p99:>9.2f}")
+        return "\n".join(lines)
+
+    def dump(self, stream=None):
+        """Write the per-stage summary to a stream. Defaults to stderr."""
+        stream = stream or sys.stderr
+        stream.write(self.format_summary() + "\n")
+        stream.flush()
+
+    def install_signal_handler(self, signum=signal.SIGUSR1):
+        """
+        Dump the summary to stderr whenever the process receives a signal, e.g.
+        `kill -USR1 <pid>`. Must be called from the main thread.
+        """
+        signal.signal(signum, lambda received, frame: self.dump())
+
+    def start_http_server(self, port=9108, host="127.0.0.1"):
+        """
+        Serve the histograms at http://host:port/metrics from a daemon thread.
+
+        Args:
+            port (int): TCP port. Defaults to 9108.
+            host (str): Address to bind. Defaults to localhost only.
+
+        Returns:
+            ThreadingHTTPServer: The running server.
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = registry.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Keep scrapes out of the console
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        return self._server
+
+    def stop_http_server(self):
+        """Stop the HTTP server if it is running."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+# Shared registry used by the capture, inference and control modules
+stage_metrics = StageMetrics()
@@ -1,10 +1,344 @@
 from pantilt import PanTiltController
 from yolo_detect_headless import YOLODetector
+from detections import best_detection, class_ids_for, scale_detections
+from box_tracker import HybridBoxTracker
+from control_bus import DetectionResult, ServoState
+from latency_governor import LatencyGovernor, default_ladder
+from inference_profile import models_by_size
+from metrics import stage_metrics
+from car_logging import get_logger, setup_logging
+from startup import startup_timeline
+from pid import PIDController
+import numpy as np
 import time
-import cv2
+
+logger = get_logger("object_tracker")
+
+# Per-axis PID gains by camera resolution. Errors are in degrees and outputs in degrees per
+# second, so the gains carry over between resolutions; lower resolutions get softer gains
+# because each pixel of detection noise is a larger angle.
+PAN_TILT_GAINS = {
+    (640, 360): {
+        "pan": dict(kp=4.5, ki=1.0, kd=0.3, output_limit=180.0, integral_limit=10.0, rate_limit=1200.0,
+                    integral_zone=2.0),
+        "tilt": dict(kp=4.5, ki=1.0, kd=0.3, output_limit=180.0, integral_limit=10.0, rate_limit=1200.0,
+                     integral_zone=2.0),
+    },
+    (320, 240): {
+        "pan": dict(kp=3.5, ki=0.5, kd=0.3, output_limit=180.0, integral_limit=10.0, rate_limit=1200.0,
+                    integral_zone=3.0),
+        "tilt": dict(kp=3.5, ki=0.5, kd=0.3, output_limit=180.0, integral_limit=10.0, rate_limit=1200.0,
+                     integral_zone=3.0),
+    },
+}
+
+def gains_for(resolution):
+    """
+    Look up the pan/tilt PID gains for a resolution, falling back to the closest width.
+
+    Args:
+        resolution (tuple): Frame size (width, height) in pixels.
+
+    Returns:
+        dict: {"pan": kwargs, "tilt": kwargs} for PIDController.
+    """
+    if resolution in PAN_TILT_GAINS:
+        return PAN_TILT_GAINS[resolution]
+    closest = min(PAN_TILT_GAINS, key=lambda r: abs(r[0] - resolution[0]))
+    return PAN_TILT_GAINS[closest]
+
+class TargetKalmanFilter:
+    """
+    Constant-velocity Kalman filter over a target's image position and size.
+
+    State is [cx, cy, w, h, vx, vy, vw, vh] in pixels and pixels per second. Measurements
+    are (cx, cy, w, h) with their capture timestamps, so irregular frame intervals and
+    late-arriving detections are handled exactly. Between measurements the state can be
+    extrapolated (coasted) for up to `max_coast` seconds. A measurement that is
+    statistically impossible under the motion model (e.g. the detector jumped to another
+    object) restarts the track instead of dragging the velocity estimate along.
+    """
+    GATE = 18.5  # Chi-square 99.9% bound for 4 degrees of freedom
+
+    def __init__(self, process_noise=(4000.0, 4000.0, 400.0, 400.0), measurement_noise=(6.0, 6.0, 10.0, 10.0),
+                 max_coast=0.5):
+        """
+        Initialize the filter.
+
+        Args:
+            process_noise (tuple): Acceleration noise density per dimension (cx, cy, w, h) in px^2/s^3.
+            measurement_noise (tuple): Measurement standard deviation per dimension in pixels.
+            max_coast (float): Longest time in seconds to predict without a measurement. Defaults to 0.5.
+        """
+        self.q = np.asarray(process_noise, dtype=float)
+        self.R = np.diag(np.square(measurement_noise).astype(float))
+        self.H = np.hstack([np.eye(4), np.zeros((4, 4))])
+        self.max_coast = max_coast
+        self.reset()
+
+    def reset(self):
+        """Forget the target."""
+        self.x = None
+        self.P = None
+        self.timestamp = None  # Capture time of the state estimate
+        self.last_update = None  # Capture time of the last measurement
+
+    @property
+    def initialized(self):
+        return self.x is not None
+
+    def _transition(self, dt):
+        """State transition and process noise matrices for a time step."""
+        F = np.eye(8)
+        F[:4, 4:] = np.eye(4) * dt
+        Q = np.zeros((8, 8))
+        Q[:4, :4] = np.diag(self.q * dt ** 3 / 3)
+        Q[:4, 4:] = Q[4:, :4] = np.diag(self.q * dt ** 2 / 2)
+        Q[4:, 4:] = np.diag(self.q * dt)
+        return F, Q
+
+    def update(self, measurement, timestamp):
+        """
+        Fuse a measurement.
+
+        Args:
+            measurement (tuple): (cx, cy, w, h) in pixels.
+            timestamp (float): Capture time of the frame the measurement came from.
+        """
+        z = np.asarray(measurement, dtype=float)
+        if not self.initialized or timestamp - self.last_update > self.max_coast:
+            # First measurement, or the target was lost for too long
+            self._restart(z, timestamp)
+            return
+
+        dt = max(0.0, timestamp - self.timestamp)
+        F, Q = self._transition(dt)
+        x = F @ self.x
+        P = F @ self.P @ F.T + Q
+
+        y = z - self.H @ x
+        S = self.H @ P @ self.H.T + self.R
+        S_inv = np.linalg.inv(S)
+        if y @ S_inv @ y > self.GATE:
+            self._restart(z, timestamp)
+            return
+        K = P @ self.H.T @ S_inv
+        self.x = x + K @ y
+        self.P = (np.eye(8) - K @ self.H) @ P
+        self.timestamp = self.last_update = max(self.timestamp, timestamp)
+
+    def _restart(self, z, timestamp):
+        """Start a new track at a measurement with zero velocity."""
+        self.x = np.concatenate([z, np.zeros(4)])
+        self.P = np.diag(np.concatenate([np.diag(self.R), np.full(4, 100.0 ** 2)]))
+        self.timestamp = self.last_update = timestamp
+
+    def predict(self, timestamp):
+        """
+        Extrapolate the target to a time without changing the filter state.
+
+        Args:
+            timestamp (float): Time to predict for, e.g. when the servos will act.
+
+        Returns:
+            numpy.ndarray: Predicted (cx, cy, w, h), or None if there is no track or it has
+                coasted longer than max_coast.
+        """
+        if not self.initialized or timestamp - self.last_update > self.max_coast:
+            return None
+        dt = max(0.0, timestamp - self.timestamp)
+        return self.x[:4] + self.x[4:] * dt
+
+class PanTiltAimer:
+    """
+    Turns target boxes into pan/tilt corrections.
+
+    Measurements are stored in camera-compensated pixels (the box position the target
+    would have with the servos at 0 degrees), so moving the camera does not look like
+    target motion. With a Kalman filter, the target is predicted forward to the time the
+    servos will act, which hides the capture and inference delay.
+
+    Each axis is driven by a PID controller on the angular error, with the target's
+    angular velocity from the Kalman filter as feed-forward. The original fixed step law
+    is kept as control="step" for comparison.
+    """
+    def __init__(self, resolution, fov_degrees=(62.2, 48.8), actuation_latency=0.05, use_kalman=True, max_coast=0.5,
+                 gains=None, control="pid", deadband_degrees=0.2):
+        """
+        Initialize the aimer.
+
+        Args:
+            resolution (tuple): Frame size (width, height) in pixels.
+            fov_degrees (tuple): Camera horizontal and vertical field of view. Defaults to the Pi Camera v2.
+            actuation_latency (float): Time from issuing a correction until the servos act on it (seconds).
+            use_kalman (bool): Predict with a Kalman filter; otherwise react to the latest raw box. Defaults to True.
+            max_coast (float): Keep aiming at the prediction for this long after the target is lost (seconds).
+            gains (dict, optional): {"pan": kwargs, "tilt": kwargs} for PIDController. Defaults to
+                the PAN_TILT_GAINS entry for the resolution.
+            control (str): "pid" or "step" (the original fixed step law). Defaults to "pid".
+            deadband_degrees (float): Angular errors smaller than this are treated as zero to keep
+                the servos from jittering on detection noise. Defaults to 0.2.
+        """
+        if control not in ("pid", "step"):
+            raise ValueError(f"Unknown control law: {control}")
+        self.frame_width, self.frame_height = resolution
+        self.px_per_deg_x = self.frame_width / fov_degrees[0]
+        self.px_per_deg_y = self.frame_height / fov_degrees[1]
+        self.actuation_latency = actuation_latency
+        self.max_coast = max_coast
+        self.kalman = TargetKalmanFilter(max_coast=max_coast) if use_kalman else None
+        self._raw = None  # Latest raw (offset_x, offset_y, timestamp) without a Kalman filter
+        self.control = control
+        self.deadband_degrees = deadband_degrees
+        gains = gains or gains_for(resolution)
+        self.pan_pid = PIDController(**gains["pan"])
+        self.tilt_pid = PIDController(**gains["tilt"])
+        self._last_correction = None  # Time of the previous PID update
+
+    def observe(self, bbox, timestamp, pan, tilt):
+        """
+        Feed the target box seen in a frame.
+
+        Args:
+            bbox (tuple): Box (xmin, ymin, xmax, ymax), or None if the target was not found.
+            timestamp (float): Capture time of the frame.
+            pan (float): Pan servo angle when the frame was captured.
+            tilt (float): Tilt servo angle when the frame was captured.
+        """
+        if bbox is None:
+            return  # Dropout: keep coasting on the prediction
+        xmin, ymin, xmax, ymax = bbox
+        cx, cy = (xmin + xmax) / 2, (ymin + ymax) / 2
+        if self.kalman is None:
+            self._raw = (cx - self.frame_width // 2, cy - self.frame_height // 2, timestamp)
+            return
+        # Increasing pan moves the target right in the image; increasing tilt moves it up
+        world_x = cx - pan * self.px_per_deg_x
+        world_y = cy + tilt * self.px_per_deg_y
+        self.kalman.update((world_x, world_y, xmax - xmin, ymax - ymin), timestamp)
+
+    def target_offset(self, now, pan, tilt):
+        """
+        Offset of the target from the frame center expected when the servos act.
+
+        Args:
+            now (float): Current time.
+            pan (float): Pan angle the servo is heading to.
+            tilt (float): Tilt angle the servo is heading to.
+
+        Returns:
+            tuple: (offset_x, offset_y) in pixels, or None if there is no target.
+        """
+        if self.kalman is None:
+            if self._raw is None or now - self._raw[2] > self.max_coast:
+                return None
+            offset_x, offset_y, _ = self._raw
+            self._raw = None  # React to each raw detection once
+            return offset_x, offset_y
+        predicted = self.kalman.predict(now + self.actuation_latency)
+        if predicted is None:
+            return None
+        offset_x = predicted[0] + pan * self.px_per_deg_x - self.frame_width // 2
+        offset_y = predicted[1] - tilt * self.px_per_deg_y - self.frame_height // 2
+        return offset_x, offset_y
+
+    def aim(self, engine, pan_ch, tilt_ch, bbox, timestamp, now):
+        """
+        Observe a frame's target box and compute new servo targets.
+
+        Args:
+            engine (ServoMotionEngine): Motion engine driving the pan and tilt servos.
+            pan_ch (int): Pan servo channel.
+            tilt_ch (int): Tilt servo channel.
+            bbox (tuple): Box (xmin, ymin, xmax, ymax), or None if the target was not found.
+            timestamp (float): Capture time of the frame.
+            now (float): Current time.
+
+        Returns:
+            tuple: (centered, targets) where targets is {channel: angle} for the servos that
+                need to move (empty if none).
+        """
+        # Aim using the servo angles at capture time and the angles the servos are heading to
+        captured_angles = engine.angles_at(timestamp)
+        self.observe(bbox, timestamp, captured_angles[pan_ch], captured_angles[tilt_ch])
+        pan_target = engine.get_target(pan_ch)
+        tilt_target = engine.get_target(tilt_ch)
+        centered, pan_step, tilt_step = self.correction(now, pan_target, tilt_target)
+        targets = {}
+        if pan_step:
+            targets[pan_ch] = pan_target + pan_step
+        if tilt_step:
+            targets[tilt_ch] = tilt_target + tilt_step
+        return centered, targets
+
+    def correction(self, now, pan, tilt):
+        """
+        Compute the servo steps that center the target.
+
+        Args:
+            now (float): Current time.
+            pan (float): Pan angle the servo is heading to.
+            tilt (float): Tilt angle the servo is heading to.
+
+        Returns:
+            tuple: (centered, pan_step, tilt_step) with steps in degrees relative to pan and tilt.
+        """
+        offset = self.target_offset(now, pan, tilt)
+        if offset is None:
+            # No target: start the next acquisition without stale integral or derivative state
+            self.pan_pid.reset()
+            self.tilt_pid.reset()
+            self._last_correction = None
+            return False, 0, 0
+        offset_x, offset_y = offset
+
+        # Check if the object is centered within a threshold
+        centered = abs(offset_x) <= 10 and abs(offset_y) <= 20
+        if self.control == "step":
+            return (centered,) + self._step_correction(offset_x, offset_y)
+
+        dt = 0.0 if self._last_correction is None else now - self._last_correction
+        self._last_correction = now
+        if dt <= 0:
+            return centered, 0, 0
+
+        # Object right of center needs less pan; object below center needs more tilt
+        pan_error = self._deadband(-offset_x / self.px_per_deg_x)
+        tilt_error = self._deadband(offset_y / self.px_per_deg_y)
+        pan_ff = tilt_ff = 0.0
+        if self.kalman is not None:
+            # Angular velocity of the target, so a moving target is followed without lag
+            pan_ff = -self.kalman.x[4] / self.px_per_deg_x
+            tilt_ff = self.kalman.x[5] / self.px_per_deg_y
+        pan_step = self.pan_pid.update(pan_error, dt, pan_ff) * dt
+        tilt_step = self.tilt_pid.update(tilt_error, dt, tilt_ff) * dt
+        return centered, pan_step, tilt_step
+
+    def _deadband(self, error):
+        return 0.0 if abs(error) < self.deadband_degrees else error
+
+    def _step_correction(self, offset_x, offset_y):
+        """The original step law: up to 10 degrees per frame, with 10 px and 20 px dead bands."""
+        if abs(offset_x) <= 10 and abs(offset_y) <= 20:
+            return 0, 0
+
+        # Scale step size with the offset, max 10 degrees
+        step_x = min(abs(offset_x) // 10, 10)
+        step_y = min(abs(offset_y) // 10, 10)
+        pan_step = tilt_step = 0
+        if abs(offset_x) > 10:  # Threshold to avoid jitter
+            # Object right of center: decrease pan; left of center: increase pan
+            pan_step = -step_x if offset_x > 0 else step_x
+        if abs(offset_y) > 20:  # Threshold to avoid jitter
+            # Object below center: increase tilt; above center: decrease tilt
+            tilt_step = step_y if offset_y > 0 else -step_y
+        return pan_step, tilt_step
 
 class ObjectTracker:
-    def __init__(self, model_path, object="person", resolution=(640, 360), confidence_threshold=0.6):
+    def __init__(self, model_path, object="person", resolution=(640, 360), confidence_threshold=0.6, bus=None,
+                 out_of_process=False, worker_cpus=None, detect_interval=1, adaptive_interval=False,
+                 use_kalman=True, pid_gains=None, inference_size=None, latency_budget=None,
+                 lite_model_path=None, recorder=None, parallel_init=True):
         """
         Initialize the object tracker with a pan-tilt controller and YOLO detector.
 
@@ -13,12 +347,106 @@ class ObjectTracker:
             object (str): Object class to track (e.g., "person").
             resolution (tuple): Resolution of the camera feed (width, height).
             confidence_threshold (float): Minimum confidence for object detection.
+            bus (ControlBus, optional): Bus to publish detections and servo state on. Defaults to None.
+            out_of_process (bool): Run YOLO inference in a separate process. Defaults to False.
+            worker_cpus (set, optional): CPU cores to pin the inference process to. Defaults to None.
+            detect_interval (int): Run YOLO every this many frames and propagate the box with optical
+                flow in between. Defaults to 1 (detect on every frame).
+            adaptive_interval (bool): Adapt detect_interval to how well the tracked box agrees
+                with fresh detections. Defaults to False.
+            use_kalman (bool): Aim at a Kalman-filtered, latency-compensated prediction of the
+                target instead of the latest raw box. Defaults to True.
+            pid_gains (dict, optional): {"pan": kwargs, "tilt": kwargs} for the per-axis PID
+                controllers. Defaults to the PAN_TILT_GAINS entry for the resolution.
+            inference_size (int or tuple, optional): Run detection and optical flow on a second,
+                ISP-scaled camera stream of this size; boxes are mapped back to `resolution`.
+                Defaults to None (use the main stream).
+            latency_budget (float, optional): Keep the 90th-percentile frame latency under this many
+                seconds by adapting the model input size, detection interval and model variant.
+                Defaults to None (fixed settings).
+            lite_model_path (str, optional): Cheaper model variant the latency governor may switch
+                to. Not supported with out_of_process, as the worker loads a single model. Defaults to None.
+            recorder (FlightRecorder, optional): Recorder to hand camera keyframes to. Detections
+                reach it through the bus. Defaults to None.
+            parallel_init (bool): Center the pan-tilt, start the camera and load the model
+                concurrently. Defaults to True.
+
+        Raises:
+            ValueError: If a latency budget with a lite model is combined with out_of_process.
         """
-        self.pan_tilt = PanTiltController()
-        self.pan_tilt.initialize_to_middle()
-        self.detector = YOLODetector(model_path, resolution, confidence_threshold)
+        if out_of_process and latency_budget is not None and lite_model_path is not None:
+            raise ValueError("The latency governor cannot switch to lite_model_path with out-of-process inference")
+        started = startup_timeline.run({
+            "pan-tilt": self._init_pan_tilt,
+            "detector": lambda: YOLODetector(model_path, resolution, confidence_threshold,
+                                             out_of_process=out_of_process, worker_cpus=worker_cpus,
+                                             inference_size=inference_size, parallel_init=parallel_init),
+        }, parallel=parallel_init)
+        self.pan_tilt = started["pan-tilt"]
+        self.detector = started["detector"]
+        self.servo_motion = self.pan_tilt.start_motion_engine()
+        self.bus = bus
+        self.recorder = recorder
+        self.command_origin = time.monotonic()  # Capture time of the frame behind the current servo targets
+        if self.bus is not None:
+            self.servo_motion.listener = self.publish_servo_state
         self.object_class = object
+        self.object_class_ids = class_ids_for(self.detector.labels, object)
         self.frame_width, self.frame_height = resolution
+        self.last_frame_seq = 0  # Sequence number of the last frame processed
+        self.last_detections = None  # Detections of the most recent YOLO run, in main-stream pixels
+        self.box_tracker = HybridBoxTracker(self.detect_target, detect_interval, adaptive_interval)
+        self.aimer = PanTiltAimer(resolution, use_kalman=use_kalman, gains=pid_gains)
+        self.governor = None
+        if latency_budget is not None:
+            # Never step above the size the camera stream delivers; with an inference profile,
+            # step through the sizes it measured, each with its fastest export (in process only)
+            largest = self.detector.imgsz or 640
+            model_for_size = None
+            candidates = (640, 480, 416, 320, 256)
+            if self.detector.profile_config is not None and self.detector.worker is not None:
+                # The worker keeps the export it loaded, which only runs at its own size
+                candidates = (largest,)
+            elif self.detector.profile_config is not None:
+                model_for_size = models_by_size(self.detector.profile)
+                candidates = sorted(model_for_size, reverse=True)
+            sizes = tuple(size for size in candidates if size <= largest) or (largest,)
+            ladder = default_ladder(self.detector.model_path, lite_model_path, sizes, model_for_size)
+            self.governor = LatencyGovernor(self, latency_budget, ladder)
+
+    @staticmethod
+    def _init_pan_tilt():
+        """Reset the PCA9685 and center the pan-tilt."""
+        pan_tilt = PanTiltController()
+        pan_tilt.initialize_to_middle()
+        return pan_tilt
+
+    def warm_up(self, iterations=1):
+        """
+        Run the detector on a blank frame, so model setup does not delay the first detection.
+
+        Args:
+            iterations (int): Inferences to run. Defaults to 1.
+        """
+        with startup_timeline.phase("warm-up inference"):
+            self.detector.warm_up(self.object_class_ids, iterations)
+
+    def detect_target(self, frame):
+        """
+        Run YOLO on a frame and return the most confident box of the target class.
+
+        Returns:
+            tuple: Box (xmin, ymin, xmax, ymax) in the frame's own pixels, or None if the
+                target was not detected.
+        """
+        detections = self.detector.infer(frame, self.object_class_ids, main_coordinates=False)
+        startup_timeline.milestone("first detection")
+        if self.bus is not None:
+            self.last_detections = scale_detections(detections, self.detector.scale_to_main)
+        target = best_detection(detections)
+        if target is None:
+            return None
+        return (int(target["xmin"]), int(target["ymin"]), int(target["xmax"]), int(target["ymax"]))
 
     def track_object(self):
         """
@@ -27,71 +455,59 @@ class ObjectTracker:
             bool: True if the object is centered, False otherwise.
         """
         try:
-            # Capture a frame and run object detection
-            frame_bgra = self.detector.picam.capture_array()
-            frame = cv2.cvtColor(frame_bgra, cv2.COLOR_BGRA2BGR)
-            results = self.detector.model(frame, verbose=False)
-            detections = results[0].boxes
-
-            # Find the object in the detections
-            object_bbox = None
-            for i in range(len(detections)):
-                classidx = int(detections[i].cls.item())
-                classname = self.detector.labels[classidx]
-                conf = detections[i].conf.item()
-
-                if classname == self.object_class and conf > self.detector.confidence_threshold:
-                    xyxy_tensor = detections[i].xyxy.cpu()
-                    xyxy = xyxy_tensor.numpy().squeeze()
-                    object_bbox = xyxy.astype(int)  # [xmin, ymin, xmax, ymax]
-                    break
+            # Wait for a fresh frame from the capture thread
+            captured = self.detector.wait_for_frame(self.last_frame_seq, timeout=1.0)
+            if captured is None:
+                return False  # No new frame available
+            self.last_frame_seq = captured.seq
+            start = time.perf_counter()
 
+            # Locate the target: YOLO every detect_interval frames, optical flow in between
+            object_bbox, detected = self.box_tracker.update(captured.image)
             if object_bbox is not None:
-                # Calculate the center of the object's bounding box
-                xmin, ymin, xmax, ymax = object_bbox
-                bbox_center_x = (xmin + xmax) // 2
-                bbox_center_y = (ymin + ymax) // 2
-
-                # Calculate offsets from the frame center
-                frame_center_x = self.frame_width // 2
-                frame_center_y = self.frame_height // 2
-                offset_x = bbox_center_x - frame_center_x
-                offset_y = bbox_center_y - frame_center_y
-
-                 # Check if the object is centered within a threshold
-                if abs(offset_x) <= 10 and abs(offset_y) <= 20:
-                    return True  # Object is centered
-
-                # Adjust pan-tilt to center the object
-                step_x = min(abs(offset_x) // 10, 10)  # Scale step size, max 10
-                step_y = min(abs(offset_y) // 10, 10)  # Scale step size, max 10
-
-                if abs(offset_x) > 10:  # Threshold to avoid jitter
-                    if offset_x > 0:
-                        # Move right to align the bounding box center
-                        self.pan_tilt.servo_degree_decrease(self.pan_tilt.SERVO_PAN_CH, step_x)
-                    else:
-                        # Move left to align the bounding box center
-                        self.pan_tilt.servo_degree_increase(self.pan_tilt.SERVO_PAN_CH, step_x)
-
-                if abs(offset_y) > 20:  # Threshold to avoid jitter
-                    if offset_y > 0:
-                        # Move down to align the bounding box center
-                        self.pan_tilt.servo_degree_increase(self.pan_tilt.SERVO_TILT_CH, step_y)
-                    else:
-                        # Move up to align the bounding box center
-                        self.pan_tilt.servo_degree_decrease(self.pan_tilt.SERVO_TILT_CH, step_y)
-
-            return False  # Object is not centered or not detected
+                # Inference may run on a smaller stream; aim in main-stream pixels
+                object_bbox = tuple(int(v) for v in self.detector.to_main(object_bbox))
+            pan_ch, tilt_ch = self.pan_tilt.SERVO_PAN_CH, self.pan_tilt.SERVO_TILT_CH
+            if self.bus is not None:
+                captured_angles = self.servo_motion.angles_at(captured.timestamp)
+                self.bus.publish(DetectionResult(object_bbox, captured.seq, captured.timestamp,
+                                                 captured_angles[pan_ch], captured_angles[tilt_ch],
+                                                 self.last_detections if detected else None))
+            if self.recorder is not None:
+                self.recorder.keyframe(captured)
+
+            centered, targets = self.aimer.aim(self.servo_motion, pan_ch, tilt_ch, object_bbox,
+                                               captured.timestamp, time.monotonic())
+            if targets:
+                # Hand the new targets to the motion engine; this returns immediately
+                self.command_origin = captured.timestamp
+                self.servo_motion.set_targets(targets)
+
+            stage_metrics.record("track_frame", time.perf_counter() - start)
+            if self.governor is not None:
+                self.governor.record(time.monotonic() - captured.timestamp)
+            return centered
 
         except Exception as e:
-            print(f"Error during object tracking: {e}")
+            logger.exception("Error during object tracking: %s", e)
             return False
 
+    def publish_servo_state(self, moved):
+        """Motion engine listener: publish the commanded pan and tilt angles."""
+        self.bus.publish(ServoState(self.pan_tilt.get_pan_angle(), self.pan_tilt.servo_tilt_degree, self.command_origin))
+
+    def cleanup(self):
+        """
+        Stop the servo motion engine and the camera capture thread, and release the camera.
+        """
+        self.pan_tilt.stop_motion_engine()
+        self.detector.cleanup()
+
 # Example usage
 if __name__ == "__main__":
     """
     Example main function to demonstrate object tracking.
     """
+    setup_logging()
     tracker = ObjectTracker(model_path="yolov5nu_ncnn_model", object="person")
     tracker.track_object()
\ No newline at end of file
@@ -1,5 +1,10 @@
-import smbus
+import bisect
+import math
+import threading
 import time
+from collections import deque
+from metrics import stage_metrics
+import pca9685
 import termios
 import sys
 import tty
@@ -16,71 +21,122 @@ class PanTiltController:
     STEP_DELAY = 0.02  # Delay after each movement
 
     # PCA9685 Registers
-    PCA9685_ADDRESS = 0x40
-    MODE1 = 0x00
-    PRESCALE = 0xFE
-    LED0_ON_L = 0x06
+    PCA9685_ADDRESS = pca9685.PCA9685_ADDRESS
+    LED0_ON_L = pca9685.LED0_ON_L
+    PWM_FREQUENCY = 60  # Servo frame rate; shared by every channel of the chip
 
     def __init__(self):
         # Initialize servo positions to middle
         self.servo_tilt_degree = 90
         self.servo_pan_degree = 90
-        # Initialize I2C bus
-        self.bus = smbus.SMBus(1)
+        # Shared PCA9685 driver; the motors may drive other channels of the same chip
+        self.pca = pca9685.get_pca9685(bus_number=1, address=self.PCA9685_ADDRESS)
+        self.bus = self.pca.bus  # Process-wide i2c_bus.I2CBus
         # Initialize pan angle
         self.pan_angle = 0  
+        # Background motion engine, created by start_motion_engine()
+        self.motion = None
 
-    def i2c_write_reg(self, addr, reg, data):
-        """Write a byte to a specific register over I2C."""
-        self.bus.write_byte_data(addr, reg, data)
-
-    def i2c_read_reg(self, addr, reg):
-        """Read a byte from a specific register over I2C."""
-        return self.bus.read_byte_data(addr, reg)
+    @property
+    def i2c_transactions(self):
+        """Number of I2C transactions issued to the PCA9685, by any user of the shared driver."""
+        return self.pca.transactions
 
     def pca9685_reset(self):
-        """Reset the PCA9685 module."""
-        self.i2c_write_reg(self.PCA9685_ADDRESS, self.MODE1, 0x00)
+        """Reset the PCA9685 module, leaving register auto-increment enabled."""
+        self.pca.reset()
 
     def pca9685_set_pwm_freq(self, freq):
         """Set the PWM frequency for the PCA9685."""
-        prescaleval = 25000000.0
-        prescaleval /= 4096.0
-        prescaleval /= freq
-        prescaleval -= 1.0
-        prescale = int(prescaleval + 0.5)
-        oldmode = self.i2c_read_reg(self.PCA9685_ADDRESS, self.MODE1)
-        newmode = (oldmode & 0x7F) | 0x10  # Sleep mode
-        self.i2c_write_reg(self.PCA9685_ADDRESS, self.MODE1, newmode)
-        self.i2c_write_reg(self.PCA9685_ADDRESS, self.PRESCALE, prescale)
-        self.i2c_write_reg(self.PCA9685_ADDRESS, self.MODE1, oldmode)
-        time.sleep(0.005)
-        self.i2c_write_reg(self.PCA9685_ADDRESS, self.MODE1, oldmode | 0xA1)
+        self.pca.set_pwm_freq(freq)
 
     def pca9685_set_pwm(self, num, on, off):
-        """Set the PWM signal for a specific channel."""
-        self.i2c_write_reg(self.PCA9685_ADDRESS, self.LED0_ON_L + 4 * num, on & 0xFF)
-        self.i2c_write_reg(self.PCA9685_ADDRESS, self.LED0_ON_L + 4 * num + 1, on >> 8)
-        self.i2c_write_reg(self.PCA9685_ADDRESS, self.LED0_ON_L + 4 * num + 2, off & 0xFF)
-        self.i2c_write_reg(self.PCA9685_ADDRESS, self.LED0_ON_L + 4 * num + 3, off >> 8)
+        """Set the PWM signal for a specific channel in one block write."""
+        self.pca9685_set_pwm_multi(num, [(on, off)])
 
-    def set_servo_pulse(self, n, pulse):
-        """Set the servo pulse width."""
+    def pca9685_set_pwm_multi(self, first, values):
+        """
+        Set the PWM signals of consecutive channels, with as few block writes as possible.
+
+        Args:
+            first (int): First channel to write.
+            values (list): (on, off) tick pairs for channels first, first + 1, ...
+        """
+        start = time.perf_counter()
+        self.pca.set_pwm_multi(first, values)
+        stage_metrics.record("servo_write", time.perf_counter() - start)
+
+    def pulse_to_ticks(self, pulse):
+        """Convert a servo pulse width in seconds to PCA9685 ticks at 60 Hz."""
         pulselength = 1000.0
         pulselength /= 60.0
         pulselength /= 4096.0
         pulse *= 1000.0
         pulse /= pulselength
-        self.pca9685_set_pwm(n, 0, int(pulse))
+        return int(pulse)
 
-    def set_servo_degree(self, n, degree):
-        """Set the servo to a specific angle."""
+    def degree_to_ticks(self, degree):
+        """Convert a servo angle to PCA9685 ticks, clamped to 0-180 degrees."""
         if degree >= 180:
             degree = 180
         elif degree <= 0:
             degree = 0
         pulse = (degree + 45) / (90.0 * 1000)
-        self.set_servo_pulse(n, pulse)
+        return self.pulse_to_ticks(pulse)
+
+    def set_servo_pulse(self, n, pulse):
+        """Set the servo pulse width."""
+        self.pca9685_set_pwm(n, 0, self.pulse_to_ticks(pulse))
+
+    def set_servo_degree(self, n, degree):
+        """Set the servo to a specific angle."""
+        self.pca9685_set_pwm(n, 0, self.degree_to_ticks(degree))
+
+    def set_servo_degrees(self, degrees):
+        """
+        Set several servos at once. Contiguous channels are updated in a single block write,
+        so servos that move together change on the same PWM period.
+
+        Args:
+            degrees (dict): Mapping of channel to angle, e.g. {SERVO_TILT_CH: 120, SERVO_PAN_CH: 90}.
+        """
+        channels = sorted(degrees)
+        run_start = 0
+        for i in range(1, len(channels) + 1):
+            if i == len(channels) or channels[i] != channels[i - 1] + 1:
+                run = channels[run_start:i]
+                self.pca9685_set_pwm_multi(run[0], [(0, self.degree_to_ticks(degrees[ch])) for ch in run])
+                run_start = i
+
+    def set_servo_positions(self, degrees):
+        """
+        Move servos to absolute angles within their limits and record the new positions.
+
+        Args:
+            degrees (dict): Mapping of channel to angle.
+        """
+        applied = {}
+        for channel, degree in degrees.items():
+            if channel == self.SERVO_TILT_CH:
+                self.servo_tilt_degree = max(self.SERVO_TILT_MIN, min(self.SERVO_TILT_MAX, degree))
+                applied[channel] = self.servo_tilt_degree
+            elif channel == self.SERVO_PAN_CH:
+                degree = max(self.SERVO_PAN_MIN, min(self.SERVO_PAN_MAX, degree))
+                self.pan_angle += degree - self.servo_pan_degree
+                self.servo_pan_degree = degree
+                applied[channel] = self.servo_pan_degree
+        self.set_servo_degrees(applied)
+
+    def servo_degree_step(self, steps):
+        """
+        Move several servos by relative steps in one bus transaction.
+
+        Args:
+            steps (dict): Mapping of channel to signed step in degrees.
+        """
+        current = {self.SERVO_TILT_CH: self.servo_tilt_degree, self.SERVO_PAN_CH: self.servo_pan_degree}
+        self.set_servo_positions({ch: current[ch] + step for ch, step in steps.items()})
+        time.sleep(self.STEP_DELAY)
 
     def servo_degree_increase(self, channel, step):
         """Increase the servo angle by a step."""
@@ -147,26 +203,243 @@ class PanTiltController:
 
     def get_pan_angle(self):
         return self.pan_angle
+
+    def start_motion_engine(self, max_velocity=180.0, max_acceleration=1200.0, tick_rate=50):
+        """
+        Start a background ServoMotionEngine that moves the servos toward target angles.
+
+        Args:
+            max_velocity (float): Maximum servo speed in degrees per second. Defaults to 180.
+            max_acceleration (float): Maximum servo acceleration in degrees per second squared. Defaults to 1200.
+            tick_rate (float): Interpolation rate in Hz. Defaults to 50.
+
+        Returns:
+            ServoMotionEngine: The running engine.
+        """
+        if self.motion is None:
+            self.motion = ServoMotionEngine(self, max_velocity, max_acceleration, tick_rate)
+        self.motion.start()
+        return self.motion
+
+    def stop_motion_engine(self):
+        """Stop the background motion engine, leaving the servos where they are."""
+        if self.motion is not None:
+            self.motion.stop()
     
     def initialize_to_middle(self):
         """
         Initialize the pan-tilt mechanism and move it to the middle point.
         """
         #print("Initializing PCA9685 and moving to the middle point...")
-        self.pca9685_reset()
-        self.pca9685_set_pwm_freq(60)
+        # Resets and sets 60 Hz unless the motor backend already did
+        self.pca.configure(self.PWM_FREQUENCY)
 
         # Calculate middle points
         self.servo_tilt_degree = (self.SERVO_TILT_MAX + self.SERVO_TILT_MIN) // 2 + 60  # Adjusted for better visibility
         self.servo_pan_degree = (self.SERVO_PAN_MAX + self.SERVO_PAN_MIN) // 2
 
         # Move servos to the middle point
-        self.set_servo_degree(self.SERVO_TILT_CH, self.servo_tilt_degree)
-        self.set_servo_degree(self.SERVO_PAN_CH, self.servo_pan_degree)
+        self.set_servo_degrees({self.SERVO_TILT_CH: self.servo_tilt_degree, self.SERVO_PAN_CH: self.servo_pan_degree})
 
         #print(f"Moved to middle point: ServoUpDegree={self.servo_tilt_degree}, ServoDownDegree={self.servo_pan_degree}")
 
 
+class ServoMotionEngine:
+    """
+    Moves the pan-tilt servos toward target angles on its own thread.
+
+    Each channel follows a trapezoidal velocity profile limited by max_velocity and
+    max_acceleration, interpolated at a fixed tick rate. Callers set targets and return
+    immediately; the engine writes all moving channels in one block write per tick.
+    """
+    ARRIVAL_TOLERANCE = 0.05  # Degrees
+
+    def __init__(self, controller, max_velocity=180.0, max_acceleration=1200.0, tick_rate=50):
+        """
+        Initialize the motion engine from the controller's current servo angles.
+
+        Args:
+            controller (PanTiltController): Controller used to write servo positions.
+            max_velocity (float): Maximum servo speed in degrees per second.
+            max_acceleration (float): Maximum servo acceleration in degrees per second squared.
+            tick_rate (float): Interpolation rate in Hz.
+        """
+        self.controller = controller
+        self.max_velocity = max_velocity
+        self.max_acceleration = max_acceleration
+        self.tick_rate = tick_rate
+        self.channels = (controller.SERVO_TILT_CH, controller.SERVO_PAN_CH)
+        self.limits = {
+            controller.SERVO_TILT_CH: (controller.SERVO_TILT_MIN, controller.SERVO_TILT_MAX),
+            controller.SERVO_PAN_CH: (controller.SERVO_PAN_MIN, controller.SERVO_PAN_MAX),
+        }
+        self._lock = threading.Lock()
+        self._position = {}
+        self._velocity = {}
+        self._target = {}
+        self._history = deque(maxlen=int(2 * tick_rate))  # (time, {channel: angle}) for the last ~2 s
+        self.sync_from_controller()
+        self._running = False
+        self._thread = None
+        self.listener = None  # Called as listener(moved) after each servo write
+
+    def sync_from_controller(self):
+        """Reset positions and targets to the controller's recorded servo angles."""
+        with self._lock:
+            current = {
+                self.controller.SERVO_TILT_CH: self.controller.servo_tilt_degree,
+                self.controller.SERVO_PAN_CH: self.controller.servo_pan_degree,
+            }
+            for channel in self.channels:
+                self._position[channel] = float(current[channel])
+                self._velocity[channel] = 0.0
+                self._target[channel] = float(current[channel])
+
+    def start(self):
+        """Start the interpolation thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="servo-motion", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the interpolation thread."""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def _clamp(self, channel, angle):
+        low, high = self.limits[channel]
+        return max(low, min(high, float(angle)))
+
+    def set_targets(self, targets):
+        """
+        Set absolute target angles. Returns immediately.
+
+        Args:
+            targets (dict): Mapping of channel to target angle in degrees.
+        """
+        with self._lock:
+            for channel, angle in targets.items():
+                self._target[channel] = self._clamp(channel, angle)
+
+    def set_target(self, channel, angle):
+        """Set the absolute target angle of one channel. Returns immediately."""
+        self.set_targets({channel: angle})
+
+    def move_by(self, steps):
+        """
+        Set targets relative to the current commanded angles. Returns immediately.
+
+        Args:
+            steps (dict): Mapping of channel to signed step in degrees.
+        """
+        with self._lock:
+            for channel, step in steps.items():
+                self._target[channel] = self._clamp(channel, self._position[channel] + step)
+
+    def get_angle(self, channel):
+        """Return the angle currently commanded on a channel."""
+        with self._lock:
+            return self._position[channel]
+
+    def get_target(self, channel):
+        """Return the target angle of a channel."""
+        with self._lock:
+            return self._target[channel]
+
+    def angles_at(self, timestamp):
+        """
+        Look up the commanded angles at an earlier time, e.g. when a frame was captured.
+
+        Args:
+            timestamp (float): time.monotonic() timestamp.
+
+        Returns:
+            dict: Mapping of channel to angle at that time (the oldest or newest known
+                angles if the timestamp is outside the recorded history).
+        """
+        with self._lock:
+            if not self._history:
+                return dict(self._position)
+            times = [t for t, _ in self._history]
+            index = bisect.bisect_right(times, timestamp) - 1
+            return dict(self._history[max(0, index)][1])
+
+    def arrived(self, channel=None):
+        """
+        Check whether servos have reached their targets.
+
+        Args:
+            channel (int, optional): Channel to check. Defaults to None (all channels).
+
+        Returns:
+            bool: True if the channel (or every channel) is at its target and stopped.
+        """
+        with self._lock:
+            channels = self.channels if channel is None else (channel,)
+            return all(self._position[ch] == self._target[ch] and self._velocity[ch] == 0.0 for ch in channels)
+
+    def step(self, dt, now=None):
+        """
+        Advance every channel's motion profile by `dt` seconds.
+
+        Args:
+            dt (float): Time step in seconds.
+            now (float, optional): Timestamp recorded for angles_at(). Defaults to time.monotonic().
+
+        Returns:
+            dict: Mapping of channel to new angle for the channels that moved.
+        """
+        moved = {}
+        with self._lock:
+            for channel in self.channels:
+                position = self._position[channel]
+                velocity = self._velocity[channel]
+                error = self._target[channel] - position
+                if abs(error) <= self.ARRIVAL_TOLERANCE and abs(velocity) <= self.max_acceleration * dt:
+                    if position != self._target[channel]:
+                        moved[channel] = self._position[channel] = self._target[channel]
+                    self._velocity[channel] = 0.0
+                    continue
+
+                # Fastest speed from which we can still stop at the target, capped at max_velocity
+                stop_speed = math.sqrt(2 * self.max_acceleration * abs(error))
+                desired = math.copysign(min(self.max_velocity, stop_speed), error)
+                max_dv = self.max_acceleration * dt
+                velocity += max(-max_dv, min(max_dv, desired - velocity))
+                position += velocity * dt
+
+                if (self._target[channel] - position) * error < 0:
+                    # Stepped past the target: land on it
+                    position = self._target[channel]
+                    velocity = 0.0
+                self._position[channel] = position
+                self._velocity[channel] = velocity
+                moved[channel] = position
+            self._history.append((time.monotonic() if now is None else now, dict(self._position)))
+        return moved
+
+    def _run(self):
+        """Interpolate at the tick rate and write moving channels to the servos."""
+        period = 1.0 / self.tick_rate
+        next_tick = time.monotonic()
+        while self._running:
+            moved = self.step(period)
+            if moved:
+                self.controller.set_servo_positions(moved)
+                if self.listener is not None:
+                    self.listener(moved)
+            next_tick += period
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.monotonic()  # Fell behind; don't try to catch up
+
+
 if __name__ == "__main__":
     """
     Example main function to control the pantilt module.
@@ -0,0 +1,174 @@
+import threading
+import time
+import i2c_bus
+from i2c_bus import PRIORITY_BACKGROUND, PRIORITY_SERVO
+
+# PCA9685 Registers
+PCA9685_ADDRESS = 0x40
+MODE1 = 0x00
+PRESCALE = 0xFE
+LED0_ON_L = 0x06
+MODE1_AI = 0x20  # Register auto-increment, lets one block write fill consecutive registers
+MODE1_RESTART = 0x80  # Self-clearing once the outputs restart
+I2C_BLOCK_MAX = 32  # SMBus block writes carry at most 32 data bytes (8 channels)
+FULL = 0x1000  # Bit 4 of LEDn_ON_H / LEDn_OFF_H: output fully on / fully off
+TICKS = 4096  # Counter steps per PWM period
+OSCILLATOR = 25000000.0  # Internal oscillator in Hz
+
+_drivers = {}
+_drivers_lock = threading.Lock()
+
+def get_pca9685(bus_number=1, address=PCA9685_ADDRESS):
+    """
+    Return the process-wide driver for a PCA9685 on the shared bus manager (i2c_bus.get_bus).
+
+    The pan-tilt servos and the motor PWM channels share one chip, so they must share one
+    driver: it knows whether the chip is configured.
+
+    Args:
+        bus_number (int): I2C bus number. Defaults to 1.
+        address (int): I2C address of the chip. Defaults to 0x40.
+
+    Returns:
+        PCA9685: The shared driver.
+    """
+    with _drivers_lock:
+        key = (bus_number, address)
+        if key not in _drivers:
+            _drivers[key] = PCA9685(i2c_bus.get_bus(bus_number), address)
+        return _drivers[key]
+
+class PCA9685:
+    """
+    Register-level driver for the PCA9685 16-channel PWM controller.
+
+    All channels share one PWM frequency. Transactions go through an i2c_bus.I2CBus, which
+    serializes them between threads by priority class and skips writes that would not change
+    a register, so a channel is only written when its duty actually changes.
+    """
+    def __init__(self, bus, address=PCA9685_ADDRESS):
+        """
+        Initialize the driver on a bus manager.
+
+        Args:
+            bus (i2c_bus.I2CBus): Bus manager.
+            address (int): I2C address of the chip. Defaults to 0x40.
+        """
+        self.bus = bus
+        self.address = address
+        self.frequency = None  # PWM frequency once configured
+
+    @property
+    def transactions(self):
+        """Number of I2C transactions issued on the bus."""
+        return self.bus.transactions
+
+    def write_reg(self, reg, data, priority=PRIORITY_SERVO):
+        """Write a byte to a specific register."""
+        self.bus.write_byte(self.address, reg, data, priority)
+
+    def write_block(self, reg, data, priority=PRIORITY_SERVO):
+        """Write consecutive registers starting at `reg` in a single I2C transaction."""
+        self.bus.write_block(self.address, reg, data, priority)
+
+    def read_reg(self, reg, priority=PRIORITY_SERVO):
+        """Read a byte from a specific register; known registers come from the bus shadow."""
+        return self.bus.read_byte(self.address, reg, priority)
+
+    def reset(self):
+        """Reset the PCA9685, leaving register auto-increment enabled."""
+        self.write_reg(MODE1, MODE1_AI)
+
+    def set_pwm_freq(self, freq):
+        """Set the PWM frequency of all channels."""
+        prescaleval = OSCILLATOR
+        prescaleval /= float(TICKS)
+        prescaleval /= freq
+        prescaleval -= 1.0
+        prescale = int(prescaleval + 0.5)
+        with self.bus.session(PRIORITY_BACKGROUND):
+            oldmode = self.read_reg(MODE1)  # From the shadow after reset()
+            newmode = (oldmode & 0x7F) | 0x10  # Sleep mode
+            self.write_reg(MODE1, newmode)
+            self.write_reg(PRESCALE, prescale)
+            self.write_reg(MODE1, oldmode)
+            time.sleep(0.005)
+            self.write_reg(MODE1, oldmode | 0xA1)
+            self.bus.set_shadow(self.address, MODE1, (oldmode | 0xA1) & ~MODE1_RESTART)
+            self.frequency = freq
+
+    def configure(self, freq):
+        """
+        Reset the chip and set its frequency, unless it already runs at `freq`.
+
+        Changing the frequency briefly puts the chip to sleep, which would glitch every
+        channel already in use, so later users of the shared driver skip it.
+
+        Args:
+            freq (float): PWM frequency in Hz.
+
+        Raises:
+            ValueError: If the chip was already configured at a different frequency.
+        """
+        with self.bus.session(PRIORITY_BACKGROUND):
+            if self.frequency == freq:
+                return
+            if self.frequency is not None:
+                raise ValueError(f"PCA9685 already runs at {self.frequency} Hz, cannot switch to {freq} Hz")
+            self.reset()
+            self.set_pwm_freq(freq)
+
+    def set_pwm_multi(self, first, values, priority=PRIORITY_SERVO):
+        """
+        Set the PWM signals of consecutive channels, with as few block writes as possible.
+
+        Args:
+            first (int): First channel to write.
+            values (list): (on, off) tick pairs for channels first, first + 1, ...
+            priority (int): i2c_bus priority class. Defaults to PRIORITY_SERVO.
+        """
+        data = []
+        for on, off in values:
+            data += [on & 0xFF, on >> 8, off & 0xFF, off >> 8]
+        reg = LED0_ON_L + 4 * first
+        with self.bus.session(priority):
+            for i in range(0, len(data), I2C_BLOCK_MAX):
+                self.write_block(reg + i, data[i:i + I2C_BLOCK_MAX], priority)
+
+    def set_pwm(self, channel, on, off, priority=PRIORITY_SERVO):
+        """Set the PWM signal for a specific channel in one block write."""
+        self.set_pwm_multi(channel, [(on, off)], priority)
+
+    def set_duty(self, channel, duty, priority=PRIORITY_SERVO):
+        """
+        Set a channel's duty cycle in percent. 0 and 100 use the full-off and full-on
+        bits, so the output is a steady level rather than a one-tick pulse.
+
+        Args:
+            channel (int): Channel number (0-15).
+            duty (float): Duty cycle percentage (0-100).
+            priority (int): i2c_bus priority class. Defaults to PRIORITY_SERVO.
+        """
+        self.set_pwm(channel, *duty_to_ticks(duty), priority=priority)
+
+def duty_to_ticks(duty):
+    """
+    Convert a duty cycle percentage to an (on, off) tick pair.
+
+    Returns:
+        tuple: (on, off) register values, using the full-on/full-off bits at 100% and 0%.
+    """
+    ticks = int(round(duty * TICKS / 100.0))
+    if ticks <= 0:
+        return 0, FULL
+    if ticks >= TICKS:
+        return FULL, 0
+    return 0, ticks
+
+def ticks_to_duty(on, off):
+    """Inverse of duty_to_ticks for on = 0 pairs; used to check register state."""
+    if off & FULL:
+        return 0.0
+    if on & FULL:
+        return 100.0
+    return (off - on) * 100.0 / TICKS
@@ -0,0 +1,82 @@
+class PIDController:
+    """
+    PID controller with feed-forward, anti-windup and output limits.
+
+    The derivative acts on the measurement error through a first-order low-pass filter
+    so noisy detections do not produce derivative kicks. The integral only accumulates
+    while the output is not saturated in the same direction (conditional integration)
+    and, if `integral_zone` is set, while the error is small, so large moves do not wind
+    it up; it is additionally clamped to `integral_limit`. The output is clamped to
+    `output_limit` and its change per second to `rate_limit`.
+    """
+    def __init__(self, kp, ki=0.0, kd=0.0, output_limit=None, integral_limit=None,
+                 rate_limit=None, integral_zone=None, derivative_filter=0.05):
+        """
+        Initialize the controller.
+
+        Args:
+            kp (float): Proportional gain.
+            ki (float): Integral gain (per second). Defaults to 0.
+            kd (float): Derivative gain (seconds). Defaults to 0.
+            output_limit (float, optional): Maximum absolute output. Defaults to None (unlimited).
+            integral_limit (float, optional): Maximum absolute integral contribution. Defaults to None.
+            rate_limit (float, optional): Maximum change of the output per second. Defaults to None.
+            integral_zone (float, optional): Only integrate while the absolute error is below this. Defaults to None.
+            derivative_filter (float): Time constant of the derivative low-pass filter in seconds. Defaults to 0.05.
+        """
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.output_limit = output_limit
+        self.integral_limit = integral_limit
+        self.rate_limit = rate_limit
+        self.integral_zone = integral_zone
+        self.derivative_filter = derivative_filter
+        self.reset()
+
+    def reset(self):
+        """Clear the integral, derivative and output history."""
+        self.integral = 0.0
+        self.derivative = 0.0
+        self.previous_error = None
+        self.output = 0.0
+
+    def update(self, error, dt, feed_forward=0.0):
+        """
+        Compute the next output.
+
+        Args:
+            error (float): Setpoint minus measurement.
+            dt (float): Time since the previous update in seconds.
+            feed_forward (float): Term added to the output before limiting. Defaults to 0.
+
+        Returns:
+            float: Controller output.
+        """
+        if dt <= 0:
+            return self.output
+
+        if self.previous_error is not None:
+            raw_derivative = (error - self.previous_error) / dt
+            alpha = dt / (self.derivative_filter + dt)
+            self.derivative += alpha * (raw_derivative - self.derivative)
+        self.previous_error = error
+
+        # Conditional integration: stop integrating while saturated in the direction of the error
+        candidate = self.integral + self.ki * error * dt
+        if self.integral_limit is not None:
+            candidate = max(-self.integral_limit, min(self.integral_limit, candidate))
+        unsaturated = self.kp * error + candidate + self.kd * self.derivative + feed_forward
+        saturated = self.output_limit is not None and abs(unsaturated) > self.output_limit
+        in_zone = self.integral_zone is None or abs(error) < self.integral_zone
+        if in_zone and (not saturated or unsaturated * error < 0):
+            self.integral = candidate
+
+        output = self.kp * error + self.integral + self.kd * self.derivative + feed_forward
+        if self.output_limit is not None:
+            output = max(-self.output_limit, min(self.output_limit, output))
+        if self.rate_limit is not None:
+            max_change = self.rate_limit * dt
+            output = max(self.output - max_change, min(self.output + max_change, output))
+        self.output = output
+        return output
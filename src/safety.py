@@ -0,0 +1,106 @@
+import threading
+import time
+
+from car_logging import get_logger
+
+logger = get_logger("safety")
+
+class EmergencyStop:
+    """
+    Obstacle safety cut-off that runs directly on the distance sampler thread.
+
+    A reading below `trip_distance` cuts the motors through
+    MovementController.emergency_stop() without waiting for the movement loop, and
+    latches so that any later drive command is refused. The latch releases once
+    `release_samples` consecutive readings are above `release_distance` (hysteresis),
+    or only through clear() when `auto_release` is False.
+
+    A blind sensor fails safe: `max_missed` consecutive missed echoes (None readings) trip
+    the stop as well. The default of 5 is half a second of readings at the sampler's 10 Hz,
+    so one dropped echo never stops the car but a disconnected sensor does.
+    """
+    def __init__(self, movement_controller, trip_distance=10, release_distance=15,
+                 release_samples=3, auto_release=True, max_missed=5):
+        """
+        Initialize the emergency stop.
+
+        Args:
+            movement_controller (MovementController): Controller whose motors are cut.
+            trip_distance (float): Distance in cm below which the motors are cut. Defaults to 10.
+            release_distance (float): Distance in cm the obstacle must clear to release. Defaults to 15.
+            release_samples (int): Consecutive clear readings needed to release. Defaults to 3.
+            auto_release (bool): Release automatically once clear. Defaults to True.
+            max_missed (int): Consecutive missed readings that trip the stop. Defaults to 5.
+        """
+        if release_distance < trip_distance:
+            raise ValueError("release_distance must be >= trip_distance")
+        self.movement_controller = movement_controller
+        self.trip_distance = trip_distance
+        self.release_distance = release_distance
+        self.release_samples = release_samples
+        self.auto_release = auto_release
+        self.max_missed = max_missed
+        self.trips = 0  # Number of times the stop has tripped
+        self.last_trip_reading_time = None  # time.monotonic() of the reading that tripped
+        self.last_trip_time = None  # time.monotonic() when the motors were cut
+        self._clear_count = 0
+        self._missed_count = 0
+        self._lock = threading.Lock()
+
+    @property
+    def latched(self):
+        """True while the emergency stop holds the motors off."""
+        return self.movement_controller.is_emergency_stopped()
+
+    def update(self, distance, timestamp):
+        """
+        Feed a raw distance reading. Intended as HCSR04.start_sampler's raw_callback.
+
+        Args:
+            distance (float): Distance in cm, or None on a missed echo.
+            timestamp (float): time.monotonic() when the reading was taken.
+        """
+        with self._lock:
+            if distance is None:
+                self._clear_count = 0
+                self._missed_count += 1
+                if self._missed_count >= self.max_missed and not self.latched:
+                    self._trip(timestamp)
+                    logger.warning("Emergency stop: %d consecutive missed readings", self._missed_count)
+                return
+            self._missed_count = 0
+            if distance < self.trip_distance:
+                self._clear_count = 0
+                if not self.latched:
+                    self._trip(timestamp)
+                    logger.warning("Emergency stop: obstacle at %s cm", distance)
+            elif self.latched and distance > self.release_distance:
+                self._clear_count += 1
+                if self.auto_release and self._clear_count >= self.release_samples:
+                    self._release()
+            else:
+                self._clear_count = 0
+
+    def clear(self):
+        """
+        Manually release the latch.
+
+        Returns:
+            bool: True if released; False if the obstacle has not cleared release_distance yet.
+        """
+        with self._lock:
+            if self._clear_count < self.release_samples:
+                return False
+            self._release()
+            return True
+
+    def _trip(self, timestamp):
+        self.movement_controller.emergency_stop()
+        self.last_trip_time = time.monotonic()
+        self.last_trip_reading_time = timestamp
+        self.trips += 1
+
+    def _release(self):
+        self._clear_count = 0
+        self.movement_controller.release_emergency_stop()
+        logger.info("Emergency stop released.")
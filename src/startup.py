@@ -0,0 +1,93 @@
+import concurrent.futures
+import contextlib
+import threading
+import time
+
+class StartupTimeline:
+    """
+    Records when each bring-up phase ran, relative to process start, plus one-off milestones
+    such as the first detection.
+
+    Phases may overlap: run() starts independent phases on a thread pool, and a phase may run
+    its own sub-phases in parallel. The summary compares the wall time with the sum of all
+    top-level phases, which is what a serial bring-up would take.
+    """
+    def __init__(self):
+        self.origin = time.monotonic()  # Set when this module is first imported
+        self.phases = []  # (name, start, end, depth) in seconds since origin
+        self.milestones = {}  # {name: seconds since origin}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Time a block of bring-up work as one phase."""
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        start = time.monotonic() - self.origin
+        try:
+            yield
+        finally:
+            self._local.depth = depth
+            with self._lock:
+                self.phases.append((name, start, time.monotonic() - self.origin, depth))
+
+    def milestone(self, name):
+        """Record the first time `name` is reached; later calls are ignored."""
+        if name in self.milestones:
+            return
+        with self._lock:
+            self.milestones.setdefault(name, time.monotonic() - self.origin)
+
+    def run(self, tasks, parallel=True):
+        """
+        Run bring-up phases, concurrently on a thread pool unless `parallel` is False.
+
+        Each task runs as its own phase. All tasks are run to completion even if one fails,
+        so nothing is left half-initialized in the background.
+
+        Args:
+            tasks (dict): Mapping of phase name to a callable taking no arguments.
+            parallel (bool): Run the tasks concurrently. Defaults to True.
+
+        Returns:
+            dict: Mapping of phase name to the callable's return value.
+
+        Raises:
+            Exception: The first task's exception, in task order, once all tasks have finished.
+        """
+        depth = getattr(self._local, "depth", 0)
+
+        def timed(name, task):
+            self._local.depth = depth  # Pool threads nest under the caller's phase
+            with self.phase(name):
+                return task()
+
+        if not parallel:
+            return {name: timed(name, task) for name, task in tasks.items()}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(tasks), thread_name_prefix="bring-up") as pool:
+            futures = {name: pool.submit(timed, name, task) for name, task in tasks.items()}
+            concurrent.futures.wait(futures.values())
+        for future in futures.values():
+            if future.exception() is not None:
+                raise future.exception()
+        return {name: future.result() for name, future in futures.items()}
+
+    def format_summary(self):
+        """Format the phases as a timeline, with the milestones and the serial-equivalent time."""
+        with self._lock:
+            phases = sorted(self.phases, key=lambda phase: phase[1])
+            milestones = sorted(self.milestones.items(), key=lambda item: item[1])
+        lines = [f"{'phase':<28} {'start':>7} {'end':>7} {'duration':>9}"]
+        for name, start, end, depth in phases:
+            lines.append(f"{'  ' * depth + name:<28} {start:6.2f}s {end:6.2f}s {end - start:8.2f}s")
+        for name, at in milestones:
+            lines.append(f"{name:<28} {at:6.2f}s")
+        top = [phase for phase in phases if phase[3] == 0]
+        if top:
+            wall = max(end for _, _, end, _ in top) - min(start for _, start, _, _ in top)
+            serial = sum(end - start for _, start, end, _ in top)
+            lines.append(f"bring-up {wall:.2f}s wall, {serial:.2f}s if run one after another")
+        return "\n".join(lines)
+
+startup_timeline = StartupTimeline()
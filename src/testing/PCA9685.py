@@ -1,9 +1,12 @@
-import smbus
+import os
 import time
 import sys
 import tty
 import termios
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import i2c_bus
+
 # PCA9685 Registers
 PCA9685_ADDRESS = 0x40
 MODE1 = 0x00
@@ -17,28 +20,33 @@ SERVO_MAX = 600  # Maximum pulse length out of 4096
 class PCA9685:
     def __init__(self, address=PCA9685_ADDRESS, bus=1):
         self.address = address
-        self.bus = smbus.SMBus(bus)
+        self.bus = i2c_bus.get_bus(bus)  # Shared with any other user of the bus in this process
         self.reset()
         self.set_pwm_freq(50)
 
     def reset(self):
-        self.bus.write_byte_data(self.address, MODE1, 0x00)
+        self.bus.write_byte(self.address, MODE1, 0x00)
 
     def set_pwm_freq(self, freq_hz):
         prescale_val = int(25000000.0 / (4096 * freq_hz) - 1)
-        old_mode = self.bus.read_byte_data(self.address, MODE1)
-        new_mode = (old_mode & 0x7F) | 0x10  # Sleep mode
-        self.bus.write_byte_data(self.address, MODE1, new_mode)
-        self.bus.write_byte_data(self.address, PRESCALE, prescale_val)
-        self.bus.write_byte_data(self.address, MODE1, old_mode)
-        time.sleep(0.005)
-        self.bus.write_byte_data(self.address, MODE1, old_mode | 0xA1)
+        with self.bus.session(i2c_bus.PRIORITY_BACKGROUND):
+            old_mode = self.bus.read_byte(self.address, MODE1)  # Shadowed after reset()
+            new_mode = (old_mode & 0x7F) | 0x10  # Sleep mode
+            self.bus.write_byte(self.address, MODE1, new_mode)
+            self.bus.write_byte(self.address, PRESCALE, prescale_val)
+            self.bus.write_byte(self.address, MODE1, old_mode)
+            time.sleep(0.005)
+            self.bus.write_byte(self.address, MODE1, old_mode | 0xA1)
+            self.bus.set_shadow(self.address, MODE1, old_mode | 0x21)  # RESTART clears itself
 
     def set_pwm(self, channel, on, off):
-        self.bus.write_byte_data(self.address, LED0_ON_L + 4 * channel, on & 0xFF)
-        self.bus.write_byte_data(self.address, LED0_ON_L + 4 * channel + 1, on >> 8)
-        self.bus.write_byte_data(self.address, LED0_ON_L + 4 * channel + 2, off & 0xFF)
-        self.bus.write_byte_data(self.address, LED0_ON_L + 4 * channel + 3, off >> 8)
+        # One bus session, so the four bytes of a channel are never split by another thread;
+        # bytes that did not change are skipped by the bus shadow
+        with self.bus.session(i2c_bus.PRIORITY_SERVO):
+            self.bus.write_byte(self.address, LED0_ON_L + 4 * channel, on & 0xFF)
+            self.bus.write_byte(self.address, LED0_ON_L + 4 * channel + 1, on >> 8)
+            self.bus.write_byte(self.address, LED0_ON_L + 4 * channel + 2, off & 0xFF)
+            self.bus.write_byte(self.address, LED0_ON_L + 4 * channel + 3, off >> 8)
 
     def set_servo_angle(self, channel, angle):
         pulse_length = SERVO_MIN + (angle / 180.0) * (SERVO_MAX - SERVO_MIN)
@@ -0,0 +1,105 @@
+"""
+Measure braking latency on simulated GPIO: the EmergencyStop fast path versus the old
+path (median-filtered distance -> 100 ms movement poll -> MovementController.stop()).
+
+For each trial the car drives forward, an obstacle appears at a random time, and the
+time until all four motor PWM duty cycles reach zero is recorded.
+
+Usage:
+    python bench_estop.py --trials 10
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import fake_hw
+
+gpio = fake_hw.install()
+from jmovement import MovementController
+from safety import EmergencyStop
+from ultrasonic_sensor import HCSR04
+
+TRIGGER_PIN = 17
+ECHO_PIN = 18
+
+def pwm_zero_time(movement, since):
+    """Return when every motor PWM channel was last set to 0 after `since`, or None."""
+    times = []
+    for motor in (movement.motor1, movement.motor2):
+        for pwm in (motor.pwm_in1, motor.pwm_in2):
+            zero = [t for t, duty in pwm.history if t >= since and duty == 0]
+            if pwm.duty != 0:
+                return None
+            times.append(zero[0] if zero else since)
+    return max(times)
+
+def run_trial(sim, sensor, movement, fast_path, rate_hz):
+    """Drive forward, drop an obstacle in front of the car and time the brake."""
+    sim.distance_cm = 100
+    stop_event = threading.Event()
+    estop = EmergencyStop(movement)
+    state = {"distance": None}
+
+    def on_distance(distance, timestamp):
+        state["distance"] = distance
+
+    def legacy_movement_loop():
+        # The old movement thread: poll the filtered distance every 100 ms
+        while not stop_event.is_set():
+            if state["distance"] is not None and state["distance"] < 10:
+                movement.stop()
+            else:
+                movement.move_forward(100)
+            time.sleep(0.1)
+
+    sensor.start_sampler(rate_hz=rate_hz, callback=on_distance,
+                         raw_callback=estop.update if fast_path else None)
+    if fast_path:
+        movement.move_forward(100)
+    else:
+        threading.Thread(target=legacy_movement_loop, daemon=True).start()
+    time.sleep(0.6 + random.random() * 0.2)
+
+    t_obstacle = time.monotonic()
+    sim.distance_cm = 5
+    deadline = t_obstacle + 2
+    t_zero = None
+    while t_zero is None and time.monotonic() < deadline:
+        time.sleep(0.001)
+        t_zero = pwm_zero_time(movement, t_obstacle)
+
+    stop_event.set()
+    sensor.stop_sampler()
+    trigger_to_zero = None
+    if fast_path and estop.last_trip_reading_time is not None and t_zero is not None:
+        trigger_to_zero = t_zero - estop.last_trip_reading_time
+    movement.release_emergency_stop()
+    movement.stop()
+    time.sleep(0.15)
+    return (t_zero - t_obstacle if t_zero is not None else float("nan")), trigger_to_zero
+
+def report(name, values):
+    values = [v * 1000 for v in values if v is not None]
+    print(f"{name:>40}: median {statistics.median(values):8.2f} ms, max {max(values):8.2f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--trials', help='Number of obstacle trials per path', type=int, default=10)
+    parser.add_argument('--rate', help='Ultrasonic sampling rate in Hz', type=float, default=10)
+    args = parser.parse_args()
+
+    sim = fake_hw.SimulatedHCSR04(gpio, TRIGGER_PIN, ECHO_PIN)
+    sensor = HCSR04(trigger_pin=TRIGGER_PIN, echo_pin=ECHO_PIN, settle_time=0)
+    movement = MovementController()
+
+    legacy = [run_trial(sim, sensor, movement, False, args.rate)[0] for _ in range(args.trials)]
+    fast = [run_trial(sim, sensor, movement, True, args.rate) for _ in range(args.trials)]
+
+    report("old path, obstacle -> PWM zero", legacy)
+    report("emergency stop, obstacle -> PWM zero", [f[0] for f in fast])
+    report("emergency stop, trigger -> PWM zero", [f[1] for f in fast])
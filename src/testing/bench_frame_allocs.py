@@ -0,0 +1,78 @@
+"""
+Measure memory allocations per frame in the camera capture path.
+
+Runs YOLODetector's capture thread against a fake Picamera2 (or the real camera with
+--real-camera) and reports, per camera format, the memory retained per frame and the
+peak of transient allocations. The old capture code (capture_array followed by an
+allocating cvtColor) is measured the same way for comparison. With --model, inference
+runs too and model-internal allocations are excluded from the retained figures.
+
+Usage:
+    python bench_frame_allocs.py --frames=200
+    python bench_frame_allocs.py --inference-size=320
+    python bench_frame_allocs.py --real-camera --model=yolov5nu_ncnn_model
+"""
+import argparse
+import os
+import sys
+import tracemalloc
+
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import fake_hw
+
+def legacy_capture(picam, frames):
+    """The previous capture loop body: a fresh array from capture_array and from cvtColor per frame."""
+    tracemalloc.start(25)
+    tracemalloc.reset_peak()
+    start_size, _ = tracemalloc.get_traced_memory()
+    for _ in range(frames):
+        frame_bgra = picam.capture_array()
+        frame = cv2.cvtColor(frame_bgra, cv2.COLOR_BGRA2BGR)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return max(0, peak - start_size)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', help='Frames to measure per format', type=int, default=200)
+    parser.add_argument('--resolution', help='Capture resolution WxH', default='640x360')
+    parser.add_argument('--fps', help='Fake camera frame rate', type=float, default=120)
+    parser.add_argument('--model', help='Also run inference with this model')
+    parser.add_argument('--inference-size', help='Also measure a low-resolution inference stream of this size', type=int)
+    parser.add_argument('--real-camera', help='Use the real Picamera2 instead of the fake', action='store_true')
+    args = parser.parse_args()
+
+    if not args.real_camera:
+        fake_hw.install()
+        fake_hw.FakePicamera2.fps = args.fps
+    from picamera2 import Picamera2
+    from yolo_detect_headless import YOLODetector
+
+    resolution = tuple(int(v) for v in args.resolution.split('x'))
+    frame_bytes = resolution[0] * resolution[1] * 3
+    print(f"One {resolution[0]}x{resolution[1]} BGR frame is {frame_bytes / 1024:.0f} KiB")
+
+    picam = Picamera2()
+    picam.configure(picam.create_video_configuration(main={"format": 'XRGB8888', "size": resolution}))
+    picam.start()
+    peak = legacy_capture(picam, args.frames)
+    picam.stop()
+    picam.close()
+    print(f"{'legacy XRGB8888':>16}: peak {peak / 1024:8.1f} KiB")
+
+    for camera_format in ("XRGB8888", "RGB888"):
+        detector = YOLODetector(args.model, resolution, camera_format=camera_format)
+        size, count, peak = detector.measure_allocations(args.frames, run_model=args.model is not None)
+        detector.cleanup()
+        print(f"{camera_format:>16}: retained {size:7.1f} B/frame in {count:5.2f} blocks/frame, "
+              f"peak {peak / 1024:8.1f} KiB")
+
+    if args.inference_size:
+        detector = YOLODetector(args.model, resolution, inference_size=args.inference_size)
+        size, count, peak = detector.measure_allocations(args.frames, run_model=args.model is not None)
+        detector.cleanup()
+        lores = "x".join(str(v) for v in detector.lores_size)
+        print(f"{'YUV420 ' + lores:>16}: retained {size:7.1f} B/frame in {count:5.2f} blocks/frame, "
+              f"peak {peak / 1024:8.1f} KiB")
@@ -0,0 +1,121 @@
+"""
+Benchmark detect-every-N hybrid tracking against full detection on a recorded video.
+
+Full YOLO detection on every frame is the ground truth. The hybrid tracker runs YOLO
+every N frames (adaptive) and optical flow in between. Reports the effective box update
+rate of both, and how far the hybrid boxes drift from ground truth (IoU), bucketed by
+frames since the last detection.
+
+Usage:
+    python bench_hybrid_tracking.py --model=yolov5nu_ncnn_model --video=drive.mp4 --object=person --interval=5
+    python bench_hybrid_tracking.py --synthetic   (moving target, simulated 80 ms detector; no model needed)
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from box_tracker import HybridBoxTracker
+from detections import best_detection, box_iou, class_ids_for, extract_detections
+
+def load_video(path, max_frames):
+    """Read up to max_frames BGR frames from a video file."""
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+def synthetic_video(count, size=(640, 360)):
+    """Generate a textured box moving over a textured background, with its true boxes."""
+    rng = np.random.default_rng(0)
+    width, height = size
+    background = cv2.GaussianBlur(rng.integers(0, 255, (height, width, 3), dtype=np.uint8), (5, 5), 0)
+    target = cv2.GaussianBlur(rng.integers(0, 255, (120, 80, 3), dtype=np.uint8), (3, 3), 0)
+    frames, boxes = [], []
+    for i in range(count):
+        cx = width / 2 + 200 * np.sin(i / 40)
+        cy = height / 2 + 60 * np.sin(i / 25)
+        x0, y0 = int(cx - 40), int(cy - 60)
+        frame = background.copy()
+        frame[y0:y0 + 120, x0:x0 + 80] = target
+        frames.append(frame)
+        boxes.append((x0, y0, x0 + 80, y0 + 120))
+    return frames, boxes
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', help='Path to YOLO model')
+    parser.add_argument('--video', help='Recorded video file')
+    parser.add_argument('--object', help='Class to track', default='person')
+    parser.add_argument('--thresh', help='Confidence threshold', type=float, default=0.6)
+    parser.add_argument('--interval', help='Initial detection interval N', type=int, default=5)
+    parser.add_argument('--fixed', help='Disable the adaptive interval', action='store_true')
+    parser.add_argument('--frames', help='Maximum number of frames to use', type=int, default=600)
+    parser.add_argument('--synthetic', help='Use a synthetic moving target instead of a video and model', action='store_true')
+    parser.add_argument('--synthetic-detect-ms', help='Simulated detector latency for --synthetic', type=float, default=80)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        frames, truth_boxes = synthetic_video(args.frames)
+        frame_index = {id(f): i for i, f in enumerate(frames)}
+
+        def detect(frame):
+            time.sleep(args.synthetic_detect_ms / 1000)
+            return truth_boxes[frame_index[id(frame)]]
+    else:
+        if not args.model or not args.video:
+            parser.error('--model and --video are required unless --synthetic is given')
+        from ultralytics import YOLO
+        model = YOLO(args.model, task='detect')
+        class_ids = class_ids_for(model.names, args.object)
+        frames = load_video(args.video, args.frames)
+
+        def detect(frame):
+            results = model(frame, verbose=False)
+            target = best_detection(extract_detections(results[0].boxes, args.thresh, class_ids))
+            if target is None:
+                return None
+            return (int(target["xmin"]), int(target["ymin"]), int(target["xmax"]), int(target["ymax"]))
+
+    # Ground truth: full detection on every frame
+    t_start = time.perf_counter()
+    truth = [detect(frame) for frame in frames]
+    full_rate = len(frames) / (time.perf_counter() - t_start)
+
+    # Hybrid: detector every N frames, optical flow in between
+    hybrid = HybridBoxTracker(detect, detect_interval=args.interval, adaptive=not args.fixed)
+    ious = {}
+    misses = 0
+    t_start = time.perf_counter()
+    for frame, true_box in zip(frames, truth):
+        bbox, _ = hybrid.update(frame)
+        age = hybrid.frames_since_detection
+        if true_box is None:
+            continue
+        if bbox is None:
+            misses += 1
+            continue
+        ious.setdefault(age, []).append(box_iou(bbox, true_box))
+    hybrid_rate = len(frames) / (time.perf_counter() - t_start)
+
+    all_ious = [v for values in ious.values() for v in values]
+    print(f"frames: {len(frames)}, target present in {sum(b is not None for b in truth)}")
+    print(f"full detection: {full_rate:6.1f} box updates/s")
+    print(f"hybrid:         {hybrid_rate:6.1f} box updates/s ({hybrid_rate / full_rate:.1f}x), "
+          f"YOLO on {hybrid.detections_run} frames, final interval {hybrid.detect_interval}")
+    if all_ious:
+        print(f"IoU vs full detection: mean {statistics.mean(all_ious):.3f}, "
+              f"p10 {np.percentile(all_ious, 10):.3f}, target lost on {misses} frames")
+        print("IoU drift by frames since last detection:")
+        for age in sorted(ious):
+            print(f"  {age:>3}: mean IoU {statistics.mean(ious[age]):.3f} over {len(ious[age])} frames")
@@ -0,0 +1,119 @@
+"""
+Exercise the shared I2C bus manager (i2c_bus.I2CBus) on a fake SMBus.
+
+1. Shadowing: configures a PCA9685, then runs a servo tracking sweep and a ramped motor
+   profile that both hold still part of the time, and reports the transactions issued
+   next to the writes skipped and the reads answered from the shadow registers.
+2. Priority: --servo-threads threads write servo trims back to back while a motor thread
+   changes a duty at 50 Hz. Each transaction takes its wire time (--byte-us per byte).
+   Reports how long the motor writes took, with the bus granted in arrival order and by
+   priority class.
+
+Usage:
+    python bench_i2c_bus.py
+    python bench_i2c_bus.py --servo-threads=4 --byte-us=90 --seconds=3
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import fake_hw
+
+fake_hw.install()
+from i2c_bus import I2CBus, PRIORITY_MOTOR
+from pca9685 import PCA9685
+
+SERVO_CHANNELS = (0, 1)
+MOTOR_CHANNEL = 8
+
+def shadowing(steps):
+    """Run the sweep and profile on a fresh bus and print what the shadow saved."""
+    bus = I2CBus(fake_hw.FakeSMBus())
+    driver = PCA9685(bus)
+    driver.configure(60)
+    driver.configure(60)  # A second user of the chip: no traffic
+    configured = bus.stats()
+    print(f"configure(60) twice: {configured['transactions']} transactions, "
+          f"{configured['reads_shadowed']} MODE1 reads from shadow")
+
+    requested = 0
+    for i in range(steps):
+        # The target sits still for half of each second of tracking
+        pan = 90 + 30 * np.sin(i / 15) if (i // 25) % 2 else 90
+        tilt = 120
+        driver.set_pwm_multi(SERVO_CHANNELS[0], [(0, int(tilt * 2 + 150)), (0, int(pan * 2 + 150))])
+        # Ramp to cruise, hold, ramp down
+        duty = min(60, i * 2, max(0, (steps - i) * 2))
+        driver.set_duty(MOTOR_CHANNEL, duty, PRIORITY_MOTOR)
+        requested += 2
+    stats = bus.stats()
+    issued = stats["transactions"] - configured["transactions"]
+    skipped = stats["writes_skipped"] - configured["writes_skipped"]
+    print(f"{steps} steps: {requested} block writes requested, {issued} issued, {skipped} skipped as unchanged "
+          f"({skipped / requested:.0%})")
+
+def servo_writer(driver, stop, count, offset):
+    """Write changing servo ticks back to back; `offset` keeps threads from writing equal values."""
+    i = 0
+    while not stop.is_set():
+        driver.set_pwm_multi(SERVO_CHANNELS[0], [(0, 300 + offset + i % 2), (0, 400 - offset - i % 2)])
+        i += 1
+    count.append(i)
+
+def contention(prioritize, args):
+    """
+    Run the servo writers and the motor writer on one bus.
+
+    Returns:
+        tuple: (motor write latencies in seconds, servo writes completed, I2CBus)
+    """
+    smbus = fake_hw.FakeSMBus()
+    smbus.byte_time = args.byte_us * 1e-6
+    bus = I2CBus(smbus, prioritize=prioritize)
+    driver = PCA9685(bus)
+    driver.configure(60)
+    stop = threading.Event()
+    count = []
+    writers = [threading.Thread(target=servo_writer, args=(driver, stop, count, 4 * n), daemon=True)
+               for n in range(args.servo_threads)]
+    for writer in writers:
+        writer.start()
+
+    latencies = []
+    end = time.monotonic() + args.seconds
+    i = 0
+    while time.monotonic() < end:
+        start = time.perf_counter()
+        driver.set_duty(MOTOR_CHANNEL, 40 + i % 2 * 20, PRIORITY_MOTOR)
+        latencies.append(time.perf_counter() - start)
+        i += 1
+        time.sleep(0.02)
+    stop.set()
+    for writer in writers:
+        writer.join()
+    return np.array(latencies), sum(count), bus
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--steps', help='Tracking steps for the shadowing run', type=int, default=1000)
+    parser.add_argument('--servo-threads', help='Threads writing servo trims back to back', type=int, default=3)
+    parser.add_argument('--byte-us', help='Wire time per byte in microseconds (90 for 100 kHz)', type=float, default=90)
+    parser.add_argument('--seconds', help='Duration of each contention run', type=float, default=2)
+    args = parser.parse_args()
+
+    shadowing(args.steps)
+    print()
+    print(f"{'grant order':>12} {'motor write p50':>16} {'p99':>9} {'max':>9} {'servo writes/s':>15}")
+    for prioritize in (False, True):
+        latencies, servo_writes, bus = contention(prioritize, args)
+        p50, p99 = np.percentile(latencies * 1e3, [50, 99])
+        name = "priority" if prioritize else "arrival"
+        print(f"{name:>12} {p50:13.2f} ms {p99:6.2f} ms {latencies.max() * 1e3:6.2f} ms "
+              f"{servo_writes / args.seconds:15.0f}")
+    print("\npriority run:")
+    print(bus.format_stats())
@@ -0,0 +1,144 @@
+"""
+Closed-loop pan aiming benchmark: raw-box stepping versus Kalman-filtered, latency-compensated aiming.
+
+The target's bearing (the pan angle that would center it) is replayed from a detection
+trace or synthesized as steps. Frames are captured at a fixed rate, detections arrive after
+the pipeline latency (with noise and dropouts), and the pan servo is driven by the real
+ServoMotionEngine stepped in simulated time, so runs take milliseconds.
+
+Detection traces are CSV files with a header and columns: t (capture time, seconds),
+cx (box center x in pixels) and pan (pan servo angle at capture time).
+
+Usage:
+    python bench_kalman_aiming.py
+    python bench_kalman_aiming.py --trace detections.csv --latency 0.2
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import fake_hw
+
+fake_hw.install()
+from object_tracker import PanTiltAimer
+from pantilt import PanTiltController, ServoMotionEngine
+
+RESOLUTION = (640, 360)
+TICK = 0.02  # Servo engine tick (50 Hz)
+
+def step_trace(duration):
+    """Bearing that jumps between a few angles, to measure settling."""
+    times = np.array([0.0, 1.0, 1.0, 4.0, 4.0, 7.0, 7.0, duration])
+    bearings = np.array([90.0, 90.0, 110.0, 110.0, 75.0, 75.0, 95.0, 95.0])
+    steps = [1.0, 4.0, 7.0]
+    return times, bearings, steps
+
+def load_trace(path, aimer):
+    """Convert a recorded detection trace into target bearings."""
+    times, bearings = [], []
+    with open(path) as f:
+        for row in csv.DictReader(f):
+            cx, pan = float(row["cx"]), float(row["pan"])
+            times.append(float(row["t"]))
+            bearings.append(pan - (cx - RESOLUTION[0] // 2) / aimer.px_per_deg_x)
+    times = np.array(times) - times[0]
+    return times, np.array(bearings), []
+
+def simulate(times, bearings, use_kalman, fps, latency, noise_px, dropout, seed):
+    """Run the closed loop and return arrays of (time, pointing error in pixels)."""
+    rng = random.Random(seed)
+    aimer = PanTiltAimer(RESOLUTION, use_kalman=use_kalman)
+    controller = PanTiltController()
+    controller.initialize_to_middle()
+    engine = ServoMotionEngine(controller)
+    pan_ch, tilt_ch = controller.SERVO_PAN_CH, controller.SERVO_TILT_CH
+
+    pending = []  # (arrival time, capture time, box)
+    next_frame = 0.0
+    t = 0.0
+    log_t, log_err = [], []
+    while t < times[-1]:
+        target = float(np.interp(t, times, bearings))
+        pan = engine.get_angle(pan_ch)
+        error_px = (pan - target) * aimer.px_per_deg_x
+
+        if t >= next_frame:
+            next_frame += 1.0 / fps
+            bbox = None  # Dropout: the frame is processed but the target is not found
+            if rng.random() >= dropout:
+                cx = RESOLUTION[0] / 2 + error_px + rng.gauss(0, noise_px)
+                cy = RESOLUTION[1] / 2
+                bbox = (cx - 40, cy - 60, cx + 40, cy + 60)
+            pending.append((t + latency, t, bbox))
+
+        # Like ObjectTracker.track_object: one observation and one correction per processed frame
+        while pending and pending[0][0] <= t:
+            _, t_capture, bbox = pending.pop(0)
+            angles = engine.angles_at(t_capture)
+            aimer.observe(bbox, t_capture, angles[pan_ch], angles[tilt_ch])
+            pan_target = engine.get_target(pan_ch)
+            _, pan_step, _ = aimer.correction(t, pan_target, engine.get_target(tilt_ch))
+            if pan_step:
+                engine.set_target(pan_ch, pan_target + pan_step)
+
+        engine.step(TICK, now=t)
+        log_t.append(t)
+        log_err.append(error_px)
+        t += TICK
+    return np.array(log_t), np.array(log_err)
+
+def step_metrics(log_t, log_err, steps, end, band):
+    """Settling time, overshoot and oscillation count for each target step."""
+    results = []
+    bounds = steps + [end]
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        window = (log_t >= start) & (log_t < stop)
+        t, err = log_t[window], log_err[window]
+        outside = np.nonzero(np.abs(err) > band)[0]
+        if not len(outside):
+            settle = 0.0
+        elif outside[-1] + 1 < len(t):
+            settle = t[outside[-1] + 1] - start
+        else:
+            settle = float("inf")  # Never settled within the segment
+        # Overshoot: largest excursion past the target, opposite to the initial error
+        overshoot = max(0.0, float(np.max(-np.sign(err[0]) * err)))
+        signs = np.sign(err[np.abs(err) > band])
+        oscillations = int(np.count_nonzero(np.diff(signs)))
+        results.append((settle, overshoot, oscillations))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--trace', help='Detection trace CSV (t, cx, pan); defaults to synthetic steps')
+    parser.add_argument('--fps', help='Camera/box update rate', type=float, default=25)
+    parser.add_argument('--latency', help='Capture + inference latency in seconds', type=float, default=0.15)
+    parser.add_argument('--noise', help='Box center noise in pixels (std)', type=float, default=3)
+    parser.add_argument('--dropout', help='Probability a frame has no detection', type=float, default=0.1)
+    parser.add_argument('--band', help='Settled when the error stays within this many pixels', type=float, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.trace:
+        times, bearings, steps = load_trace(args.trace, PanTiltAimer(RESOLUTION))
+    else:
+        times, bearings, steps = step_trace(10.0)
+
+    for name, use_kalman in (("raw box", False), ("kalman", True)):
+        log_t, log_err = simulate(times, bearings, use_kalman, args.fps, args.latency,
+                                  args.noise, args.dropout, args.seed)
+        settled = log_err[log_t > 0.5]
+        line = f"{name:>8}: RMS error {np.sqrt(np.mean(settled ** 2)):6.1f} px"
+        if steps:
+            metrics = step_metrics(log_t, log_err, steps, times[-1], args.band)
+            settle = np.mean([m[0] for m in metrics])
+            overshoot = np.mean([m[1] for m in metrics])
+            oscillations = sum(m[2] for m in metrics)
+            line += (f", mean settling {settle:5.2f} s, mean overshoot {overshoot:5.1f} px, "
+                     f"{oscillations} oscillations")
+        print(line)
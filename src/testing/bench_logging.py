@@ -0,0 +1,75 @@
+"""
+Caller-side cost of console output from a control loop: print() versus queued logging.
+
+A 50 Hz loop emits one message per iteration to a stream that stalls like a congested SSH
+session or a slow SD card. With print() every stall lands on the loop; with car_logging the
+loop only enqueues, and the writer thread collapses repeats into "(×N in last 5 s)" lines.
+
+Usage:
+    python bench_logging.py --stall-ms=20 --seconds=6
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import car_logging
+
+class SlowStream(io.StringIO):
+    """Stream whose writes block for a fixed time."""
+    def __init__(self, stall):
+        super().__init__()
+        self.stall = stall
+        self.writes = 0
+
+    def write(self, text):
+        time.sleep(self.stall)
+        self.writes += 1
+        return super().write(text)
+
+def run_loop(emit, seconds, rate_hz):
+    """Run a paced loop calling emit(i) each iteration; return per-call times and late ticks."""
+    period = 1.0 / rate_hz
+    costs, late = [], 0
+    next_tick = time.perf_counter()
+    end = next_tick + seconds
+    i = 0
+    while next_tick < end:
+        start = time.perf_counter()
+        emit(i)
+        costs.append(time.perf_counter() - start)
+        next_tick += period
+        delay = next_tick - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            late += 1
+        i += 1
+    return np.array(costs) * 1000, late
+
+def report(name, costs, late, writes):
+    print(f"{name:>8}: per call p50 {np.percentile(costs, 50):7.3f} ms, p99 {np.percentile(costs, 99):7.3f} ms, "
+          f"max {costs.max():7.3f} ms, {late} late ticks, {writes} stream writes")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--stall-ms', help='Time each stream write blocks', type=float, default=20)
+    parser.add_argument('--seconds', help='Loop duration', type=float, default=6)
+    parser.add_argument('--rate', help='Loop rate in Hz', type=float, default=50)
+    args = parser.parse_args()
+
+    stream = SlowStream(args.stall_ms / 1000)
+    costs, late = run_loop(lambda i: print(f"Distance: {100 + i % 7} cm", file=stream), args.seconds, args.rate)
+    report("print", costs, late, stream.writes)
+
+    stream = SlowStream(args.stall_ms / 1000)
+    logger = car_logging.setup_logging("INFO", stream=stream)
+    costs, late = run_loop(lambda i: logger.info("Distance: %s cm", 100 + i % 7), args.seconds, args.rate)
+    car_logging.shutdown_logging()
+    report("logging", costs, late, stream.writes)
+    print("logged output:")
+    print(stream.getvalue(), end="")
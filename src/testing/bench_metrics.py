@@ -0,0 +1,60 @@
+"""
+Measure the cost of stage instrumentation and check the metrics endpoint.
+
+Times StageMetrics.record() together with the two perf_counter() calls around a stage,
+reports it as a share of a typical frame time, then serves the histograms over HTTP
+and fetches them once like a Prometheus scrape would.
+
+Usage:
+    python bench_metrics.py --samples=200000 --frame-ms=60
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from metrics import StageMetrics
+
+# Stages timed once per tracked frame in the production path
+STAGES_PER_FRAME = ("capture", "color_conversion", "inference", "postprocess", "track_frame", "servo_write")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--samples', type=int, default=200000)
+    parser.add_argument('--frame-ms', help='Typical frame time to compare against', type=float, default=60)
+    parser.add_argument('--port', type=int, default=9108)
+    args = parser.parse_args()
+
+    # Overhead: exactly what an instrumented stage adds
+    overhead = StageMetrics()
+    start = time.perf_counter()
+    for _ in range(args.samples):
+        t0 = time.perf_counter()
+        overhead.record("empty", time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    per_record = elapsed / args.samples
+    per_frame = per_record * len(STAGES_PER_FRAME)
+    print(f"record() with timing: {per_record * 1e6:.2f} us; {len(STAGES_PER_FRAME)} stages per frame = "
+          f"{per_frame * 1e6:.1f} us = {per_frame / (args.frame_ms / 1000) * 100:.3f}% of a {args.frame_ms:.0f} ms frame")
+
+    # Accuracy: quantiles from the buckets against exact quantiles of the same samples
+    metrics = StageMetrics()
+    durations = [random.lognormvariate(-4, 1) for _ in range(1000)]
+    for duration in durations:
+        metrics.record("inference", duration)
+    count, p50, p95, p99 = metrics.summary()["inference"]
+    ordered = sorted(durations)
+    print(f"Histogram p50/p95/p99 {p50:.2f}/{p95:.2f}/{p99:.2f} ms vs exact "
+          f"{ordered[500] * 1000:.2f}/{ordered[950] * 1000:.2f}/{ordered[990] * 1000:.2f} ms")
+
+    metrics.start_http_server(args.port)
+    body = urllib.request.urlopen(f"http://127.0.0.1:{args.port}/metrics").read().decode()
+    metrics.stop_http_server()
+    print(f"Scrape returned {len(body.splitlines())} lines, e.g.:")
+    for line in body.splitlines():
+        if "quantile=" in line:
+            print(f"  {line}")
+    metrics.dump()
@@ -0,0 +1,180 @@
+"""
+Compare the motor PWM backends: RPi.GPIO software PWM versus PCA9685 hardware channels.
+
+1. Register check (fake SMBus): drives MovementController(pwm_backend="pca9685") through a
+   command sequence and decodes PCA9685 channels 8-11 after every command, checking the
+   duty and direction of both wheels, the bus transactions per command, and that the
+   pan-tilt servo channels are left alone.
+2. CPU and jitter: holds both motors at --duty for --seconds, then replays ramp-rate
+   speed changes, and reports the process CPU time for each backend. Off the Pi the four
+   RPi.GPIO PWM threads are emulated by Python threads that toggle a level on schedule
+   (RPi.GPIO does the same in C, so absolute numbers are an upper bound); their edge
+   lateness is then measured with --load threads running numpy matrix products, standing
+   in for YOLO inference saturating the cores. With --real both backends drive the real
+   hardware and only CPU time is reported.
+
+Usage:
+    python bench_motor_pwm.py
+    python bench_motor_pwm.py --seconds=5 --load=4
+    python bench_motor_pwm.py --real
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import fake_hw
+
+COMMANDS = [
+    ("move_forward(60)", lambda m: m.move_forward(60), (60, 60)),
+    ("turn_left(40)", lambda m: m.turn_left(40), (-40, 40)),
+    ("apply(-30, 75)", lambda m: m.apply(-30, 75), (-30, 75)),
+    ("move_backward(100)", lambda m: m.move_backward(100), (-100, -100)),
+    ("move_backward(100)", lambda m: m.move_backward(100), (-100, -100)),
+    ("stop()", lambda m: m.stop(), (0, 0)),
+]
+
+def channel_duty(registers, channel):
+    """Decode a channel's duty cycle from the PCA9685 register file."""
+    from pca9685 import LED0_ON_L, ticks_to_duty
+    reg = LED0_ON_L + 4 * channel
+    on = registers.get(reg, 0) | registers.get(reg + 1, 0) << 8
+    off = registers.get(reg + 2, 0) | registers.get(reg + 3, 0) << 8
+    return ticks_to_duty(on, off)
+
+def wheel_speed(registers, channels):
+    """Signed wheel speed from a motor's (in1, in2) channels."""
+    forward, reverse = (channel_duty(registers, ch) for ch in channels)
+    return forward - reverse
+
+def check_registers():
+    """
+    Run COMMANDS on the PCA9685 backend and compare the decoded wheel speeds to the expected ones.
+
+    Returns:
+        bool: True if every command left the expected register state.
+    """
+    from jmovement import MovementController
+    from pantilt import PanTiltController
+
+    pan_tilt = PanTiltController()
+    pan_tilt.initialize_to_middle()
+    movement = MovementController(pwm_backend="pca9685")
+    registers = pan_tilt.bus.smbus.registers[pan_tilt.PCA9685_ADDRESS]
+    servo_channels = (pan_tilt.SERVO_TILT_CH, pan_tilt.SERVO_PAN_CH)
+    servos = [channel_duty(registers, ch) for ch in servo_channels]
+    right_channels, left_channels = movement.PCA9685_CHANNELS
+
+    ok = True
+    print(f"{'command':>20} {'left':>7} {'right':>7} {'expected':>12} {'transactions':>13}")
+    for name, command, expected in COMMANDS:
+        before = pan_tilt.i2c_transactions
+        command(movement)
+        transactions = pan_tilt.i2c_transactions - before
+        left = wheel_speed(registers, left_channels)
+        right = wheel_speed(registers, right_channels)
+        match = np.allclose((left, right), expected, atol=100 / 4096)
+        ok &= match
+        print(f"{name:>20} {left:6.1f}% {right:6.1f}% {str(expected):>12} {transactions:13d}"
+              f"{'' if match else '  MISMATCH'}")
+    untouched = [channel_duty(registers, ch) for ch in servo_channels] == servos
+    ok &= untouched
+    print(f"servo channels untouched: {untouched}")
+    return ok
+
+def soft_pwm(level, frequency, duty, stop, lateness):
+    """Emulated RPi.GPIO PWM thread: toggle `level` on schedule and record how late each edge was."""
+    period = 1.0 / frequency
+    next_edge = time.perf_counter()
+    high = False
+    while not stop.is_set():
+        next_edge += period * (duty / 100 if not high else 1 - duty / 100)
+        high = not high
+        delay = next_edge - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        level[0] = high
+        lateness.append(time.perf_counter() - next_edge)
+
+def inference_load(stop):
+    """Keep a core busy the way inference does: numpy work that releases the GIL."""
+    a = np.random.rand(256, 256).astype(np.float32)
+    while not stop.is_set():
+        a = np.tanh(a @ a)
+
+def measure(movement, args, emulate_threads):
+    """
+    Hold the motors at args.duty, then apply ramp-rate speed changes, measuring process CPU.
+    Emulated PWM threads keep running under args.load busy threads to measure their edge lateness.
+
+    Returns:
+        tuple: (hold CPU %, command CPU %, edge lateness samples in seconds under load)
+    """
+    stop = threading.Event()
+    lateness = []
+    if emulate_threads:
+        for _ in range(4):
+            threading.Thread(target=soft_pwm, args=([False], args.frequency, args.duty, stop, lateness),
+                             daemon=True).start()
+
+    movement.apply(args.duty, args.duty)
+    cpu = time.process_time()
+    time.sleep(args.seconds)
+    hold = (time.process_time() - cpu) / args.seconds
+
+    cpu = time.process_time()
+    period = 1.0 / 50  # DriveRamp tick rate
+    end = time.monotonic() + args.seconds
+    i = 0
+    while time.monotonic() < end:
+        speed = args.duty * (0.5 + 0.5 * np.sin(i * 0.1))
+        movement.apply(speed, -speed)
+        i += 1
+        time.sleep(period)
+    command = (time.process_time() - cpu) / args.seconds
+
+    if emulate_threads and args.load:
+        del lateness[:]
+        for _ in range(args.load):
+            threading.Thread(target=inference_load, args=(stop,), daemon=True).start()
+        time.sleep(args.seconds)
+    stop.set()
+    movement.stop()
+    return hold * 100, command * 100, list(lateness)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', help='Measurement time per phase', type=float, default=3)
+    parser.add_argument('--duty', help='Motor duty cycle in percent', type=float, default=50)
+    parser.add_argument('--frequency', help='Software PWM frequency in Hz', type=float, default=500)
+    parser.add_argument('--load', help='Busy threads standing in for inference', type=int, default=2)
+    parser.add_argument('--real', help='Use RPi.GPIO and the real I2C bus instead of the fakes', action='store_true')
+    args = parser.parse_args()
+
+    if not args.real:
+        fake_hw.install()
+        if not check_registers():
+            print("register check FAILED")
+            sys.exit(1)
+        print()
+    from jmovement import MovementController
+
+    print(f"{'backend':>12} {'CPU holding':>12} {'CPU commanding':>15} {'lateness under load p50/p99':>28}")
+    for backend in ("gpio", "pca9685"):
+        movement = MovementController(pwm_backend=backend)
+        emulate = backend == "gpio" and not args.real
+        hold, command, lateness = measure(movement, args, emulate)
+        if backend == "pca9685":
+            jitter = "hardware"
+        elif lateness:  # Seconds late per edge; 2 ms is a whole 500 Hz period
+            p50, p99 = np.percentile(np.array(lateness) * 1e6, [50, 99])
+            jitter = f"{p50:.0f}/{p99:.0f} us"
+        else:
+            jitter = "not measured"
+        name = backend + (" (emul.)" if emulate else "")
+        print(f"{name:>12} {hold:10.1f} % {command:13.1f} % {jitter:>28}")
+        movement.cleanup()
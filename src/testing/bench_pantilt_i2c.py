@@ -0,0 +1,67 @@
+"""
+Count I2C traffic per tracking step for the pan-tilt servos on a fake SMBus.
+
+Compares the old per-register writes (four write_byte_data calls per channel, one
+channel at a time) against auto-increment block writes through set_servo_degrees,
+and checks that both leave the PCA9685 registers in the same state. Both go through the
+shared i2c_bus manager, which skips per-register writes of unchanged bytes (such as the
+on ticks), so the per-register count is below the four writes per channel it issues.
+The fake bus does not model wire time by default; a real 100 kHz bus pays roughly 0.3 ms
+per byte-write transaction.
+
+Usage:
+    python bench_pantilt_i2c.py --steps 1000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import fake_hw
+
+fake_hw.install()
+from pantilt import PanTiltController
+
+def legacy_set_pwm(controller, num, on, off):
+    """The old PanTiltController.pca9685_set_pwm: one transaction per register."""
+    reg = controller.LED0_ON_L + 4 * num
+    controller.pca.write_reg(reg, on & 0xFF)
+    controller.pca.write_reg(reg + 1, on >> 8)
+    controller.pca.write_reg(reg + 2, off & 0xFF)
+    controller.pca.write_reg(reg + 3, off >> 8)
+
+def tracking_angles(steps):
+    """Pan/tilt angles for a synthetic tracking sweep."""
+    for i in range(steps):
+        yield 90 + (i % 60) - 30, 120 + (i % 20) - 10
+
+def run(steps, block_writes):
+    """Drive the servos through a sweep and return (transactions, elapsed seconds, registers)."""
+    controller = PanTiltController()
+    controller.initialize_to_middle()
+    bus = controller.bus
+    start_transactions = controller.i2c_transactions
+    t_start = time.perf_counter()
+    for pan, tilt in tracking_angles(steps):
+        if block_writes:
+            controller.set_servo_degrees({controller.SERVO_PAN_CH: pan, controller.SERVO_TILT_CH: tilt})
+        else:
+            legacy_set_pwm(controller, controller.SERVO_PAN_CH, 0, controller.degree_to_ticks(pan))
+            legacy_set_pwm(controller, controller.SERVO_TILT_CH, 0, controller.degree_to_ticks(tilt))
+    elapsed = time.perf_counter() - t_start
+    return controller.i2c_transactions - start_transactions, elapsed, dict(bus.smbus.registers[controller.PCA9685_ADDRESS])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--steps', help='Number of tracking steps (pan and tilt both move)', type=int, default=1000)
+    args = parser.parse_args()
+
+    legacy_tx, legacy_t, legacy_regs = run(args.steps, block_writes=False)
+    block_tx, block_t, block_regs = run(args.steps, block_writes=True)
+
+    print(f"{'mode':>14} {'transactions/step':>18} {'us/step':>9}")
+    print(f"{'per-register':>14} {legacy_tx / args.steps:>18.1f} {legacy_t / args.steps * 1e6:>9.1f}")
+    print(f"{'block write':>14} {block_tx / args.steps:>18.1f} {block_t / args.steps * 1e6:>9.1f}")
+    print(f"bus traffic reduction: {legacy_tx / block_tx:.0f}x fewer transactions")
+    print(f"final register state identical: {legacy_regs == block_regs}")
@@ -0,0 +1,108 @@
+"""
+Micro-benchmark for detection post-processing.
+
+Compares the old per-box loop (indexing `detections[i]` and calling `.item()` per box)
+against the vectorized `extract_detections` on synthetic result tensors.
+
+Usage:
+    python bench_postprocess.py --iterations 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from detections import extract_detections
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+class _FakeTensor:
+    """Minimal stand-in for a CPU torch tensor when torch is not installed."""
+    def __init__(self, array):
+        self._array = array
+
+    def __getitem__(self, idx):
+        return _FakeTensor(self._array[idx])
+
+    def __len__(self):
+        return len(self._array)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self._array
+
+    def item(self):
+        return self._array.item()
+
+class SyntheticBoxes:
+    """Mimics the parts of ultralytics `Boxes` used by the post-processing code."""
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+
+    def __len__(self):
+        return len(self.conf)
+
+    def __getitem__(self, i):
+        return SyntheticBoxes(self.xyxy[i:i + 1], self.conf[i:i + 1], self.cls[i:i + 1])
+
+def make_boxes(count, rng):
+    """Build synthetic boxes with random coordinates, confidences and classes."""
+    xy = rng.uniform(0, 600, size=(count, 2))
+    wh = rng.uniform(10, 200, size=(count, 2))
+    xyxy = np.hstack([xy, xy + wh]).astype(np.float32)
+    conf = rng.uniform(0, 1, size=count).astype(np.float32)
+    cls = rng.integers(0, 80, size=count).astype(np.float32)
+    if torch is not None:
+        return SyntheticBoxes(torch.from_numpy(xyxy), torch.from_numpy(conf), torch.from_numpy(cls))
+    return SyntheticBoxes(_FakeTensor(xyxy), _FakeTensor(conf), _FakeTensor(cls))
+
+def legacy_postprocess(detections, labels, confidence_threshold):
+    """The per-box loop previously used by YOLODetector.detect_objects."""
+    detected_objects = []
+    for i in range(len(detections)):
+        xyxy_tensor = detections[i].xyxy.cpu()
+        xyxy = xyxy_tensor.numpy().squeeze()
+        xmin, ymin, xmax, ymax = xyxy.astype(int)
+        classidx = int(detections[i].cls.item())
+        classname = labels[classidx]
+        conf = detections[i].conf.item()
+        if conf > confidence_threshold:
+            detected_objects.append({
+                "type": classname,
+                "confidence": conf,
+                "bounding_box": [xmin, ymin, xmax, ymax]
+            })
+    return detected_objects
+
+def time_per_call(func, iterations):
+    """Return the mean time per call in microseconds."""
+    t_start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - t_start) / iterations * 1e6
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iterations', help='Number of frames to post-process per measurement', type=int, default=2000)
+    parser.add_argument('--thresh', help='Confidence threshold', type=float, default=0.6)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    labels = {i: f"class{i}" for i in range(80)}
+    print(f"Tensor backend: {'torch' if torch is not None else 'numpy (torch not installed)'}")
+    print(f"{'boxes':>6} {'legacy (us/frame)':>18} {'vectorized (us/frame)':>22} {'speedup':>8}")
+    for count in (1, 100):
+        boxes = make_boxes(count, rng)
+        legacy = time_per_call(lambda: legacy_postprocess(boxes, labels, args.thresh), args.iterations)
+        vectorized = time_per_call(lambda: extract_detections(boxes, args.thresh), args.iterations)
+        print(f"{count:>6} {legacy:>18.1f} {vectorized:>22.1f} {legacy / vectorized:>7.1f}x")
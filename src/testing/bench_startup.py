@@ -0,0 +1,85 @@
+"""
+Measure time from process start to the first detection, with serial and parallel bring-up.
+
+Each run is a fresh Python process (so imports are not already cached) that builds
+SmartCarSystem, starts the object tracking thread and exits at the first detection on a
+camera frame. Off the Pi the GPIO, I2C bus and camera are faked; the fake camera's start()
+blocks for --camera-start seconds like libcamera does, the ultrasonic sensor keeps its 2 s
+settle time, and the model is loaded and run for real. Times are measured from the import of
+the startup module, i.e. after interpreter start-up, which both modes pay alike.
+
+Usage:
+    python bench_startup.py --model=../yolov5nu_ncnn_model --runs=3
+    python bench_startup.py --model=../yolov5nu_ncnn_model --real
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+def child(args):
+    """Bring the car up once and print the startup timeline as JSON."""
+    from startup import startup_timeline
+    if not args.real:
+        import fake_hw
+        fake_hw.install()
+        fake_hw.FakePicamera2.start_delay = args.camera_start
+    import threading
+    import car_logging
+    from main import SmartCarSystem
+
+    car_logging.setup_logging("WARNING")
+    smart_car = SmartCarSystem(model_path=args.model, parallel_startup=args.mode == "parallel")
+    threading.Thread(target=smart_car.object_tracking_thread, daemon=True).start()
+    while "first detection" not in startup_timeline.milestones:
+        threading.Event().wait(0.01)
+    smart_car.running = False
+    print(json.dumps({"milestones": startup_timeline.milestones,
+                      "phases": [phase for phase in startup_timeline.phases if phase[3] == 0]}))
+    if args.verbose:
+        print(startup_timeline.format_summary(), file=sys.stderr)
+    smart_car.cleanup()
+    car_logging.shutdown_logging()
+    os._exit(0)  # Don't wait for daemon threads holding the camera or the model
+
+def run(mode, args):
+    """Run one child process and return its parsed timeline."""
+    command = [sys.executable, os.path.abspath(__file__), "--child", mode, "--model", args.model,
+               "--camera-start", str(args.camera_start)]
+    if args.real:
+        command.append("--real")
+    if args.verbose:
+        command.append("--verbose")
+    output = subprocess.run(command, check=True, stdout=subprocess.PIPE, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', help='YOLO model to load', default='yolov5nu_ncnn_model')
+    parser.add_argument('--runs', help='Runs per mode', type=int, default=3)
+    parser.add_argument('--camera-start', help='Seconds the fake camera takes to start', type=float, default=1.0)
+    parser.add_argument('--real', help='Use the real GPIO, I2C bus and camera', action='store_true')
+    parser.add_argument('--verbose', help='Print each run\'s phase timeline', action='store_true')
+    parser.add_argument('--child', help=argparse.SUPPRESS, choices=("serial", "parallel"))
+    args = parser.parse_args()
+
+    if args.child:
+        args.mode = args.child
+        child(args)
+
+    print(f"{'bring-up':>9} {'first detection':>16}   phases")
+    results = {}
+    for mode in ("serial", "parallel"):
+        times = []
+        for _ in range(args.runs):
+            timeline = run(mode, args)
+            times.append(timeline["milestones"]["first detection"])
+        results[mode] = np.median(times)
+        phases = ", ".join(f"{name} {end - start:.1f}s" for name, start, end, _ in timeline["phases"])
+        print(f"{mode:>9} {results[mode]:14.2f} s   {phases}")
+    print(f"time to first detection: {results['serial'] / results['parallel']:.1f}x faster with parallel bring-up")
@@ -0,0 +1,162 @@
+"""
+Steering benchmark: stop-then-turn bang-bang commands versus proportional steering with ramps.
+
+A differential-drive car is simulated in fixed time steps: wheel speeds follow the PWM duty
+with a first-order motor lag, and the heading to the tracked object (the pan angle) is seen
+with the camera/servo delay. The target's bearing jumps a few times; for each controller the
+benchmark reports the time until the heading stays within --band of the new bearing (and for
+how many of the jumps that happens), overshoot, forward progress and how often
+the motor PWM duty cycles were changed (counted on the fake RPi.GPIO), next to the writes
+MotorController skipped because the duty was unchanged.
+
+Controllers:
+    every tick   stop(), then a full-speed turn_left/turn_right/move_forward every 100 ms
+    on change    the same, but only when the chosen action changes
+    ramped       steering_command() -> MovementController.drive() with the DriveRamp
+
+Usage:
+    python bench_steering.py
+    python bench_steering.py --accel=500 --gain=2
+"""
+import argparse
+import math
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import fake_hw
+
+fake_hw.install()
+import car_logging
+from jmovement import MovementController
+from main import steering_command
+
+DT = 0.01  # Simulation step
+CONTROL_PERIOD = 0.1  # Movement loop period of the stop-then-turn controllers
+RAMP_PERIOD = 0.02  # DriveRamp tick
+MAX_SPEED = 0.5  # Wheel speed at 100% duty (m/s)
+TRACK = 0.3  # Effective wheel track including skid (m)
+MOTOR_TAU = 0.1  # Motor time constant (s)
+
+def bearing_schedule(duration):
+    """Target bearing in degrees: a few jumps, to measure how fast the car turns onto them."""
+    steps = [(0.0, 0.0), (1.0, 40.0), (5.0, -30.0), (9.0, 60.0), (13.0, 0.0)]
+    return [(t, b) for t, b in steps if t < duration]
+
+def wheel_duty(motor):
+    """Signed duty currently applied to a motor."""
+    return motor.pwm_in1.duty - motor.pwm_in2.duty
+
+def pwm_changes(movement):
+    motors = (movement.motor1, movement.motor2)
+    return sum(motor.pwm_in1.changes + motor.pwm_in2.changes for motor in motors)
+
+def simulate(controller, duration, latency, args):
+    """
+    Run one controller.
+
+    Returns:
+        tuple: (times, heading errors, forward distance, PWM changes, writes suppressed as unchanged, duty swing)
+    """
+    movement = MovementController()
+    movement.ramp.max_acceleration = args.accel
+    steps = bearing_schedule(duration)
+    heading = 0.0
+    left = right = 0.0  # Actual wheel speeds as a fraction of full speed
+    delayed = []  # (time, heading error) pending camera/servo delay
+    seen_error = 0.0
+    action = None
+    forward = 0.0
+    swing = 0.0
+    last_duty = (0.0, 0.0)
+    next_control = next_ramp = 0.0
+    log_t, log_err = [], []
+    t = 0.0
+    while t < duration:
+        bearing = [b for start, b in steps if start <= t][-1]
+        error = bearing - heading  # Positive: target to the left
+        delayed.append((t + latency, error))
+        while delayed and delayed[0][0] <= t:
+            seen_error = delayed.pop(0)[1]
+
+        if controller == "ramped":
+            if t >= next_control - 1e-9:
+                next_control += RAMP_PERIOD  # Wakes on every servo update
+                linear, angular = steering_command(100, seen_error, False, turn_gain=args.gain)
+                command = (round(linear), round(angular))
+                if command != action:
+                    movement.drive(*command)
+                    action = command
+            if t >= next_ramp - 1e-9:
+                next_ramp += RAMP_PERIOD
+                movement.ramp.step(RAMP_PERIOD)
+        elif t >= next_control - 1e-9:
+            next_control += CONTROL_PERIOD
+            if seen_error > args.deadband:
+                choice = "turn_left"
+            elif seen_error < -args.deadband:
+                choice = "turn_right"
+            else:
+                choice = "move_forward"
+            if controller == "every tick" or choice != action:
+                movement.stop()
+                getattr(movement, choice)(100)
+                action = choice
+
+        # Motor 1 drives the right wheel, motor 2 the left
+        duty = (wheel_duty(movement.motor2) / 100, wheel_duty(movement.motor1) / 100)
+        swing += abs(duty[0] - last_duty[0]) + abs(duty[1] - last_duty[1])
+        last_duty = duty
+        left += (duty[0] - left) * DT / MOTOR_TAU
+        right += (duty[1] - right) * DT / MOTOR_TAU
+        heading += math.degrees((right - left) * MAX_SPEED / TRACK) * DT
+        forward += (left + right) / 2 * MAX_SPEED * math.cos(math.radians(error)) * DT
+
+        log_t.append(t)
+        log_err.append(error)
+        t += DT
+    suppressed = movement.pwm_write_counts()[1]
+    return np.array(log_t), np.array(log_err), forward, pwm_changes(movement), suppressed, swing * 100
+
+def step_metrics(log_t, log_err, steps, end, band):
+    """Time to reach (and stay within) `band` degrees of each new bearing, and the overshoot."""
+    results = []
+    starts = [t for t, _ in steps[1:]]
+    for start, stop in zip(starts, starts[1:] + [end]):
+        window = (log_t >= start) & (log_t < stop)
+        t, err = log_t[window], log_err[window]
+        outside = np.nonzero(np.abs(err) > band)[0]
+        if not len(outside):
+            reach = 0.0
+        elif outside[-1] + 1 < len(t):
+            reach = t[outside[-1] + 1] - start
+        else:
+            reach = float("inf")
+        overshoot = max(0.0, float(np.max(-np.sign(err[0]) * err)))
+        results.append((reach, overshoot))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--duration', help='Simulated seconds', type=float, default=17)
+    parser.add_argument('--latency', help='Camera and servo delay in seconds', type=float, default=0.1)
+    parser.add_argument('--deadband', help='Heading error in degrees the bang-bang controllers ignore', type=float, default=10)
+    parser.add_argument('--gain', help='Proportional steering gain (percent per degree)', type=float, default=1.5)
+    parser.add_argument('--accel', help='Ramp acceleration limit (percent per second)', type=float, default=300)
+    parser.add_argument('--band', help='Heading reached when it stays within this many degrees', type=float, default=12)
+    args = parser.parse_args()
+
+    car_logging.setup_logging("WARNING")
+    steps = bearing_schedule(args.duration)
+    print(f"{'controller':>12} {'time to heading':>16} {'overshoot':>10} {'forward':>8} {'PWM changes':>12} {'suppressed':>11} {'duty swing':>11}")
+    for controller in ("every tick", "on change", "ramped"):
+        log_t, log_err, forward, changes, suppressed, swing = simulate(controller, args.duration, args.latency, args)
+        metrics = step_metrics(log_t, log_err, steps, args.duration, args.band)
+        reached = [m[0] for m in metrics if m[0] != float("inf")]
+        reach = f"{np.mean(reached):.2f} s" if reached else "never"
+        reach += f" ({len(reached)}/{len(metrics)})"
+        overshoot = np.mean([m[1] for m in metrics])
+        print(f"{controller:>12} {reach:>16} {overshoot:8.1f} ° {forward:6.1f} m {changes:12d} {suppressed:11d} {swing:9.0f} %")
+    car_logging.shutdown_logging()
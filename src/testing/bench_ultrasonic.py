@@ -0,0 +1,99 @@
+"""
+Compare CPU cost of the busy-wait and edge-callback HC-SR04 measurement modes.
+
+Runs against a simulated sensor (no hardware needed). Reports the CPU time spent by the
+sampling thread itself, and how much Python work a background worker thread gets done
+meanwhile, which shows how much the measurement mode starves the other threads. Finally
+disconnects the sensor under the background sampler and checks that it publishes None
+rather than the last good distance.
+
+Usage:
+    python bench_ultrasonic.py --samples 50 --distance 150
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import fake_hw
+
+gpio = fake_hw.install()
+from ultrasonic_sensor import HCSR04
+
+TRIGGER_PIN = 17
+ECHO_PIN = 18
+
+def run(sensor, samples, rate_hz):
+    """Sample the sensor and measure sampling-thread CPU time and background worker throughput."""
+    stop = threading.Event()
+    work = [0]
+
+    def worker():
+        while not stop.is_set():
+            work[0] += 1
+
+    worker_thread = threading.Thread(target=worker, daemon=True)
+    worker_thread.start()
+
+    readings = []
+    cpu_start = time.thread_time()
+    wall_start = time.perf_counter()
+    for _ in range(samples):
+        t_sample = time.perf_counter()
+        readings.append(sensor.get_distance())
+        delay = 1.0 / rate_hz - (time.perf_counter() - t_sample)
+        if delay > 0:
+            time.sleep(delay)
+    wall = time.perf_counter() - wall_start
+    cpu = time.thread_time() - cpu_start
+    stop.set()
+    worker_thread.join()
+    return readings, cpu, wall, work[0]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--samples', help='Number of measurements per mode', type=int, default=50)
+    parser.add_argument('--rate', help='Sampling rate in Hz', type=float, default=10)
+    parser.add_argument('--distance', help='Simulated distance in cm', type=float, default=150)
+    args = parser.parse_args()
+
+    sim = fake_hw.SimulatedHCSR04(gpio, TRIGGER_PIN, ECHO_PIN, distance_cm=args.distance)
+
+    results = {}
+    for name, edge in (("busy-wait", False), ("edge", True)):
+        sensor = HCSR04(trigger_pin=TRIGGER_PIN, echo_pin=ECHO_PIN, use_edge_detection=edge, settle_time=0)
+        readings, cpu, wall, work = run(sensor, args.samples, args.rate)
+        sensor.cleanup()
+        valid = [r for r in readings if r is not None]
+        mean = sum(valid) / len(valid) if valid else float("nan")
+        results[name] = (cpu, wall, work)
+        print(f"{name:>10}: mean {mean:7.2f} cm (true {args.distance:.2f}), "
+              f"sampler CPU {cpu / wall * 100:5.1f}% of a core, background work {work / wall:,.0f} iter/s")
+
+    # A missed echo must time out instead of hanging
+    sim.drop_echoes = True
+    sensor = HCSR04(trigger_pin=TRIGGER_PIN, echo_pin=ECHO_PIN, settle_time=0)
+    t_start = time.perf_counter()
+    missed = sensor.get_distance()
+    print(f"missed echo -> {missed} after {(time.perf_counter() - t_start) * 1000:.1f} ms")
+
+    # A sensor that stops answering must not keep publishing its last good distance
+    sim.drop_echoes = False
+    published = []
+    sensor.start_sampler(rate_hz=args.rate, callback=lambda distance, timestamp: published.append(distance))
+    time.sleep(10 / args.rate)
+    sim.drop_echoes = True
+    connected = len(published)
+    time.sleep(10 / args.rate)
+    sensor.stop_sampler()
+    blind = published[connected:]
+    print(f"disconnected sensor: {len(blind)} publication(s) after the last echo, last {blind[-1] if blind else '-'}, "
+          f"read() -> {sensor.read()}")
+    sensor.cleanup()
+
+    busy_cpu, busy_wall, busy_work = results["busy-wait"]
+    edge_cpu, edge_wall, edge_work = results["edge"]
+    print(f"sampler CPU reduction with edge mode: {(1 - edge_cpu / busy_cpu) * 100:.0f}%")
+    print(f"background throughput gain with edge mode: {(edge_work / edge_wall) / (busy_work / busy_wall):.2f}x")
@@ -0,0 +1,327 @@
+"""
+Fake hardware backends for running the car's modules off the Raspberry Pi.
+
+Call `install()` before importing any module that does `import RPi.GPIO`,
+`import smbus` or `from picamera2 import ...`; the fake modules are then picked up in their place. The fakes
+simulate just enough behaviour (echo timing, PWM duty cycles, camera frame pacing) for benchmarks and replay.
+"""
+import heapq
+import sys
+import threading
+import time
+import types
+
+import numpy as np
+
+class FakePWM:
+    """Stand-in for RPi.GPIO.PWM that records every duty cycle change."""
+    def __init__(self, gpio, pin, frequency):
+        self.gpio = gpio
+        self.pin = pin
+        self.frequency = frequency
+        self.duty = 0
+        self.changes = 0  # Number of ChangeDutyCycle calls
+        self.history = []  # (time.monotonic(), duty) for every change
+
+    def start(self, duty):
+        self.duty = duty
+
+    def ChangeDutyCycle(self, duty):
+        self.changes += 1
+        self.duty = duty
+        self.history.append((time.monotonic(), duty))
+
+    def ChangeFrequency(self, frequency):
+        self.frequency = frequency
+
+    def stop(self):
+        self.duty = 0
+
+class FakeGPIO(types.ModuleType):
+    """Module-like stand-in for RPi.GPIO."""
+    BCM = 11
+    BOARD = 10
+    OUT = 0
+    IN = 1
+    LOW = 0
+    HIGH = 1
+    PUD_UP = 22
+    PUD_DOWN = 21
+    RISING = 31
+    FALLING = 32
+    BOTH = 33
+
+    def __init__(self):
+        super().__init__("RPi.GPIO")
+        self.PWM = lambda pin, frequency: FakePWM(self, pin, frequency)
+        self.levels = {}
+        self.callbacks = {}
+        self.output_hooks = {}
+        self.input_hooks = {}
+        self.pwms = []
+
+    def setwarnings(self, flag):
+        pass
+
+    def setmode(self, mode):
+        pass
+
+    def setup(self, pin, mode, pull_up_down=None, initial=None):
+        self.levels.setdefault(pin, self.LOW if initial is None else initial)
+
+    def output(self, pin, value):
+        self.levels[pin] = value
+        hook = self.output_hooks.get(pin)
+        if hook is not None:
+            hook(value)
+
+    def input(self, pin):
+        hook = self.input_hooks.get(pin)
+        if hook is not None:
+            return hook()
+        return self.levels.get(pin, self.LOW)
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        self.callbacks[pin] = callback
+
+    def remove_event_detect(self, pin):
+        self.callbacks.pop(pin, None)
+
+    def fire_edge(self, pin):
+        """Invoke the edge callback registered on a pin, as RPi.GPIO's event thread would."""
+        callback = self.callbacks.get(pin)
+        if callback is not None:
+            callback(pin)
+
+    def cleanup(self, pins=None):
+        pass
+
+class SimulatedHCSR04:
+    """
+    Simulates an HC-SR04 on a FakeGPIO: a falling trigger edge schedules an echo pulse
+    whose width matches `distance_cm`. The echo level is computed from the clock, so
+    polling readers see correct timing, and edge callbacks fire from a scheduler thread.
+    """
+    ECHO_DELAY = 0.0005  # Time from trigger to echo start (seconds)
+
+    def __init__(self, gpio, trigger_pin, echo_pin, distance_cm=100.0):
+        self.gpio = gpio
+        self.trigger_pin = trigger_pin
+        self.echo_pin = echo_pin
+        self.distance_cm = distance_cm  # May be replaced with a callable returning the distance
+        self.drop_echoes = False  # When True, the sensor never answers
+        self._rise_t = None
+        self._fall_t = None
+        self._events = []
+        self._cond = threading.Condition()
+        gpio.output_hooks[trigger_pin] = self._on_trigger
+        gpio.input_hooks[echo_pin] = self._echo_level
+        threading.Thread(target=self._run, name="fake-hcsr04", daemon=True).start()
+
+    def _current_distance(self):
+        return self.distance_cm() if callable(self.distance_cm) else self.distance_cm
+
+    def _on_trigger(self, value):
+        if value != self.gpio.LOW or self.drop_echoes:
+            return
+        now = time.perf_counter()
+        self._rise_t = now + self.ECHO_DELAY
+        self._fall_t = self._rise_t + 2 * self._current_distance() / 34300
+        with self._cond:
+            heapq.heappush(self._events, self._rise_t)
+            heapq.heappush(self._events, self._fall_t)
+            self._cond.notify()
+
+    def _echo_level(self):
+        now = time.perf_counter()
+        if self._rise_t is not None and self._rise_t <= now < self._fall_t:
+            return self.gpio.HIGH
+        return self.gpio.LOW
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._events:
+                    self._cond.wait()
+                due = self._events[0]
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._events)
+            self.gpio.fire_edge(self.echo_pin)
+
+class FakeSMBus:
+    """
+    Stand-in for smbus.SMBus backed by a register file per device address.
+    Every call counts as one bus transaction and is appended to `log`. Set `byte_time` to
+    make each transaction take the wire time of its bytes, as a real bus would.
+    """
+    instances = []  # Every bus opened since install()
+    byte_time = 0.0  # Seconds per byte on the wire, e.g. 90e-6 for 100 kHz; 0 for instant
+
+    def __init__(self, bus=1):
+        self.bus = bus
+        self.registers = {}  # {address: {register: value}}
+        self.transactions = 0
+        self.log = []  # (operation, address, register, payload length)
+        FakeSMBus.instances.append(self)
+
+    def _record(self, op, addr, reg, length):
+        self.transactions += 1
+        self.log.append((op, addr, reg, length))
+        if self.byte_time:
+            time.sleep(self.byte_time * (length + 2))  # Address and register bytes, then the payload
+
+    def write_byte_data(self, addr, reg, value):
+        self._record("write_byte", addr, reg, 1)
+        self.registers.setdefault(addr, {})[reg] = value & 0xFF
+
+    def read_byte_data(self, addr, reg):
+        self._record("read_byte", addr, reg, 1)
+        return self.registers.get(addr, {}).get(reg, 0)
+
+    def write_i2c_block_data(self, addr, reg, data):
+        if len(data) > 32:
+            raise OSError("SMBus block writes are limited to 32 bytes")
+        self._record("write_block", addr, reg, len(data))
+        regs = self.registers.setdefault(addr, {})
+        for i, value in enumerate(data):
+            regs[reg + i] = value & 0xFF
+
+    def read_i2c_block_data(self, addr, reg, length):
+        self._record("read_block", addr, reg, length)
+        regs = self.registers.get(addr, {})
+        return [regs.get(reg + i, 0) for i in range(length)]
+
+    def close(self):
+        pass
+
+class FakeRequest:
+    """Stand-in for a Picamera2 CompletedRequest holding one buffer per configured stream."""
+    def __init__(self, camera):
+        self.camera = camera
+        self.released = False
+
+    def make_array(self, name):
+        return self.camera.make_view(name).copy()
+
+    def release(self):
+        self.released = True
+
+class FakeMappedArray:
+    """Stand-in for picamera2.MappedArray: exposes a stream buffer of a request without copying."""
+    def __init__(self, request, stream):
+        self.request = request
+        self.stream = stream
+        self.array = None
+
+    def __enter__(self):
+        self.array = self.request.camera.make_view(self.stream)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.array = None
+
+class FakePicamera2:
+    """
+    Stand-in for picamera2.Picamera2 that paces frames at `fps` and serves them from
+    preallocated buffers. Rows are padded to a multiple of 32 pixels like the real ISP's
+    stride alignment, so callers have to crop to the configured width.
+    """
+    fps = 30.0
+    start_delay = 0.0  # Seconds start() blocks, like libcamera bringing the sensor up
+    CHANNELS = {"RGB888": 3, "BGR888": 3, "XRGB8888": 4, "XBGR8888": 4}
+
+    def __init__(self, camera_num=0):
+        self.camera_config = None
+        self.started = False
+        self.frames = 0
+        self._buffers = {}
+        self._next_frame = 0.0
+
+    def create_video_configuration(self, main=None, lores=None, **kwargs):
+        config = {"main": dict(main or {}), "lores": dict(lores) if lores else None}
+        config["main"].setdefault("format", "XBGR8888")
+        config["main"].setdefault("size", (1280, 720))
+        config.update(kwargs)
+        return config
+
+    create_preview_configuration = create_video_configuration
+    create_still_configuration = create_video_configuration
+
+    def configure(self, config):
+        self.camera_config = config
+        self._buffers = {}
+        for name in ("main", "lores"):
+            stream = config.get(name)
+            if not stream:
+                continue
+            width, height = stream["size"]
+            padded = (width + 31) // 32 * 32
+            fmt = stream.get("format", "YUV420")
+            if fmt in self.CHANNELS:
+                shape = (height, padded, self.CHANNELS[fmt])
+            else:  # YUV420: full-size Y plane followed by the quarter-size U and V planes
+                shape = (height * 3 // 2, padded)
+            self._buffers[name] = np.full(shape, 64, dtype=np.uint8)
+
+    def start(self):
+        if self.start_delay:
+            time.sleep(self.start_delay)
+        self.started = True
+        self._next_frame = time.monotonic()
+
+    def stop(self):
+        self.started = False
+
+    def close(self):
+        self.stop()
+
+    def make_view(self, name):
+        return self._buffers[name]
+
+    def capture_request(self):
+        if not self.started:
+            raise RuntimeError("Camera is not started")
+        # Pace frames like a sensor running at `fps`
+        self._next_frame += 1.0 / self.fps
+        delay = self._next_frame - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            self._next_frame = time.monotonic()
+        self.frames += 1
+        for buffer in self._buffers.values():
+            buffer.flat[0] = self.frames & 0xFF  # Make consecutive frames distinguishable
+        return FakeRequest(self)
+
+    def capture_array(self, name="main"):
+        request = self.capture_request()
+        array = request.make_array(name)
+        request.release()
+        return array
+
+def install():
+    """
+    Register the fake hardware modules in sys.modules.
+
+    Returns:
+        FakeGPIO: The fake RPi.GPIO module.
+    """
+    gpio = FakeGPIO()
+    rpi = types.ModuleType("RPi")
+    rpi.GPIO = gpio
+    sys.modules["RPi"] = rpi
+    sys.modules["RPi.GPIO"] = gpio
+
+    smbus = types.ModuleType("smbus")
+    smbus.SMBus = FakeSMBus
+    sys.modules["smbus"] = smbus
+    FakeSMBus.instances.clear()
+
+    picamera2 = types.ModuleType("picamera2")
+    picamera2.Picamera2 = FakePicamera2
+    picamera2.MappedArray = FakeMappedArray
+    sys.modules["picamera2"] = picamera2
+    return gpio
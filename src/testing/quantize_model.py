@@ -0,0 +1,230 @@
+"""
+Produce an INT8 model from recorded car footage and check it against the FP32 model.
+
+1. Calibration frames are sampled from the car's recordings (video files or image
+   directories). Every other sampled frame is held out for validation.
+2. The .pt model is exported to FP32 ONNX or ncnn and quantized to INT8 with the
+   calibration frames: ONNX Runtime static quantization, or ncnn2table + ncnn2int8.
+3. FP32 and INT8 run on the validation frames. For every class, recall is the share of
+   FP32 detections (at --conf, the tracker's confidence threshold) that INT8 also finds
+   with the same class and IoU >= --iou. Latency p50/p95 is compared as well.
+4. If any class with at least --min-support FP32 detections falls below --min-recall, or
+   no class has that much support, the INT8 model is deleted and the script exits with
+   status 1.
+
+Usage:
+    python quantize_model.py --model=yolov5nu.pt --recordings=drive1.mp4,drive2.mp4 --format=ncnn
+    python quantize_model.py --model=yolov5nu.pt --recordings=frames/ --format=onnx --min-recall=0.9
+"""
+import argparse
+import glob
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from detections import box_iou, extract_detections
+
+def sample_frames(recordings, every, limit):
+    """Take every `every`-th frame from the recordings, up to `limit` frames."""
+    frames = []
+    for source in recordings:
+        if os.path.isdir(source):
+            paths = sorted(glob.glob(os.path.join(source, "*")))[::every]
+            frames += [image for image in map(cv2.imread, paths) if image is not None]
+        else:
+            cap = cv2.VideoCapture(source)
+            index = 0
+            while len(frames) < limit:
+                ok, image = cap.read()
+                if not ok:
+                    break
+                if index % every == 0:
+                    frames.append(image)
+                index += 1
+            cap.release()
+        if len(frames) >= limit:
+            break
+    return frames[:limit]
+
+def letterbox(image, imgsz):
+    """Resize with unchanged aspect ratio and pad to imgsz x imgsz, as ultralytics does."""
+    height, width = image.shape[:2]
+    scale = imgsz / max(height, width)
+    resized = cv2.resize(image, (int(round(width * scale)), int(round(height * scale))))
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top = (imgsz - resized.shape[0]) // 2
+    left = (imgsz - resized.shape[1]) // 2
+    canvas[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+    return canvas
+
+def quantize_onnx(fp32_path, frames, imgsz, out_path):
+    """Static INT8 quantization with ONNX Runtime, calibrated on the frames."""
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+    import onnxruntime
+
+    input_name = onnxruntime.InferenceSession(fp32_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self):
+            self.frames = iter(frames)
+
+        def get_next(self):
+            image = next(self.frames, None)
+            if image is None:
+                return None
+            rgb = cv2.cvtColor(letterbox(image, imgsz), cv2.COLOR_BGR2RGB)
+            return {input_name: (rgb.transpose(2, 0, 1)[None].astype(np.float32) / 255.0)}
+
+    quantize_static(fp32_path, out_path, FrameReader(), quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8, per_channel=True)
+    return out_path
+
+def quantize_ncnn(fp32_dir, frames, imgsz, out_dir, tools_dir):
+    """INT8 quantization with ncnn's ncnn2table (KL calibration) and ncnn2int8 tools."""
+    ncnn2table = os.path.join(tools_dir, "ncnn2table") if tools_dir else "ncnn2table"
+    ncnn2int8 = os.path.join(tools_dir, "ncnn2int8") if tools_dir else "ncnn2int8"
+    calib_dir = os.path.join(out_dir, "calibration")
+    os.makedirs(calib_dir, exist_ok=True)
+    image_list = os.path.join(calib_dir, "images.txt")
+    with open(image_list, "w") as f:
+        for index, image in enumerate(frames):
+            path = os.path.abspath(os.path.join(calib_dir, f"{index:05d}.png"))
+            cv2.imwrite(path, letterbox(image, imgsz))
+            f.write(path + "\n")
+
+    param = os.path.join(fp32_dir, "model.ncnn.param")
+    weights = os.path.join(fp32_dir, "model.ncnn.bin")
+    table = os.path.join(out_dir, "model.table")
+    # ultralytics feeds RGB scaled to [0, 1]
+    subprocess.run([ncnn2table, param, weights, image_list, table, "mean=[0,0,0]",
+                    "norm=[0.003922,0.003922,0.003922]", f"shape=[{imgsz},{imgsz},3]", "pixel=RGB",
+                    f"thread={os.cpu_count()}", "method=kl"], check=True)
+    subprocess.run([ncnn2int8, param, weights, os.path.join(out_dir, "model.ncnn.param"),
+                    os.path.join(out_dir, "model.ncnn.bin"), table], check=True)
+    shutil.copy(os.path.join(fp32_dir, "metadata.yaml"), out_dir)
+    shutil.rmtree(calib_dir)
+    return out_dir
+
+def run_model(model, frames, imgsz, conf):
+    """Detections and per-frame latency for a model over the frames."""
+    for frame in frames[:3]:
+        model(frame, imgsz=imgsz, verbose=False)  # Warm up
+    detections, times = [], []
+    for frame in frames:
+        start = time.perf_counter()
+        results = model(frame, imgsz=imgsz, verbose=False)
+        times.append(time.perf_counter() - start)
+        detections.append(extract_detections(results[0].boxes, conf))
+    return detections, np.array(times)
+
+def per_class_recall(reference, candidate, iou_threshold):
+    """
+    Share of reference detections matched by a candidate detection of the same class.
+
+    Returns:
+        dict: {class index: (matched, total)}.
+    """
+    counts = {}
+    for ref_frame, cand_frame in zip(reference, candidate):
+        used = set()
+        # Match the most confident reference boxes first
+        for ref in sorted(ref_frame, key=lambda d: -d["conf"]):
+            cls = int(ref["cls"])
+            matched, total = counts.get(cls, (0, 0))
+            ref_box = (ref["xmin"], ref["ymin"], ref["xmax"], ref["ymax"])
+            best, best_iou = None, iou_threshold
+            for index, cand in enumerate(cand_frame):
+                if index in used or int(cand["cls"]) != cls:
+                    continue
+                iou = box_iou(ref_box, (cand["xmin"], cand["ymin"], cand["xmax"], cand["ymax"]))
+                if iou >= best_iou:
+                    best, best_iou = index, iou
+            if best is not None:
+                used.add(best)
+                matched += 1
+            counts[cls] = (matched, total + 1)
+    return counts
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', help='Source .pt model', required=True)
+    parser.add_argument('--recordings', help='Comma-separated video files or image directories', required=True)
+    parser.add_argument('--format', help='INT8 output format', choices=['ncnn', 'onnx'], default='ncnn')
+    parser.add_argument('--imgsz', help='Model input size', type=int, default=640)
+    parser.add_argument('--every', help='Sample every Nth recorded frame', type=int, default=15)
+    parser.add_argument('--frames', help='Frames to sample (half calibration, half validation)', type=int, default=400)
+    parser.add_argument('--conf', help="Confidence threshold (the tracker's confidence_threshold)", type=float, default=0.6)
+    parser.add_argument('--iou', help='IoU for an INT8 box to count as the same detection', type=float, default=0.5)
+    parser.add_argument('--min-recall', help='Accuracy floor: minimum per-class recall', type=float, default=0.9)
+    parser.add_argument('--min-support', help='Ignore classes with fewer validation detections', type=int, default=10)
+    parser.add_argument('--ncnn-tools', help='Directory containing ncnn2table and ncnn2int8')
+    parser.add_argument('--output-dir', help='Where the models are written', default='.')
+    args = parser.parse_args()
+
+    from ultralytics import YOLO
+
+    frames = sample_frames(args.recordings.split(','), args.every, args.frames)
+    if len(frames) < 20:
+        raise SystemExit(f"Only {len(frames)} frames found in the recordings; need at least 20")
+    calibration, validation = frames[0::2], frames[1::2]
+    print(f"{len(calibration)} calibration frames, {len(validation)} validation frames")
+
+    stem = os.path.splitext(os.path.basename(args.model))[0]
+    os.makedirs(args.output_dir, exist_ok=True)
+    exported = YOLO(args.model).export(format=args.format, imgsz=args.imgsz, verbose=False)
+    if args.format == 'onnx':
+        fp32_path = os.path.join(args.output_dir, f"{stem}_{args.imgsz}.onnx")
+        shutil.move(str(exported), fp32_path)
+        int8_path = quantize_onnx(fp32_path, calibration, args.imgsz,
+                                  os.path.join(args.output_dir, f"{stem}_{args.imgsz}_int8.onnx"))
+    else:
+        fp32_path = os.path.join(args.output_dir, f"{stem}_{args.imgsz}_ncnn_model")
+        if os.path.exists(fp32_path):
+            shutil.rmtree(fp32_path)
+        shutil.move(str(exported), fp32_path)
+        int8_path = os.path.join(args.output_dir, f"{stem}_{args.imgsz}_int8_ncnn_model")
+        os.makedirs(int8_path, exist_ok=True)
+        quantize_ncnn(fp32_path, calibration, args.imgsz, int8_path, args.ncnn_tools)
+
+    fp32_detections, fp32_times = run_model(YOLO(fp32_path, task='detect'), validation, args.imgsz, args.conf)
+    int8_model = YOLO(int8_path, task='detect')
+    int8_detections, int8_times = run_model(int8_model, validation, args.imgsz, args.conf)
+
+    print(f"\nLatency  FP32 p50 {np.median(fp32_times) * 1000:6.1f} ms  p95 {np.percentile(fp32_times, 95) * 1000:6.1f} ms")
+    print(f"         INT8 p50 {np.median(int8_times) * 1000:6.1f} ms  p95 {np.percentile(int8_times, 95) * 1000:6.1f} ms"
+          f"  ({np.median(fp32_times) / np.median(int8_times):.2f}x)")
+
+    print(f"\nPer-class recall of FP32 detections at conf > {args.conf} (floor {args.min_recall:.2f}):")
+    failed = []
+    checked_classes = 0
+    for cls, (matched, total) in sorted(per_class_recall(fp32_detections, int8_detections, args.iou).items()):
+        recall = matched / total
+        checked = total >= args.min_support
+        status = "ok" if recall >= args.min_recall else "BELOW FLOOR"
+        if not checked:
+            status = "too few samples"
+        else:
+            checked_classes += 1
+            if recall < args.min_recall:
+                failed.append(int8_model.names[cls])
+        print(f"  {int8_model.names[cls]:>15}: {recall:5.2f} ({matched}/{total})  {status}")
+
+    reason = None
+    if failed:
+        reason = f"recall below {args.min_recall:.2f} for {', '.join(failed)}"
+    elif not checked_classes:
+        reason = f"no class reached --min-support={args.min_support} FP32 detections, so recall was not checked"
+    if reason:
+        if os.path.isdir(int8_path):
+            shutil.rmtree(int8_path)
+        else:
+            os.remove(int8_path)
+        print(f"\nINT8 model rejected: {reason}; the INT8 model was deleted.")
+        sys.exit(1)
+    print(f"\nINT8 model written to {int8_path}")
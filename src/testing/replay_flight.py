@@ -0,0 +1,278 @@
+"""
+Closed-loop, faster-than-real-time replay of a flight recording.
+
+The recorded target boxes and distance readings are fed through the current aiming
+(PanTiltAimer), emergency stop and movement decision code with fake hardware, in simulated
+time. Boxes are re-projected into the replayed camera pose: each box was recorded with the
+servo angles at capture, so when the replayed servos point elsewhere than they did on the car,
+the box moves in the frame accordingly (and is dropped if it leaves the frame). A control change
+therefore sees the target it would have seen, and its pointing error can be compared with the
+recording. The replay is deterministic: the same log and settings give the same checksum.
+
+Without a recording, --synthesize writes a synthetic drive (recorded with the original step
+law) to replay.
+
+Usage:
+    python replay_flight.py ../recordings/flight-20260101-120000
+    python replay_flight.py --synthesize=synthetic_flight --minutes=10
+    python replay_flight.py synthetic_flight --control=step --no-kalman
+"""
+import argparse
+import hashlib
+import math
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import fake_hw
+
+fake_hw.install()
+import car_logging
+from flight_recorder import (DISTANCE, EVENT_DTYPE, FRAME, FRAME_DETECTION_DTYPE, MOTOR, MOTOR_ACTIONS, SERVO,
+                             ChunkedLog, FlightLog, write_meta)
+from jmovement import MovementController
+from main import steering_command
+from object_tracker import PanTiltAimer
+from pantilt import PanTiltController, ServoMotionEngine
+from safety import EmergencyStop
+
+TICK = 0.02  # Servo engine tick (50 Hz)
+
+class ClosedLoopReplay:
+    """The car's aiming and movement logic, stepped in simulated time."""
+    def __init__(self, resolution, use_kalman=True, control="pid", record=False):
+        self.resolution = resolution
+        self.aimer = PanTiltAimer(resolution, use_kalman=use_kalman, control=control)
+        self.controller = PanTiltController()
+        self.controller.initialize_to_middle()
+        self.engine = ServoMotionEngine(self.controller)
+        self.pan_ch, self.tilt_ch = self.controller.SERVO_PAN_CH, self.controller.SERVO_TILT_CH
+        self.movement = MovementController()
+        self.emergency_stop = EmergencyStop(self.movement, trip_distance=10, release_distance=15)
+        self.record = record
+        self.events = []  # Event records produced, when recording
+        self.detections = []
+        self.pan_trace = []  # Commanded pan angle after every tick
+        self.errors = []  # Horizontal pointing error in pixels, per frame with a visible target
+        self.commands = []  # (time, linear, angular) for every motor command
+        self._distance = None
+        self._command = None
+        self._trips = 0
+
+    def _emit(self, t, kind, **fields):
+        if not self.record:
+            return
+        event = np.zeros((), dtype=EVENT_DTYPE)
+        event["t"] = t
+        event["kind"] = kind
+        for name, value in fields.items():
+            event[name] = value
+        self.events.append(event)
+
+    def _tick(self, now):
+        self.movement.ramp.step(TICK)
+        moved = self.engine.step(TICK, now=now)
+        if moved:
+            self.controller.set_servo_positions(moved)
+            self._emit(now, SERVO, origin=now, pan=self.engine.get_angle(self.pan_ch),
+                       tilt=self.engine.get_angle(self.tilt_ch))
+            self._drive(now)
+        self.pan_trace.append(self.engine.get_angle(self.pan_ch))
+
+    def _drive(self, now):
+        """Like SmartCarSystem.movement_thread on a new distance reading or servo state."""
+        if self._distance is None:
+            return
+        if self.emergency_stop.trips != self._trips:
+            self._trips = self.emergency_stop.trips
+            self._command = None
+        linear, angular = steering_command(self._distance, self.controller.get_pan_angle(),
+                                           self.emergency_stop.latched)
+        command = (round(linear), round(angular))
+        if command == self._command:
+            return
+        if command == (0, 0):
+            self.movement.stop()
+            action = "stop"
+        else:
+            self.movement.drive(*command)
+            action = "drive"
+        self._command = command
+        self.commands.append((now,) + command)
+        self._emit(now, MOTOR, origin=now, action=MOTOR_ACTIONS.index(action), speed=command[0], angular=command[1])
+
+    def run(self, events, observe):
+        """
+        Replay events in time order.
+
+        Args:
+            events (numpy.ndarray): DISTANCE and FRAME events (EVENT_DTYPE); other kinds are ignored.
+            observe (callable): observe(event, pan, tilt) -> box seen in a FRAME event with the
+                camera at the replayed capture-time angles, or None.
+        """
+        clock = float(events["t"][0])
+        for event in events:
+            t = float(event["t"])
+            while clock + TICK <= t:
+                clock += TICK
+                self._tick(clock)
+            kind = event["kind"]
+            if kind == DISTANCE:
+                self._distance = float(event["distance"])  # NaN while the sensor was not answering
+                self.emergency_stop.update(None if np.isnan(self._distance) else self._distance, t)
+                self._emit(t, DISTANCE, origin=event["origin"], distance=self._distance)
+                self._drive(t)
+            elif kind == FRAME:
+                origin = float(event["origin"])
+                angles = self.engine.angles_at(origin)
+                pan, tilt = angles[self.pan_ch], angles[self.tilt_ch]
+                bbox = observe(event, pan, tilt)
+                if bbox is not None:
+                    self.errors.append((bbox[0] + bbox[2]) / 2 - self.resolution[0] / 2)
+                    if self.record:
+                        detection = np.zeros(1, dtype=FRAME_DETECTION_DTYPE)
+                        detection["seq"] = event["seq"]
+                        detection["xmin"], detection["ymin"], detection["xmax"], detection["ymax"] = bbox
+                        detection["conf"] = 0.9
+                        self.detections.append(detection)
+                self._emit(t, FRAME, origin=origin, seq=event["seq"], pan=pan, tilt=tilt,
+                           bbox=np.nan if bbox is None else bbox, detections=0 if bbox is None else 1)
+                _, targets = self.aimer.aim(self.engine, self.pan_ch, self.tilt_ch, bbox, origin, t)
+                if targets:
+                    self.engine.set_targets(targets)
+
+    def checksum(self):
+        """Digest of the replayed servo trajectory and motor commands."""
+        digest = hashlib.sha1(np.asarray(self.pan_trace, dtype=np.float64).tobytes())
+        digest.update(repr(self.commands).encode())
+        return digest.hexdigest()[:12]
+
+def reproject(log, aimer):
+    """Observer that moves recorded boxes into the replayed camera pose."""
+    width, height = log.resolution
+    def observe(event, pan, tilt):
+        if np.isnan(event["bbox"][0]):
+            return None
+        xmin, ymin, xmax, ymax = (float(v) for v in event["bbox"])
+        dx = dy = 0.0
+        if not np.isnan(event["pan"]):
+            # Increasing pan moves the target right in the image; increasing tilt moves it up
+            dx = (pan - float(event["pan"])) * aimer.px_per_deg_x
+            dy = (float(event["tilt"]) - tilt) * aimer.px_per_deg_y
+        cx, cy = (xmin + xmax) / 2 + dx, (ymin + ymax) / 2 + dy
+        if not (0 <= cx < width and 0 <= cy < height):
+            return None  # Out of view
+        return (xmin + dx, ymin + dy, xmax + dx, ymax + dy)
+    return observe
+
+def synthesize(directory, minutes, resolution, fps=25, latency=0.15, noise_px=3, dropout=0.1, seed=0):
+    """Simulate a drive with the original step law, aiming at raw boxes, and write it as a flight recording."""
+    rng = random.Random(seed)
+    duration = minutes * 60
+    width, height = resolution
+    replay = ClosedLoopReplay(resolution, use_kalman=False, control="step", record=True)
+
+    def bearing(t):
+        # The pan angle that centers the target: slow sweeps with occasional jumps
+        return 90 + 25 * math.sin(2 * math.pi * t / 17) + (12 if int(t / 9) % 3 == 1 else 0)
+
+    def observe(event, pan, tilt):
+        if rng.random() < dropout:
+            return None
+        cx = width / 2 + (pan - bearing(float(event["origin"]))) * replay.aimer.px_per_deg_x + rng.gauss(0, noise_px)
+        cy = height / 2 + rng.gauss(0, noise_px)
+        if not 0 <= cx < width:
+            return None
+        return (cx - 40, cy - 60, cx + 40, cy + 60)
+
+    frames = np.arange(latency, duration, 1.0 / fps)
+    readings = np.arange(0.0, duration, 0.1)
+    inputs = np.zeros(len(frames) + len(readings), dtype=EVENT_DTYPE)
+    inputs["kind"][:len(frames)] = FRAME
+    inputs["t"][:len(frames)] = frames
+    inputs["origin"][:len(frames)] = frames - latency
+    inputs["seq"][:len(frames)] = np.arange(1, len(frames) + 1)
+    inputs["kind"][len(frames):] = DISTANCE
+    inputs["t"][len(frames):] = inputs["origin"][len(frames):] = readings
+    # Obstacle approaches to within the trip distance every 40 s
+    inputs["distance"][len(frames):] = 55 + 50 * np.cos(2 * math.pi * readings / 40)
+    inputs = inputs[np.argsort(inputs["t"], kind="stable")]
+    replay.run(inputs, observe)
+
+    os.makedirs(directory, exist_ok=True)
+    write_meta(directory, resolution)
+    events = ChunkedLog(directory, "events", EVENT_DTYPE)
+    events.append(np.array(replay.events, dtype=EVENT_DTYPE))
+    events.close()
+    detections = ChunkedLog(directory, "detections", FRAME_DETECTION_DTYPE)
+    if replay.detections:
+        detections.append(np.concatenate(replay.detections))
+    detections.close()
+    return len(replay.events)
+
+def command_difference(recorded, replayed, times):
+    """Mean absolute (linear, angular) difference between the recorded and replayed commands at `times`."""
+    def commands_at(commands):
+        if not commands:
+            return np.zeros((len(times), 2))
+        commands = np.asarray(commands, dtype=np.float64)
+        index = np.searchsorted(commands[:, 0], times, side="right") - 1
+        values = commands[np.maximum(index, 0), 1:]
+        values[index < 0] = 0  # Before the first command the car stands still
+        return values
+    return np.mean(np.abs(commands_at(recorded) - commands_at(replayed)), axis=0)
+
+def rms(errors):
+    """Root mean square of the aiming errors, or nan if there are none."""
+    return float(np.sqrt(np.mean(errors ** 2))) if len(errors) else float("nan")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('log', nargs='?', help='Flight recording directory')
+    parser.add_argument('--synthesize', help='Write a synthetic recording to this directory and replay it')
+    parser.add_argument('--minutes', help='Length of the synthetic drive', type=float, default=10)
+    parser.add_argument('--control', help='Control law to replay: pid or step', default='pid')
+    parser.add_argument('--no-kalman', help='Aim at raw boxes instead of Kalman predictions', action='store_true')
+    args = parser.parse_args()
+
+    car_logging.setup_logging("ERROR")  # Every replayed emergency stop trip would otherwise be logged
+    path = args.log
+    if args.synthesize:
+        start = time.perf_counter()
+        count = synthesize(args.synthesize, args.minutes, (640, 360))
+        print(f"Synthesized {args.minutes:g} min drive: {count} events in {time.perf_counter() - start:.1f} s")
+        path = path or args.synthesize
+    if path is None:
+        parser.error("give a recording directory or --synthesize")
+
+    log = FlightLog(path)
+    inputs = log.events[np.isin(log.events["kind"], (DISTANCE, FRAME))]
+    replay = ClosedLoopReplay(log.resolution, use_kalman=not args.no_kalman, control=args.control)
+    start = time.perf_counter()
+    replay.run(inputs, reproject(log, replay.aimer))
+    elapsed = time.perf_counter() - start
+    car_logging.shutdown_logging()
+
+    frames = log.of_kind(FRAME)
+    visible = frames[~np.isnan(frames["bbox"][:, 0])]
+    recorded_errors = (visible["bbox"][:, 0] + visible["bbox"][:, 2]) / 2 - log.resolution[0] / 2
+    motor = log.of_kind(MOTOR)
+    recorded_commands = list(zip(motor["t"].tolist(), motor["speed"].tolist(), motor["angular"].tolist()))
+    replayed_errors = np.asarray(replay.errors)
+
+    print(f"Replayed {log.duration:.0f} s ({len(inputs)} events) in {elapsed:.2f} s, "
+          f"{log.duration / elapsed:.0f}x real time")
+    print(f"{'':>9} {'RMS error':>10} {'target in view':>15} {'motor commands':>15}")
+    in_view = (lambda count: count / len(frames)) if len(frames) else (lambda count: float("nan"))
+    print(f"{'recorded':>9} {rms(recorded_errors):8.1f} px {in_view(len(visible)):15.1%} "
+          f"{len(recorded_commands):15d}")
+    print(f"{'replayed':>9} {rms(replayed_errors):8.1f} px {in_view(len(replayed_errors)):15.1%} "
+          f"{len(replay.commands):15d}")
+    if recorded_commands:
+        linear, angular = command_difference(recorded_commands, replay.commands, log.of_kind(DISTANCE)["t"])
+        print(f"Mean drive command difference from the recording: linear {linear:.1f}%, angular {angular:.1f}%")
+    print(f"Emergency stop trips: {replay.emergency_stop.trips}, checksum {replay.checksum()}")
@@ -0,0 +1,107 @@
+"""
+Simulate the latency governor against a Pi that slows down and recovers.
+
+Frames arrive at the camera rate and the tracking loop always takes the newest one.
+Detection time scales with the square of the model input size and with a CPU slowdown
+factor that rises (thermal throttling plus background load) and falls again during the
+run; optical-flow frames cost a few milliseconds. Time is simulated, so a minute-long
+run takes a fraction of a second. Prints every governor change and compares frame
+latency against fixed settings.
+
+Usage:
+    python sim_governor.py
+    python sim_governor.py --budget=0.12 --detect-ms=180 --lite-factor=0.5
+"""
+import argparse
+import os
+import sys
+import types
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from latency_governor import LatencyGovernor, default_ladder
+
+class SimDetector:
+    def __init__(self, model_path):
+        self.model_path = model_path
+        self.imgsz = 640
+
+    def preload_model(self, model_path):
+        pass
+
+    def set_model(self, model_path):
+        self.model_path = model_path
+
+def slowdown(t, duration):
+    """CPU slowdown factor over the run: nominal, throttled and loaded, then recovered."""
+    if t < duration * 0.25:
+        return 1.0
+    if t < duration * 0.65:
+        return 2.5
+    return 1.0
+
+def simulate(args, governed):
+    """Run the tracking loop; return per-frame (time, latency) and the governor if any."""
+    tracker = types.SimpleNamespace(
+        detector=SimDetector("model"),
+        box_tracker=types.SimpleNamespace(detect_interval=1, min_detect_interval=1, adaptive=False))
+    governor = None
+    if governed:
+        governor = LatencyGovernor(tracker, args.budget, default_ladder("model", "lite"), log=lambda m: print(f"  {m}"))
+    frame_period = 1.0 / args.fps
+    t = 0.0
+    frames_since_detection = tracker.box_tracker.detect_interval
+    log = []
+    while t < args.duration:
+        # Take the newest captured frame, waiting for the next one if it is not there yet
+        capture = np.floor(t / frame_period) * frame_period
+        if log and capture <= log[-1][2]:
+            capture += frame_period
+            t = capture
+        frames_since_detection += 1
+        if frames_since_detection >= tracker.box_tracker.detect_interval:
+            frames_since_detection = 0
+            cost = args.detect_ms / 1000 * (tracker.detector.imgsz / 640) ** 2
+            if tracker.detector.model_path == "lite":
+                cost *= args.lite_factor
+        else:
+            cost = args.flow_ms / 1000
+        t += cost * slowdown(t, args.duration) + args.overhead_ms / 1000
+        latency = t - capture
+        log.append((t, latency, capture))
+        if governor is not None:
+            governor.record(latency, now=t)
+    times = np.array([entry[0] for entry in log])
+    latencies = np.array([entry[1] for entry in log])
+    return times, latencies, governor
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--budget', help='Latency budget in seconds', type=float, default=0.15)
+    parser.add_argument('--fps', help='Camera frame rate', type=float, default=30)
+    parser.add_argument('--detect-ms', help='Detection time at imgsz 640 on a cool, idle Pi', type=float, default=120)
+    parser.add_argument('--flow-ms', help='Optical-flow frame time', type=float, default=6)
+    parser.add_argument('--overhead-ms', help='Per-frame time outside detection/flow', type=float, default=4)
+    parser.add_argument('--lite-factor', help='Cost of the lite model relative to the main one', type=float, default=0.6)
+    parser.add_argument('--duration', help='Simulated seconds', type=float, default=120)
+    args = parser.parse_args()
+
+    print("Governed run:")
+    results = {}
+    for governed in (False, True):
+        results[governed] = simulate(args, governed)
+
+    print(f"\n{'phase':>10} {'fixed p90':>10} {'governed p90':>13} {'governed fps':>13}")
+    phases = (("nominal", 0.0, 0.25), ("slowed", 0.25, 0.65), ("recovered", 0.65, 1.0))
+    for name, start, end in phases:
+        row = [f"{name:>10}"]
+        for governed in (False, True):
+            times, latencies, _ = results[governed]
+            mask = (times >= start * args.duration) & (times < end * args.duration)
+            row.append(f"{np.percentile(latencies[mask], 90) * 1000:8.0f} ms")
+            if governed:
+                row.append(f"{np.count_nonzero(mask) / ((end - start) * args.duration):10.1f}")
+        print("   ".join(row))
+    governor = results[True][2]
+    print(f"\n{len(governor.changes)} changes, final point {governor.point}")
@@ -0,0 +1,174 @@
+"""
+Closed-loop pan/tilt simulation for offline controller tuning.
+
+A synthetic target moves in front of the camera (steps, a ramp or a sine). Frames are
+captured at a fixed rate and boxes arrive after the pipeline latency with pixel noise.
+PanTiltAimer turns them into servo steps for the real ServoMotionEngine, and a fake
+servo (first-order lag with a slew limit) follows the engine's commanded angles. Time
+is simulated, so thousands of control steps run per second.
+
+Reports rise time (10% to 90% of the step), overshoot (percent of the step) and
+steady-state error (mean absolute error over the last 0.5 s of each segment) per axis.
+
+Usage:
+    python sim_pantilt.py
+    python sim_pantilt.py --motion=sine --kp=6 --ki=2 --kd=0.1
+    python sim_pantilt.py --control=step
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import fake_hw
+
+fake_hw.install()
+from object_tracker import PanTiltAimer, gains_for
+from pantilt import PanTiltController, ServoMotionEngine
+
+TICK = 0.005  # Simulation step (200 Hz)
+ENGINE_TICK = 0.02  # Motion engine tick (50 Hz)
+SEGMENT = 3.0  # Seconds per target position in the step motion
+
+class FakeServo:
+    """Hobby servo model: follows the commanded angle with a lag and a slew limit."""
+    def __init__(self, angle, time_constant=0.04, max_speed=400.0):
+        self.angle = angle
+        self.time_constant = time_constant
+        self.max_speed = max_speed
+
+    def step(self, command, dt):
+        change = (command - self.angle) * min(1.0, dt / self.time_constant)
+        limit = self.max_speed * dt
+        self.angle += max(-limit, min(limit, change))
+        return self.angle
+
+def target_motion(kind, duration):
+    """Target bearing (pan, tilt) in degrees as a function of time, and the step times."""
+    if kind == "step":
+        pan_levels = [90.0, 110.0, 80.0, 95.0]
+        tilt_levels = [45.0, 55.0, 38.0, 48.0]
+        def bearing(t):
+            i = min(int(t // SEGMENT), len(pan_levels) - 1)
+            return pan_levels[i], tilt_levels[i]
+        return bearing, [SEGMENT * i for i in range(1, len(pan_levels))]
+    if kind == "ramp":
+        def bearing(t):
+            return 90.0 + 8.0 * max(0.0, t - 1.0), 45.0 + 3.0 * max(0.0, t - 1.0)
+        return bearing, []
+    if kind == "sine":
+        def bearing(t):
+            return 90.0 + 15.0 * np.sin(2 * np.pi * 0.3 * t), 45.0 + 6.0 * np.sin(2 * np.pi * 0.2 * t)
+        return bearing, []
+    raise ValueError(f"Unknown motion: {kind}")
+
+def simulate(bearing, duration, aimer, fps, latency, noise_px, seed):
+    """Run the closed loop; return time, target and servo angle arrays with shape (n, 2)."""
+    rng = random.Random(seed)
+    controller = PanTiltController()
+    controller.initialize_to_middle()
+    engine = ServoMotionEngine(controller)
+    pan_ch, tilt_ch = controller.SERVO_PAN_CH, controller.SERVO_TILT_CH
+    servos = [FakeServo(engine.get_angle(pan_ch)), FakeServo(engine.get_angle(tilt_ch))]
+    width, height = aimer.frame_width, aimer.frame_height
+
+    pending = []  # (arrival time, capture time, box)
+    next_frame = next_engine_tick = 0.0
+    steps = int(duration / TICK)
+    log_t = np.empty(steps)
+    log_target = np.empty((steps, 2))
+    log_angle = np.empty((steps, 2))
+    for i in range(steps):
+        t = i * TICK
+        target = bearing(t)
+        pan = servos[0].step(engine.get_angle(pan_ch), TICK)
+        tilt = servos[1].step(engine.get_angle(tilt_ch), TICK)
+
+        if t >= next_frame:
+            next_frame += 1.0 / fps
+            # Target right of center when the camera pans past it; below center when tilted past it
+            cx = width / 2 + (pan - target[0]) * aimer.px_per_deg_x + rng.gauss(0, noise_px)
+            cy = height / 2 + (target[1] - tilt) * aimer.px_per_deg_y + rng.gauss(0, noise_px)
+            pending.append((t + latency, t, (cx - 40, cy - 60, cx + 40, cy + 60)))
+
+        # Like ObjectTracker.track_object: one observation and one correction per processed frame
+        while pending and pending[0][0] <= t:
+            _, t_capture, bbox = pending.pop(0)
+            angles = engine.angles_at(t_capture)
+            aimer.observe(bbox, t_capture, angles[pan_ch], angles[tilt_ch])
+            pan_target, tilt_target = engine.get_target(pan_ch), engine.get_target(tilt_ch)
+            _, pan_step, tilt_step = aimer.correction(t, pan_target, tilt_target)
+            engine.set_targets({pan_ch: pan_target + pan_step, tilt_ch: tilt_target + tilt_step})
+
+        if t >= next_engine_tick:
+            next_engine_tick += ENGINE_TICK
+            engine.step(ENGINE_TICK, now=t)
+        log_t[i] = t
+        log_target[i] = target
+        log_angle[i] = pan, tilt
+    return log_t, log_target, log_angle
+
+def step_metrics(log_t, target, angle, step_times, end):
+    """Rise time, overshoot percentage and steady-state error for each step of one axis."""
+    results = []
+    bounds = step_times + [end]
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        window = (log_t >= start) & (log_t < stop)
+        t, goal, actual = log_t[window], target[window], angle[window]
+        initial = actual[0]
+        size = goal[0] - initial
+        if abs(size) < 1e-9:
+            continue
+        progress = (actual - initial) / size  # 0 at the step, 1 on target
+        reached_10 = np.nonzero(progress >= 0.1)[0]
+        reached_90 = np.nonzero(progress >= 0.9)[0]
+        rise = t[reached_90[0]] - t[reached_10[0]] if len(reached_90) else float("inf")
+        overshoot = max(0.0, float(np.max(progress)) - 1.0) * 100
+        steady = np.mean(np.abs(goal - actual)[t >= stop - 0.5])
+        results.append((rise, overshoot, steady))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--motion', help='Target motion', choices=['step', 'ramp', 'sine'], default='step')
+    parser.add_argument('--control', help='Control law', choices=['pid', 'step'], default='pid')
+    parser.add_argument('--resolution', help='Camera resolution WxH', default='640x360')
+    parser.add_argument('--kp', type=float, help='Override the proportional gain on both axes')
+    parser.add_argument('--ki', type=float, help='Override the integral gain on both axes')
+    parser.add_argument('--kd', type=float, help='Override the derivative gain on both axes')
+    parser.add_argument('--no-kalman', help='Aim at raw boxes', action='store_true')
+    parser.add_argument('--fps', help='Camera/box update rate', type=float, default=15)
+    parser.add_argument('--latency', help='Capture + inference latency in seconds', type=float, default=0.12)
+    parser.add_argument('--noise', help='Box center noise in pixels (std)', type=float, default=2)
+    parser.add_argument('--duration', type=float, default=12.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    resolution = tuple(int(v) for v in args.resolution.split('x'))
+    gains = {axis: dict(params) for axis, params in gains_for(resolution).items()}
+    for axis in gains.values():
+        for name in ('kp', 'ki', 'kd'):
+            if getattr(args, name) is not None:
+                axis[name] = getattr(args, name)
+    aimer = PanTiltAimer(resolution, use_kalman=not args.no_kalman, gains=gains, control=args.control)
+    bearing, step_times = target_motion(args.motion, args.duration)
+
+    start = time.perf_counter()
+    log_t, target, angle = simulate(bearing, args.duration, aimer, args.fps, args.latency, args.noise, args.seed)
+    elapsed = time.perf_counter() - start
+    print(f"Simulated {len(log_t)} steps ({args.duration:.0f} s) in {elapsed:.2f} s: "
+          f"{len(log_t) / elapsed:.0f} steps/s")
+
+    for index, axis in enumerate(("pan", "tilt")):
+        error = target[:, index] - angle[:, index]
+        line = f"{axis:>4}: RMS error {np.sqrt(np.mean(error[log_t > 1.0] ** 2)):5.2f} deg"
+        if step_times:
+            metrics = step_metrics(log_t, target[:, index], angle[:, index], step_times, args.duration)
+            line += (f", rise {np.mean([m[0] for m in metrics]):5.2f} s"
+                     f", overshoot {np.mean([m[1] for m in metrics]):5.1f}%"
+                     f", steady-state error {np.mean([m[2] for m in metrics]):5.2f} deg")
+        print(line)
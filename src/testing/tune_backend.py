@@ -0,0 +1,198 @@
+"""
+Find the fastest inference backend, thread count and input size on this board.
+
+Exports a .pt model to every available CPU backend (ncnn, ONNX Runtime, TorchScript,
+plus plain torch), then times each combination of backend, input size and thread count
+on the same sample frames. Each measurement runs in its own process, pinned to the
+requested number of cores, so backends do not share thread pools or warm caches. The
+results are written to an inference profile that YOLODetector loads automatically.
+
+Sample frames come from a directory of images or a video file; without --frames,
+fixed random frames are used (fine for timing, as YOLO's cost barely depends on content).
+
+Usage:
+    python tune_backend.py --model=yolov5nu.pt --frames=samples/ --output=../inference_profile.json
+    python tune_backend.py --model=yolov5nu.pt --backends=ncnn,onnx --sizes=320,416 --threads=2,4
+"""
+import argparse
+import glob
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from inference_profile import PROFILE_FILE, save_profile
+
+BACKENDS = ("ncnn", "onnx", "torchscript", "torch")
+RUNTIME_MODULES = {"ncnn": "ncnn", "onnx": "onnxruntime", "torchscript": "torch", "torch": "torch"}
+
+def load_frames(source, count, resolution):
+    """Read up to `count` BGR frames from an image directory or video, or make random ones."""
+    frames = []
+    if source and os.path.isdir(source):
+        for path in sorted(glob.glob(os.path.join(source, "*")))[:count]:
+            image = cv2.imread(path)
+            if image is not None:
+                frames.append(cv2.resize(image, resolution))
+    elif source:
+        cap = cv2.VideoCapture(source)
+        while len(frames) < count:
+            ok, image = cap.read()
+            if not ok:
+                break
+            frames.append(cv2.resize(image, resolution))
+        cap.release()
+    else:
+        rng = np.random.default_rng(0)
+        frames = [rng.integers(0, 256, (resolution[1], resolution[0], 3), dtype=np.uint8) for _ in range(count)]
+    if not frames:
+        raise SystemExit(f"No frames could be read from {source}")
+    return np.stack(frames)
+
+def export(model_path, backend, imgsz, out_dir):
+    """
+    Export a model for one backend and input size.
+
+    Returns:
+        str: Path of the exported model (the .pt itself for torch).
+    """
+    if backend == "torch":
+        return model_path
+    from ultralytics import YOLO
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    exported = YOLO(model_path).export(format=backend, imgsz=imgsz, verbose=False)
+    suffix = {"ncnn": "_ncnn_model", "onnx": ".onnx", "torchscript": ".torchscript"}[backend]
+    target = os.path.join(out_dir, f"{stem}_{imgsz}{suffix}")
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    elif os.path.exists(target):
+        os.remove(target)
+    shutil.move(str(exported), target)
+    return target
+
+def measure(model_path, imgsz, threads, frames_path, warmup):
+    """Time inference on the sample frames in this process; prints one JSON result line."""
+    cpus = sorted(os.sched_getaffinity(0))
+    os.sched_setaffinity(0, set(cpus[-threads:]))
+    import torch
+    torch.set_num_threads(threads)
+    from ultralytics import YOLO
+    model = YOLO(model_path, task='detect')
+    frames = np.load(frames_path)
+    for frame in frames[:warmup]:
+        model(frame, imgsz=imgsz, verbose=False)
+    times = []
+    start = time.perf_counter()
+    for frame in frames:
+        t0 = time.perf_counter()
+        model(frame, imgsz=imgsz, verbose=False)
+        times.append(time.perf_counter() - t0)
+    total = time.perf_counter() - start
+    p50, p95 = np.percentile(times, [50, 95]) * 1000
+    print(json.dumps({"p50_ms": p50, "p95_ms": p95, "fps": len(frames) / total}))
+
+def run_measurement(model_path, imgsz, threads, frames_path, warmup):
+    """Run measure() in a fresh process and return its result, or None if it failed."""
+    env = dict(os.environ, OMP_NUM_THREADS=str(threads))
+    command = [sys.executable, os.path.abspath(__file__), "--measure", model_path, "--imgsz", str(imgsz),
+               "--measure-threads", str(threads), "--frames-file", frames_path, "--warmup", str(warmup)]
+    result = subprocess.run(command, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"    failed: {result.stderr.strip().splitlines()[-1] if result.stderr.strip() else result.returncode}")
+        return None
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', help='Source .pt model')
+    parser.add_argument('--frames', help='Directory of sample images or a video file')
+    parser.add_argument('--count', help='Number of sample frames', type=int, default=50)
+    parser.add_argument('--resolution', help='Frame resolution WxH', default='640x360')
+    parser.add_argument('--backends', help='Comma-separated backends', default=','.join(BACKENDS))
+    parser.add_argument('--sizes', help='Comma-separated input sizes', default='256,320,416,480,640')
+    parser.add_argument('--threads', help='Comma-separated thread counts (default: 1..cores)')
+    parser.add_argument('--warmup', help='Untimed frames per measurement', type=int, default=5)
+    parser.add_argument('--budget', help='Largest size whose p95 is under this many ms becomes the default', type=float, default=100)
+    parser.add_argument('--export-dir', help='Where exported models are kept', default='.')
+    parser.add_argument('--output', help='Profile file to write', default=PROFILE_FILE)
+    # Internal: a single measurement in a child process
+    parser.add_argument('--measure', help=argparse.SUPPRESS)
+    parser.add_argument('--imgsz', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--measure-threads', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--frames-file', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.measure, args.imgsz, args.measure_threads, args.frames_file, args.warmup)
+        sys.exit(0)
+    if not args.model:
+        parser.error('--model is required')
+
+    cores = len(os.sched_getaffinity(0))
+    thread_counts = [int(v) for v in args.threads.split(',')] if args.threads else list(range(1, cores + 1))
+    sizes = [int(v) for v in args.sizes.split(',')]
+    backends = []
+    for backend in args.backends.split(','):
+        if importlib.util.find_spec(RUNTIME_MODULES[backend]) is None:
+            print(f"Skipping {backend}: {RUNTIME_MODULES[backend]} is not installed")
+        else:
+            backends.append(backend)
+
+    resolution = tuple(int(v) for v in args.resolution.split('x'))
+    frames = load_frames(args.frames, args.count, resolution)
+    os.makedirs(args.export_dir, exist_ok=True)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        frames_path = os.path.join(tmp, "frames.npy")
+        np.save(frames_path, frames)
+        for backend in backends:
+            for imgsz in sizes:
+                try:
+                    model = export(args.model, backend, imgsz, args.export_dir)
+                except Exception as e:
+                    print(f"Export to {backend} at {imgsz} failed: {e}")
+                    continue
+                for threads in thread_counts:
+                    print(f"{backend:>11} imgsz={imgsz:<4} threads={threads}", flush=True)
+                    timing = run_measurement(model, imgsz, threads, frames_path, args.warmup)
+                    if timing is None:
+                        continue
+                    print(f"    p50 {timing['p50_ms']:6.1f} ms  p95 {timing['p95_ms']:6.1f} ms  {timing['fps']:5.1f} fps")
+                    results.append(dict(backend=backend, model=model, imgsz=imgsz, threads=threads, **timing))
+
+    if not results:
+        raise SystemExit("No configuration could be measured")
+    best = {}
+    for result in results:
+        current = best.get(str(result["imgsz"]))
+        if current is None or result["p50_ms"] < current["p50_ms"]:
+            best[str(result["imgsz"])] = result
+    within_budget = [int(size) for size, entry in best.items() if entry["p95_ms"] <= args.budget]
+    default_imgsz = max(within_budget) if within_budget else min(int(size) for size in best)
+
+    save_profile({
+        "source": args.model,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "machine": f"{platform.node()} {platform.machine()} ({cores} cores)",
+        "frames": len(frames),
+        "default_imgsz": default_imgsz,
+        "best": best,
+        "results": results,
+    }, args.output)
+
+    print("\nFastest per input size:")
+    for size in sorted(best, key=int):
+        entry = best[size]
+        print(f"  {size:>4}: {entry['backend']:<11} threads={entry['threads']}  p50 {entry['p50_ms']:6.1f} ms  "
+              f"p95 {entry['p95_ms']:6.1f} ms  {entry['fps']:5.1f} fps")
+    print(f"Default input size: {default_imgsz} (largest with p95 <= {args.budget:.0f} ms)")
+    print(f"Profile written to {args.output}")
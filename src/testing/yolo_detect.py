@@ -2,6 +2,8 @@ import os
 import sys
 import argparse
 import glob
+import queue
+import threading
 import time
 
 import cv2
@@ -21,8 +23,13 @@ parser.add_argument('--thresh', help='Minimum confidence threshold for displayin
 parser.add_argument('--resolution', help='Resolution in WxH to display inference results at (example: "640x480"), \
                     otherwise, match source resolution',
                     default=None)
-parser.add_argument('--record', help='Record results from video or webcam and save it as "demo1.avi". Must specify --resolution argument to record.',
+parser.add_argument('--record', help='Record results from video, webcam or Picamera and save it as "demo1.avi". Must specify --resolution argument to record.',
                     action='store_true')
+parser.add_argument('--queue-size', help='Frames buffered between inference and the draw/record thread (example: "4")',
+                    type=int, default=4)
+parser.add_argument('--drop-policy', help='When the draw/record thread falls behind, drop the "oldest" queued frame \
+                    or the "newest" incoming one. Inference never waits either way.',
+                    choices=['oldest', 'newest'], default='oldest')
 
 args = parser.parse_args()
 
@@ -76,7 +83,7 @@ if user_res:
 
 # Check if recording is valid and set up recording
 if record:
-    if source_type not in ['video','usb']:
+    if source_type not in ['video','usb','picamera']:
         print('Recording only works for video and camera sources. Please try again.')
         sys.exit(0)
     if not user_res:
@@ -112,13 +119,132 @@ elif source_type == 'video' or source_type == 'usb':
 elif source_type == 'picamera':
     from picamera2 import Picamera2
     cap = Picamera2()
-    cap.configure(cap.create_video_configuration(main={"format": 'XRGB8888', "size": (resW, resH)}))
+    main_config = {"format": 'RGB888'}
+    if user_res:
+        main_config["size"] = (resW, resH)
+        resize = False  # The ISP already delivers frames at the requested size
+    cap.configure(cap.create_video_configuration(main=main_config))
     cap.start()
 
 # Set bounding box colors (using the Tableu 10 color scheme)
 bbox_colors = [(164,120,87), (68,148,228), (93,97,209), (178,182,133), (88,159,106), 
               (96,202,231), (159,124,168), (169,162,241), (98,118,150), (172,176,184)]
 
+class DisplayRecorder:
+    """
+    Draws results and writes them to the recording on its own thread.
+
+    The inference loop hands over each frame with its detections through a bounded queue
+    and never waits: when the queue is full, a frame is dropped according to drop_policy.
+    Drawn frames come back to the main thread through show(), because HighGUI windows
+    (imshow/waitKey) must be driven from the main thread on most platforms. Still images
+    are the exception, since each one is shown until a key is pressed.
+    """
+    def __init__(self, recorder=None, queue_size=4, drop_policy='oldest', lossless=False):
+        self.recorder = recorder
+        self.drop_policy = drop_policy
+        self.lossless = lossless
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.encoded = 0  # Frames drawn and recorded
+        self.dropped = 0  # Frames dropped because the queue was full
+        self.quit = threading.Event()
+        self.drawn = None  # Latest drawn frame not shown yet
+        self.drawn_ready = threading.Condition()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def put(self, item):
+        """Queue (frame, xyxy, classes, confidences, fps) for display without blocking."""
+        if self.lossless:
+            self.frames.put(item)
+            return
+        try:
+            self.frames.put_nowait(item)
+            return
+        except queue.Full:
+            self.dropped += 1
+            if self.drop_policy == 'newest':
+                return
+        try:
+            self.frames.get_nowait()  # Make room by dropping the oldest frame
+        except queue.Empty:
+            pass
+        self.frames.put_nowait(item)
+
+    def run(self):
+        while True:
+            item = self.frames.get()
+            if item is None:
+                break
+            if self.quit.is_set():
+                continue  # Skip whatever is still queued once the user quits
+            frame, xyxy, classes, confidences, fps = item
+            object_count = draw_detections(frame, xyxy, classes, confidences)
+            if fps is not None:
+                cv2.putText(frame, f'FPS: {fps:0.2f}', (10,20), cv2.FONT_HERSHEY_SIMPLEX, .7, (0,255,255), 2) # Draw framerate
+            cv2.putText(frame, f'Number of objects: {object_count}', (10,40), cv2.FONT_HERSHEY_SIMPLEX, .7, (0,255,255), 2) # Draw total number of detected objects
+            if self.recorder is not None: self.recorder.write(frame)
+            self.encoded += 1
+            with self.drawn_ready:
+                self.drawn = frame
+                self.drawn_ready.notify()
+
+    def show(self):
+        """
+        Show the latest drawn frame and handle keypresses. Call from the main thread.
+
+        For still images, waits for the frame just queued to be drawn and then for a keypress.
+        Otherwise the keyboard is polled for 5ms and a frame still being drawn is shown next time.
+        """
+        with self.drawn_ready:
+            if self.lossless:
+                self.drawn_ready.wait_for(lambda: self.drawn is not None or not self.thread.is_alive())
+            frame, self.drawn = self.drawn, None
+        if frame is not None:
+            cv2.imshow('YOLO detection results',frame) # Display image
+        elif self.lossless:
+            return
+
+        # For still images, wait for a keypress before moving on. Otherwise, poll the keyboard for 5ms.
+        key = cv2.waitKey() if self.lossless else cv2.waitKey(5)
+        if key == ord('q') or key == ord('Q'): # Press 'q' to quit
+            self.quit.set()
+        elif key == ord('s') or key == ord('S'): # Press 's' to pause inference
+            cv2.waitKey()
+        elif (key == ord('p') or key == ord('P')) and frame is not None: # Press 'p' to save a picture of results on this frame
+            cv2.imwrite('capture.png',frame)
+
+    def close(self):
+        """Stop the thread once the queued frames are recorded, or right away after a quit."""
+        self.frames.put(None)
+        self.thread.join()
+
+def draw_detections(frame, xyxy, classes, confidences):
+    """Draw boxes and labels for detections above the confidence threshold; returns how many were drawn."""
+    object_count = 0
+    for (xmin, ymin, xmax, ymax), classidx, conf in zip(xyxy, classes, confidences):
+
+        # Draw box if confidence threshold is high enough
+        if conf > 0.5:
+
+            classname = labels[classidx]
+            color = bbox_colors[classidx % 10]
+            cv2.rectangle(frame, (xmin,ymin), (xmax,ymax), color, 2)
+
+            label = f'{classname}: {int(conf*100)}%'
+            labelSize, baseLine = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1) # Get font size
+            label_ymin = max(ymin, labelSize[1] + 10) # Make sure not to draw label too close to top of window
+            cv2.rectangle(frame, (xmin, label_ymin-labelSize[1]-10), (xmin+labelSize[0], label_ymin+baseLine-10), color, cv2.FILLED) # Draw white box to put label text in
+            cv2.putText(frame, label, (xmin, label_ymin-7), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1) # Draw label text
+
+            # Basic example: count the number of objects in the image
+            object_count = object_count + 1
+    return object_count
+
+# Drawing and recording run on their own thread so MJPG encoding does not slow down inference
+still_images = source_type == 'image' or source_type == 'folder'
+display = DisplayRecorder(recorder if record else None, args.queue_size, args.drop_policy, lossless=still_images)
+
 # Initialize control and status variables
 avg_frame_rate = 0
 frame_rate_buffer = []
@@ -134,7 +260,7 @@ while True:
     if source_type == 'image' or source_type == 'folder': # If source is image or image folder, load the image using its filename
         if img_count >= len(imgs_list):
             print('All images have been processed. Exiting program.')
-            sys.exit(0)
+            break
         img_filename = imgs_list[img_count]
         frame = cv2.imread(img_filename)
         img_count = img_count + 1
@@ -152,8 +278,7 @@ while True:
             break
 
     elif source_type == 'picamera': # If source is a Picamera, grab frames using picamera interface
-        frame_bgra = cap.capture_array()
-        frame = cv2.cvtColor(np.copy(frame_bgra), cv2.COLOR_BGRA2BGR)
+        frame = cap.capture_array() # RGB888 is already 3-channel BGR, no conversion needed
         if (frame is None):
             print('Unable to read frames from the Picamera. This indicates the camera is disconnected or not working. Exiting program.')
             break
@@ -165,65 +290,18 @@ while True:
     # Run inference on frame
     results = model(frame, verbose=False)
 
-    # Extract results
+    # Extract results: one transfer per tensor for the whole frame, then hand off to the display thread
     detections = results[0].boxes
-
-    # Initialize variable for basic object counting example
-    object_count = 0
-
-    # Go through each detection and get bbox coords, confidence, and class
-    for i in range(len(detections)):
-
-        # Get bounding box coordinates
-        # Ultralytics returns results in Tensor format, which have to be converted to a regular Python array
-        xyxy_tensor = detections[i].xyxy.cpu() # Detections in Tensor format in CPU memory
-        xyxy = xyxy_tensor.numpy().squeeze() # Convert tensors to Numpy array
-        xmin, ymin, xmax, ymax = xyxy.astype(int) # Extract individual coordinates and convert to int
-
-        # Get bounding box class ID and name
-        classidx = int(detections[i].cls.item())
-        classname = labels[classidx]
-
-        # Get bounding box confidence
-        conf = detections[i].conf.item()
-
-        # Draw box if confidence threshold is high enough
-        if conf > 0.5:
-
-            color = bbox_colors[classidx % 10]
-            cv2.rectangle(frame, (xmin,ymin), (xmax,ymax), color, 2)
-
-            label = f'{classname}: {int(conf*100)}%'
-            labelSize, baseLine = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1) # Get font size
-            label_ymin = max(ymin, labelSize[1] + 10) # Make sure not to draw label too close to top of window
-            cv2.rectangle(frame, (xmin, label_ymin-labelSize[1]-10), (xmin+labelSize[0], label_ymin+baseLine-10), color, cv2.FILLED) # Draw white box to put label text in
-            cv2.putText(frame, label, (xmin, label_ymin-7), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1) # Draw label text
-
-            # Basic example: count the number of objects in the image
-            object_count = object_count + 1
-
-    # Calculate and draw framerate (if using video, USB, or Picamera source)
-    if source_type == 'video' or source_type == 'usb' or source_type == 'picamera':
-        cv2.putText(frame, f'FPS: {avg_frame_rate:0.2f}', (10,20), cv2.FONT_HERSHEY_SIMPLEX, .7, (0,255,255), 2) # Draw framerate
-    
-    # Display detection results
-    cv2.putText(frame, f'Number of objects: {object_count}', (10,40), cv2.FONT_HERSHEY_SIMPLEX, .7, (0,255,255), 2) # Draw total number of detected objects
-    cv2.imshow('YOLO detection results',frame) # Display image
-    if record: recorder.write(frame)
-
-    # If inferencing on individual images, wait for user keypress before moving to next image. Otherwise, wait 5ms before moving to next frame.
-    if source_type == 'image' or source_type == 'folder':
-        key = cv2.waitKey()
-    elif source_type == 'video' or source_type == 'usb' or source_type == 'picamera':
-        key = cv2.waitKey(5)
-    
-    if key == ord('q') or key == ord('Q'): # Press 'q' to quit
+    xyxy = detections.xyxy.cpu().numpy().astype(int).tolist()
+    classes = detections.cls.cpu().numpy().astype(int).tolist()
+    confidences = detections.conf.cpu().numpy().tolist()
+    fps = None if still_images else avg_frame_rate
+    display.put((frame, xyxy, classes, confidences, fps))
+    display.show() # Pauses here with 's'
+
+    if display.quit.is_set():
         break
-    elif key == ord('s') or key == ord('S'): # Press 's' to pause inference
-        cv2.waitKey()
-    elif key == ord('p') or key == ord('P'): # Press 'p' to save a picture of results on this frame
-        cv2.imwrite('capture.png',frame)
-    
+
     # Calculate FPS for this frame
     t_stop = time.perf_counter()
     frame_rate_calc = float(1/(t_stop - t_start))
@@ -240,7 +318,11 @@ while True:
 
 
 # Clean up
+display.close()
 print(f'Average pipeline FPS: {avg_frame_rate:.2f}')
+total = display.encoded + display.dropped
+if total:
+    print(f'Display/record: {display.encoded} frames encoded, {display.dropped} dropped ({display.dropped / total:.1%})')
 if source_type == 'video' or source_type == 'usb':
     cap.release()
 elif source_type == 'picamera':
@@ -1,57 +1,240 @@
 import RPi.GPIO as GPIO
+import statistics
+import threading
 import time
+from collections import deque
+from metrics import stage_metrics
+
+SPEED_OF_SOUND_CM_S = 34300  # Speed of sound at ~20 degrees C
 
 class HCSR04:
-    def __init__(self, trigger_pin, echo_pin):
+    ECHO_START_TIMEOUT = 0.01  # Max time from trigger to the echo line going high (seconds)
+
+    def __init__(self, trigger_pin, echo_pin, max_range_cm=400, use_edge_detection=True, settle_time=2):
         """
         Initialize the HCSR04 ultrasonic sensor.
         
         Args:
             trigger_pin (int): GPIO pin connected to the sensor's trigger pin.
             echo_pin (int): GPIO pin connected to the sensor's echo pin.
+            max_range_cm (float): Echoes longer than this range are reported as max_range_cm. Defaults to 400.
+            use_edge_detection (bool): Timestamp echo edges from GPIO callbacks instead of
+                busy-waiting on the echo pin. Defaults to True.
+            settle_time (float): Time to hold the trigger low so the sensor settles (seconds). Defaults to 2.
         """
         self.trigger_pin = trigger_pin
         self.echo_pin = echo_pin
+        self.max_range_cm = max_range_cm
+        self.max_echo_s = 2 * max_range_cm / SPEED_OF_SOUND_CM_S
+        self.use_edge_detection = use_edge_detection
+
+        # Edge timestamps filled in by the GPIO callback thread
+        self._next_edge = None  # "rise" or "fall" while a measurement waits for that edge
+        self._rise_ns = None
+        self._fall_ns = None
+        self._rise_event = threading.Event()
+        self._fall_event = threading.Event()
+
+        # Background sampler state
+        self.distance = None  # Latest filtered distance in cm
+        self.distance_timestamp = None  # time.monotonic() of the latest filtered distance
+        self._sampler_thread = None
+        self._sampler_running = False
         
         GPIO.setmode(GPIO.BCM)
         GPIO.setup(self.trigger_pin, GPIO.OUT)
         GPIO.setup(self.echo_pin, GPIO.IN)
+        if self.use_edge_detection:
+            GPIO.add_event_detect(self.echo_pin, GPIO.BOTH, callback=self._on_echo_edge)
         
         GPIO.output(self.trigger_pin, GPIO.LOW)
-        time.sleep(2)
-    
-    def get_distance(self):
+        time.sleep(settle_time)
+
+    def _on_echo_edge(self, channel):
         """
-        Measure the distance to an object using the ultrasonic sensor.
-        
-        Returns:
-            float: Distance to the object in centimeters.
+        GPIO callback: timestamp the rising and falling edges of the echo pulse.
+
+        Callbacks can run well after the edge, when the pin may have changed again, so the
+        direction is not read back from the pin: the first edge after a trigger is the rise
+        and the next one is the fall. Edges outside a measurement are ignored.
         """
+        now = time.perf_counter_ns()
+        if self._next_edge == "rise":
+            self._rise_ns = now
+            self._next_edge = "fall"
+            self._rise_event.set()
+        elif self._next_edge == "fall":
+            self._fall_ns = now
+            self._next_edge = None
+            self._fall_event.set()
+
+    def _trigger(self):
+        """Send the 10 microsecond trigger pulse."""
         GPIO.output(self.trigger_pin, GPIO.HIGH)
         time.sleep(0.00001) #10 microseconds
         GPIO.output(self.trigger_pin, GPIO.LOW)
-        
+
+    def _measure_echo_edges(self):
+        """
+        Measure the echo pulse using edge callbacks; the calling thread sleeps while waiting.
+
+        Returns:
+            float: Pulse duration in seconds, None on a missed echo, or inf if the echo exceeded max range.
+        """
+        self._rise_event.clear()
+        self._fall_event.clear()
+        self._next_edge = "rise"
+        self._trigger()
+
+        if not self._rise_event.wait(self.ECHO_START_TIMEOUT):
+            self._next_edge = None
+            return None  # The echo never started
+        if not self._fall_event.wait(self.max_echo_s):
+            self._next_edge = None
+            return float("inf")  # No echo within max range
+        return (self._fall_ns - self._rise_ns) / 1e9
+
+    def _measure_echo_polling(self):
+        """
+        Measure the echo pulse by polling the echo pin, with timeouts.
+
+        Returns:
+            float: Pulse duration in seconds, None on a missed echo, or inf if the echo exceeded max range.
+        """
+        self._trigger()
+
         # Wait for the echo to start
+        deadline = time.perf_counter() + self.ECHO_START_TIMEOUT
+        pulse_start = time.perf_counter()
         while GPIO.input(self.echo_pin) == 0:
-            pulse_start = time.time()
-        
+            pulse_start = time.perf_counter()
+            if pulse_start > deadline:
+                return None
+
         # Wait for the echo to end
+        deadline = pulse_start + self.max_echo_s
+        pulse_end = time.perf_counter()
         while GPIO.input(self.echo_pin) == 1:
-            pulse_end = time.time()
+            pulse_end = time.perf_counter()
+            if pulse_end > deadline:
+                return float("inf")
+
+        return pulse_end - pulse_start
+    
+    def get_distance(self):
+        """
+        Measure the distance to an object using the ultrasonic sensor.
         
-        # Calculate the duration of the pulse
-        pulse_duration = pulse_end - pulse_start
+        Returns:
+            float: Distance to the object in centimeters (max_range_cm if nothing is in range),
+                or None if the echo was missed.
+        """
+        start = time.perf_counter()
+        if self.use_edge_detection:
+            pulse_duration = self._measure_echo_edges()
+        else:
+            pulse_duration = self._measure_echo_polling()
+        stage_metrics.record("ultrasonic_read", time.perf_counter() - start)
+
+        if pulse_duration is None:
+            return None
+        if pulse_duration > self.max_echo_s:
+            return float(self.max_range_cm)
         
         # Calculate the distance (speed of sound is 34300 cm/s)
-        distance = pulse_duration * 17150 # Multiply by 34300/2
+        distance = pulse_duration * (SPEED_OF_SOUND_CM_S / 2)
         distance = round(distance, 2) # Round to 2 decimal places
         
         return distance
+
+    def start_sampler(self, rate_hz=10, window=5, callback=None, raw_callback=None, max_missed=None):
+        """
+        Start a background thread that samples the sensor and publishes filtered readings.
+
+        Readings are median-filtered over the last `window` valid samples, which rejects
+        single-sample outliers. A missed echo publishes nothing; after `max_missed` missed
+        echoes in a row the filter is cleared and None is published, so a disconnected
+        sensor is never mistaken for a steady reading.
+
+        Args:
+            rate_hz (float): Sampling rate in Hz. Keep below ~16 Hz so echoes do not overlap. Defaults to 10.
+            window (int): Number of samples in the median filter. Defaults to 5.
+            callback (callable, optional): Called as callback(distance, timestamp) on the sampler
+                thread after each new filtered reading. Defaults to None.
+            raw_callback (callable, optional): Called as raw_callback(distance, timestamp) with every
+                unfiltered reading (None on a missed echo), before filtering. Meant for safety
+                checks that cannot afford the median filter's lag. Defaults to None.
+            max_missed (int, optional): Consecutive missed echoes after which None is published.
+                Defaults to `window`.
+        """
+        if self._sampler_thread is not None and self._sampler_thread.is_alive():
+            return
+        self._sampler_running = True
+        max_missed = window if max_missed is None else max_missed
+        self._sampler_thread = threading.Thread(
+            target=self._sampler_loop, args=(rate_hz, window, callback, raw_callback, max_missed),
+            name="ultrasonic-sampler", daemon=True)
+        self._sampler_thread.start()
+
+    def stop_sampler(self):
+        """Stop the background sampler thread."""
+        self._sampler_running = False
+        if self._sampler_thread is not None:
+            self._sampler_thread.join(timeout=1)
+            self._sampler_thread = None
+
+    def _sampler_loop(self, rate_hz, window, callback, raw_callback, max_missed):
+        """Sample at a fixed rate, median-filter the valid readings and publish them."""
+        period = 1.0 / rate_hz
+        samples = deque(maxlen=window)
+        missed = 0
+        next_sample = time.monotonic()
+        while self._sampler_running:
+            reading = self.get_distance()
+            timestamp = time.monotonic()
+            if raw_callback is not None:
+                raw_callback(reading, timestamp)
+            publish = False
+            if reading is not None:
+                missed = 0
+                samples.append(reading)
+                self.distance = statistics.median(samples)
+                publish = True
+            else:
+                missed += 1
+                if missed == max_missed:
+                    samples.clear()  # Stale readings say nothing about what is ahead now
+                    self.distance = None
+                    publish = True
+            if publish:
+                self.distance_timestamp = timestamp
+                if callback is not None:
+                    callback(self.distance, timestamp)
+
+            next_sample += period
+            delay = next_sample - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_sample = time.monotonic()  # Fell behind; don't try to catch up
+
+    def read(self):
+        """
+        Return the latest filtered distance from the background sampler.
+
+        Returns:
+            float: Distance in centimeters, or None if there is no valid reading yet or the
+                sensor stopped answering.
+        """
+        return self.distance
     
     def cleanup(self):
         """
         Clean up GPIO resources when the sensor is no longer needed.
         """
+        self.stop_sampler()
+        if self.use_edge_detection:
+            GPIO.remove_event_detect(self.echo_pin)
         #GPIO.cleanup()
 
 if __name__ == "__main__":
@@ -63,7 +246,9 @@ if __name__ == "__main__":
         below_threshold = False
         while True:
             distance = sensor.get_distance()
-            if distance < 20:
+            if distance is None:
+                print("Missed echo")
+            elif distance < 20:
                 if not below_threshold:
                     print("Stop")
                     below_threshold = True
@@ -74,4 +259,4 @@ if __name__ == "__main__":
             time.sleep(.1)
     except KeyboardInterrupt:
         print("Measurement stopped by user")
-        sensor.cleanup()
\ No newline at end of file
+        sensor.cleanup()